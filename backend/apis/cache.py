@@ -0,0 +1,125 @@
+# apis/cache.py
+import os, math, time, threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from .geo import geohash_encode, geohash_neighbors
+from .metrics import count_cache
+
+_MISSING = object()
+
+class TTLCache:
+    """Thread-safe, size-bounded LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = max(1, int(maxsize))
+        self.ttl = float(ttl)
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                self.misses += 1
+                return default
+            expires, value = item
+            if expires <= now:
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.pop(key, _MISSING)
+        return default if item is _MISSING else item[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+# ---------------- Google Places (searchNearby) ----------------
+# Raw `places` arrays keyed by (geohash cell, radius, max_results). Precision 6
+# is a ~1.2 x 0.6 km cell, small next to the 10 km search circle, so a result
+# cached for a neighbouring cell is still a good answer for this origin.
+PLACES_CACHE_PRECISION = int(os.getenv("PLACES_CACHE_PRECISION", "6"))
+PLACES_CACHE_TTL = float(os.getenv("PLACES_CACHE_TTL_SECONDS", "86400"))
+PLACES_CACHE_MAX_ENTRIES = int(os.getenv("PLACES_CACHE_MAX_ENTRIES", "2048"))
+PLACES_CACHE_NEIGHBORS = os.getenv("PLACES_CACHE_NEIGHBORS", "1") != "0"
+
+places_cache = TTLCache(PLACES_CACHE_MAX_ENTRIES, PLACES_CACHE_TTL)
+
+def get_cached_places(lat: float, lng: float, *, radius_m: float, max_results: int) -> Optional[List[Dict[str, Any]]]:
+    cell = geohash_encode(lat, lng, PLACES_CACHE_PRECISION)
+    cells = [cell] + (geohash_neighbors(cell) if PLACES_CACHE_NEIGHBORS else [])
+    for c in cells:
+        hit = places_cache.get((c, int(radius_m), int(max_results)))
+        if hit is not None:
+            count_cache("places", hits=1)
+            return hit
+    # one miss per lookup (places_cache.misses also counts every neighbour probed)
+    count_cache("places", misses=1)
+    return None
+
+def put_cached_places(lat: float, lng: float, places: List[Dict[str, Any]], *, radius_m: float, max_results: int) -> None:
+    cell = geohash_encode(lat, lng, PLACES_CACHE_PRECISION)
+    places_cache.set((cell, int(radius_m), int(max_results)), places)
+
+# ---------------- Google Routes (computeRouteMatrix) ----------------
+# (snapped origin cell, hospital_id, time-of-day bucket) -> (distance_km, eta_minutes).
+# Origins are snapped to a square grid of ROUTE_CACHE_CELL_M metres, so callers a
+# few dozen metres apart share ETAs; the time-of-day bucket keeps rush hour apart
+# from the quiet hours.
+ROUTE_CACHE_CELL_M = float(os.getenv("ROUTE_CACHE_CELL_M", "250"))
+ROUTE_CACHE_BUCKET_MINUTES = max(1, int(os.getenv("ROUTE_CACHE_BUCKET_MINUTES", "15")))
+ROUTE_CACHE_TTL = float(os.getenv("ROUTE_CACHE_TTL_SECONDS", "21600"))
+ROUTE_CACHE_MAX_ENTRIES = int(os.getenv("ROUTE_CACHE_MAX_ENTRIES", "50000"))
+
+route_cache = TTLCache(ROUTE_CACHE_MAX_ENTRIES, ROUTE_CACHE_TTL)
+
+def _route_origin_cell(lat: float, lng: float) -> Tuple[int, int]:
+    dlat = ROUTE_CACHE_CELL_M / 111_000.0
+    row = int(math.floor(lat / dlat))
+    dlng = ROUTE_CACHE_CELL_M / (111_000.0 * max(0.1, math.cos(math.radians(row * dlat))))
+    return row, int(math.floor(lng / dlng))
+
+def _route_time_bucket(now: Optional[datetime] = None) -> int:
+    now = now or datetime.now()
+    return (now.hour * 60 + now.minute) // ROUTE_CACHE_BUCKET_MINUTES
+
+def get_cached_routes(lat: float, lng: float, hospital_ids: List[str]) -> Tuple[Dict[int, Tuple[Optional[float], Optional[float]]], List[int]]:
+    """Split destinations into cached stats (by index) and the indexes still to fetch."""
+    cell, bucket = _route_origin_cell(lat, lng), _route_time_bucket()
+    stats: Dict[int, Tuple[Optional[float], Optional[float]]] = {}
+    missing: List[int] = []
+    for i, hid in enumerate(hospital_ids):
+        hit = route_cache.get((cell, hid, bucket)) if hid else None
+        if hit is None:
+            missing.append(i)
+        else:
+            stats[i] = hit
+    count_cache("routes", hits=len(stats), misses=len(missing))
+    return stats, missing
+
+def put_cached_route(lat: float, lng: float, hospital_id: str, dist_km: Optional[float], eta_min: Optional[float]) -> None:
+    if not hospital_id:
+        return
+    route_cache.set((_route_origin_cell(lat, lng), hospital_id, _route_time_bucket()), (dist_km, eta_min))
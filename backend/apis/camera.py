@@ -1,10 +1,15 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+from fastapi import APIRouter, HTTPException, Query, Request
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, MutableMapping, Optional
 from typing import Dict, List
 from pydantic import BaseModel
 
-from .wait_time import _count_people_from_image_b64, set_wait_for_hospital, get_wait_for_hospital
+from .wait_time import _count_people_batch_b64, _count_people_batch_bytes, _engine_or_400, camera_scope, set_wait_for_hospital, get_wait_for_hospital
+from .counters import set_hospital_engine
+from .preprocess import preprocess_b64, preprocess_frame, set_profile
+from .ingest import read_frames
+from .shared_store import shared_dict, store_call
 
 router = APIRouter(prefix="/camera-frame", tags=["camera"])
 
@@ -12,6 +17,7 @@ class CameraPushIn(BaseModel):
     hospital_id: str
     images_b64: List[str] = Field(default_factory=list)
     per_person_minutes: Optional[int] = Field(None, ge=1, le=60)
+    engine: Optional[str] = Field(None, description="People counter: openai | opencv (default: per hospital, then PEOPLE_COUNTER_ENGINE)")
 
 class CameraUploadResponse(BaseModel):
     hospital_id: str
@@ -28,25 +34,48 @@ def push_frames(body: CameraPushIn):
     if not body.images_b64:
         raise HTTPException(400, "images_b64 required")
 
-    per_person = body.per_person_minutes or 10
-    counts, cams = [], []
-    for i, b64 in enumerate(body.images_b64):
-        n = _count_people_from_image_b64(b64)
-        counts.append(n)
-        cams.append({"camera_id": f"cam-{i+1}", "people": n})
+    engine = _engine_or_400(body.engine, body.hospital_id)
+    frames = [preprocess_b64(b64, hospital_id=body.hospital_id) for b64 in body.images_b64]
+    counts = _count_people_batch_b64(frames, engine=engine, scopes=[camera_scope(body.hospital_id, None)] * len(frames))
+    return _store_counts(body.hospital_id, [None] * len(counts), counts, body.per_person_minutes, engine)
 
+@router.post("/raw", response_model=CameraUploadResponse,
+             summary="Push raw JPEG frames: multipart/form-data (one file per camera) or an octet-stream body")
+async def push_frames_raw(
+    request: Request,
+    hospital_id: str = Query(...),
+    camera_id: Optional[str] = Query(None, description="Camera id for a single-frame body"),
+    per_person_minutes: Optional[int] = Query(None, ge=1, le=60),
+    engine: Optional[str] = Query(None, description="People counter: openai | opencv"),
+):
+    engine = _engine_or_400(engine, hospital_id)
+    frames = await read_frames(request, camera_id)
+    if not frames:
+        raise HTTPException(400, "at least one frame required")
+    # raw buffers go straight to preprocessing and the counter, off the event loop
+    counts = await asyncio.to_thread(lambda: _count_people_batch_bytes(
+        [preprocess_frame(img, camera=cam, hospital_id=hospital_id) for cam, img in frames], engine=engine,
+        scopes=[camera_scope(hospital_id, cam) for cam, _ in frames]))
+    return await store_call(_store_counts, hospital_id, [cam for cam, _ in frames], counts, per_person_minutes, engine)
+
+def _store_counts(hospital_id: str, camera_ids: List[Optional[str]], counts: List[int],
+                  per_person_minutes: Optional[int], engine: str) -> CameraUploadResponse:
+    per_person = per_person_minutes or 10
+    cams = [{"camera_id": cam or f"cam-{i+1}", "people": n, "engine": engine}
+            for i, (cam, n) in enumerate(zip(camera_ids, counts))]
     total_people = sum(counts)
     est = int(total_people * per_person)
 
     record = {
-        "hospital_id": body.hospital_id,
+        "hospital_id": hospital_id,
         "people": total_people,
         "per_person_minutes": per_person,
         "estimated_wait_minutes": est,
         "cameras": cams,
+        "source": "upload",
     }
-    set_wait_for_hospital(body.hospital_id, record)
-    latest = get_wait_for_hospital(body.hospital_id)
+    set_wait_for_hospital(hospital_id, record)
+    latest = get_wait_for_hospital(hospital_id)
     if not latest:
         raise HTTPException(500, "Failed to store")
     return CameraUploadResponse(**latest)  # type: ignore
@@ -58,15 +87,41 @@ def get_latest_camera_estimate(hospital_id: str):
         raise HTTPException(status_code=404, detail="No upload yet for this hospital")
     return CameraUploadResponse(**rec)  # type: ignore
 
-_CAMERA_REGISTRY: Dict[str, List[str]] = {}
+# shared by all workers when SHARED_STORE_PATH is set (see apis/shared_store.py)
+_CAMERA_REGISTRY: MutableMapping[str, List[str]] = shared_dict("camera_registry")
+# per-hospital background polling interval (seconds); see apis/camera_poller.py
+_POLL_INTERVAL: MutableMapping[str, float] = shared_dict("poll_interval")
+
+class PreprocessIn(BaseModel):
+    roi: Optional[List[float]] = Field(None, min_length=4, max_length=4, description="[left, top, right, bottom] as fractions of the frame")
+    max_edge: Optional[int] = Field(None, ge=0, le=4096, description="Long edge after cropping, px (0 = keep)")
+    grayscale: Optional[bool] = None
+    quality: Optional[int] = Field(None, ge=10, le=95)
 
 class RegisterIn(BaseModel):
     hospital_id: str
     camera_urls: List[str]
+    engine: Optional[str] = Field(None, description="People counter for this hospital's frames: openai | opencv")
+    poll_interval_s: Optional[float] = Field(None, ge=5, le=3600, description="Background polling interval (default CAMERA_POLL_INTERVAL_S)")
+    preprocess: Optional[PreprocessIn] = Field(None, description="Crop/downscale profile for this hospital's frames (default FRAME_* env)")
 
-@router.post("/register", summary="Register camera URLs to a hospital (in-memory, cleared on restart)")
+@router.post("/register", summary="Register camera URLs to a hospital for background polling (in-memory, cleared on restart)")
 def register_cameras(body: RegisterIn):
+    if body.engine:
+        try:
+            set_hospital_engine(body.hospital_id, body.engine)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+    if body.preprocess:
+        try:
+            set_profile(body.hospital_id, body.preprocess.model_dump(exclude_none=True))
+        except ValueError as e:
+            raise HTTPException(400, str(e))
     _CAMERA_REGISTRY[body.hospital_id] = body.camera_urls
+    if body.poll_interval_s:
+        _POLL_INTERVAL[body.hospital_id] = body.poll_interval_s
+    else:
+        _POLL_INTERVAL.pop(body.hospital_id, None)
     return {"ok": True, "hospital_id": body.hospital_id, "registered": len(body.camera_urls)}
 
 @router.get("/list/{hospital_id}")
@@ -0,0 +1,209 @@
+# apis/camera_fetch.py
+# Camera frame fetching that only moves bytes when the scene changed:
+#  - snapshot URLs (/capture.jpg) use conditional GET: the last ETag per URL is sent
+#    as If-None-Match and a 304 reuses the bytes (and headcount) we already have;
+#  - stream URLs (/stream.mjpg) are read by one long-lived multipart/x-mixed-replace
+#    subscription per URL, and callers take the latest part from memory.
+import os, re, time, asyncio, logging
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from .cache import TTLCache
+from .preprocess import preprocess_frame
+from .metrics import count_cache
+
+log = logging.getLogger(__name__)
+
+CAMERA_FRAME_CACHE_TTL = float(os.getenv("CAMERA_FRAME_CACHE_TTL_SECONDS", "600"))
+CAMERA_FRAME_CACHE_MAX = int(os.getenv("CAMERA_FRAME_CACHE_MAX_ENTRIES", "1024"))
+CAMERA_STREAMS_ENABLED = os.getenv("CAMERA_STREAMS_ENABLED", "1") != "0"
+STREAM_IDLE_S = float(os.getenv("CAMERA_STREAM_IDLE_S", "120"))      # close a subscription nobody read for this long
+STREAM_MAX_AGE_S = float(os.getenv("CAMERA_STREAM_MAX_AGE_S", "30"))  # no part (not even a heartbeat) since -> stale
+STREAM_FIRST_FRAME_S = float(os.getenv("CAMERA_STREAM_FIRST_FRAME_S", "5"))
+MIN_FRAME_BYTES = 100  # tiny responses are likely errors
+
+class Frame(NamedTuple):
+    data: Optional[bytes]
+    etag: Optional[str] = None
+    changed: bool = True           # False: same content as the previous fetch of this URL
+    people: Optional[int] = None   # headcount remembered for this exact frame, if any
+    error: Optional[str] = None
+
+# url -> {"etag", "data", "people"}
+_last = TTLCache(CAMERA_FRAME_CACHE_MAX, CAMERA_FRAME_CACHE_TTL)
+
+def is_stream_url(url: str) -> bool:
+    path = urlsplit(url).path.lower()
+    return CAMERA_STREAMS_ENABLED and (path.endswith((".mjpg", ".mjpeg")) or "/stream" in path)
+
+def _remember(url: str, etag: Optional[str], data: bytes) -> Frame:
+    prev = _last.get(url)
+    if etag and prev and prev["etag"] == etag:
+        return Frame(prev["data"], etag, changed=False, people=prev["people"])
+    if etag:
+        _last.set(url, {"etag": etag, "data": data, "people": None})
+    return Frame(data, etag)
+
+def record_count(url: str, frame: Frame, people: int) -> None:
+    """Attach a headcount to the cached frame so a later 304 / unchanged part skips counting."""
+    prev = _last.get(url)
+    if prev and frame.etag and prev["etag"] == frame.etag:
+        prev["people"] = people
+
+def _conditional_headers(url: str) -> Dict[str, str]:
+    prev = _last.get(url)
+    return {"If-None-Match": prev["etag"]} if prev else {}
+
+def _from_response(url: str, r: httpx.Response) -> Frame:
+    if r.status_code == 304:
+        prev = _last.get(url)
+        if prev is not None:
+            return Frame(prev["data"], prev["etag"], changed=False, people=prev["people"])
+        return Frame(None, error="304 without a cached frame")
+    if not r.is_success:
+        return Frame(None, error=f"HTTP {r.status_code}")
+    data = r.content or b""
+    if len(data) < MIN_FRAME_BYTES:
+        return Frame(None, error=f"tiny_response len={len(data)} ct={r.headers.get('content-type','n/a')}")
+    ct = r.headers.get("content-type", "")
+    if ct and not ct.startswith("image/"):
+        return Frame(None, error=f"not an image ct={ct}")
+    return _remember(url, r.headers.get("etag"), data)
+
+# ---------------- multipart/x-mixed-replace ----------------
+_BOUNDARY_RE = re.compile(r'boundary="?([^";]+)"?', re.I)
+
+class MjpegParser:
+    """Incremental multipart/x-mixed-replace parser: feed() bytes, get back complete (headers, body) parts."""
+
+    def __init__(self, content_type: str):
+        m = _BOUNDARY_RE.search(content_type or "")
+        b = (m.group(1) if m else "frame").lstrip("-")
+        self._delim = b"--" + b.encode("ascii")
+        self._buf = b""
+
+    def feed(self, chunk: bytes) -> List[Tuple[Dict[str, str], bytes]]:
+        self._buf += chunk
+        parts = []
+        while True:
+            start = self._buf.find(self._delim)
+            if start < 0:
+                break
+            head_end = self._buf.find(b"\r\n\r\n", start)
+            if head_end < 0:
+                break
+            headers = {}
+            for line in self._buf[start + len(self._delim):head_end].split(b"\r\n"):
+                k, sep, v = line.decode("latin-1").partition(":")
+                if sep:
+                    headers[k.strip().lower()] = v.strip()
+            body_start = head_end + 4
+            if "content-length" in headers:
+                body_end = body_start + int(headers["content-length"])
+                if len(self._buf) < body_end:
+                    break
+                body = self._buf[body_start:body_end]
+            else:
+                body_end = self._buf.find(self._delim, body_start)
+                if body_end < 0:
+                    break
+                body = self._buf[body_start:body_end].rstrip(b"\r\n")  # CRLF before the boundary
+            parts.append((headers, body))
+            self._buf = self._buf[body_end:]
+        return parts
+
+class _Stream:
+    def __init__(self, url: str):
+        self.url = url
+        self.latest: Optional[Tuple[str, bytes]] = None  # (etag, jpeg)
+        self.seen = 0.0       # monotonic time of the last part, heartbeats included
+        self.last_read = time.monotonic()
+        self.ready = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def fresh(self) -> Optional[Tuple[str, bytes]]:
+        return self.latest if self.latest and time.monotonic() - self.seen <= STREAM_MAX_AGE_S else None
+
+class StreamHub:
+    """One background MJPEG subscription per stream URL, dropped after STREAM_IDLE_S without readers."""
+
+    def __init__(self):
+        self._streams: Dict[str, _Stream] = {}
+
+    async def latest(self, url: str, client: httpx.AsyncClient, timeout: float = STREAM_FIRST_FRAME_S) -> Optional[Tuple[str, bytes]]:
+        s = self._streams.get(url)
+        if s is None or s.task is None or s.task.done():
+            s = self._streams[url] = _Stream(url)
+            s.task = asyncio.create_task(self._run(s, client), name=f"mjpeg:{url}")
+        s.last_read = time.monotonic()
+        if s.fresh() is None:
+            s.ready.clear()
+            try:
+                await asyncio.wait_for(s.ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        return s.fresh()
+
+    async def _run(self, s: _Stream, client: httpx.AsyncClient) -> None:
+        backoff = 1.0
+        try:
+            while time.monotonic() - s.last_read < STREAM_IDLE_S:
+                try:
+                    # the agent sends a zero-length heartbeat part at least every few seconds
+                    async with client.stream("GET", s.url, timeout=httpx.Timeout(STREAM_MAX_AGE_S, connect=5.0)) as r:
+                        r.raise_for_status()
+                        parser = MjpegParser(r.headers.get("content-type", ""))
+                        async for chunk in r.aiter_bytes():
+                            for headers, body in parser.feed(chunk):
+                                s.seen = time.monotonic()
+                                if len(body) >= MIN_FRAME_BYTES:
+                                    s.latest = (headers.get("etag") or str(hash(body)), body)
+                                    s.ready.set()
+                                backoff = 1.0
+                            if time.monotonic() - s.last_read >= STREAM_IDLE_S:
+                                return
+                except httpx.HTTPError as e:
+                    log.debug("mjpeg stream %s: %s", s.url, e)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+        finally:
+            if self._streams.get(s.url) is s:
+                self._streams.pop(s.url, None)
+
+    async def stop(self) -> None:
+        tasks = [s.task for s in self._streams.values() if s.task]
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._streams.clear()
+
+stream_hub = StreamHub()
+
+# ---------------- fetchers ----------------
+async def fetch_frame(url: str, client: httpx.AsyncClient) -> Frame:
+    try:
+        if is_stream_url(url):
+            hit = await stream_hub.latest(url, client)
+            return _remember(url, *hit) if hit else Frame(None, error="no frame from stream")
+        return _from_response(url, await client.get(url, headers=_conditional_headers(url)))
+    except Exception as e:
+        return Frame(None, error=f"{type(e).__name__}: {e}")
+
+def count_frames(urls: List[str], frames: List[Frame], count_many: Callable[[List[bytes], List[str]], List[int]],
+                 *, hospital_id: Optional[str] = None) -> List[Optional[int]]:
+    """
+    People per frame (None where there is no image). Unchanged frames with a
+    remembered headcount reuse it; the rest are preprocessed (per-camera
+    profile) and go to `count_many` in one batch, with their URLs as scopes.
+    """
+    out: List[Optional[int]] = [f.people if f.data else None for f in frames]
+    todo = [i for i, f in enumerate(frames) if f.data and f.people is None]
+    count_cache("camera_headcount", hits=sum(1 for f in frames if f.data and f.people is not None), misses=len(todo))
+    if todo:
+        imgs = [preprocess_frame(frames[i].data, camera=urls[i], hospital_id=hospital_id) for i in todo]
+        for i, n in zip(todo, count_many(imgs, [urls[i] for i in todo])):
+            out[i] = n
+            record_count(urls[i], frames[i], n)
+    return out
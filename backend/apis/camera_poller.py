@@ -0,0 +1,142 @@
+# apis/camera_poller.py
+# Background headcounts for registered cameras, so request paths only read the wait store.
+import os, math, time, random, asyncio, logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from .camera import _CAMERA_REGISTRY, _POLL_INTERVAL
+from .wait_time import _count_people_batch_bytes, counter_ready, get_counter, get_wait_for_hospital, set_wait_for_hospital
+from .mysql_client import update_hospital_waits_async
+from .camera_fetch import count_frames, fetch_frame
+from .shared_store import hold_lease, store_call
+
+log = logging.getLogger(__name__)
+
+CAMERA_POLLER_ENABLED = os.getenv("CAMERA_POLLER_ENABLED", "1") != "0"
+POLL_INTERVAL_S = float(os.getenv("CAMERA_POLL_INTERVAL_S", "60"))
+POLL_JITTER = float(os.getenv("CAMERA_POLL_JITTER", "0.2"))            # +/- fraction of the interval
+POLL_MAX_CONCURRENCY = int(os.getenv("CAMERA_POLL_CONCURRENCY", "4"))  # hospitals polled at once, all workers
+POLL_TICK_S = 1.0
+POLL_LEASE_TTL_S = 10 * POLL_TICK_S  # with several workers, one holds the poller lease; others take over after this
+PER_PERSON_FOR_CAMERA = int(os.getenv("PER_PERSON_FOR_CAMERA", "10"))
+RNG_DOCTORS_MIN = 1
+RNG_DOCTORS_MAX = 20
+
+async def poll_hospital(hospital_id: str, camera_urls: List[str], *, client: httpx.AsyncClient) -> Optional[Dict]:
+    """Capture every camera of one hospital, count, and store the estimate. Returns the record (None if no frames)."""
+    if not counter_ready(hospital_id=hospital_id):
+        return None
+    frames = await asyncio.gather(*(fetch_frame(u, client) for u in camera_urls))
+    if not any(f.data for f in frames):
+        return None
+    engine = get_counter(hospital_id=hospital_id).name
+    # a camera whose scene hasn't changed (304 / same ETag) keeps its last headcount: no vision call
+    counts = await asyncio.to_thread(
+        count_frames, camera_urls, frames,
+        lambda imgs, scopes: _count_people_batch_bytes(imgs, require_openai=True, hospital_id=hospital_id, scopes=scopes),
+        hospital_id=hospital_id)
+    cams, people = [], 0
+    for i, (f, n) in enumerate(zip(frames, counts)):
+        if n is None:
+            cams.append({"camera_id": f"cam-{i+1}", "people": 0, "status": "no_image"})
+            continue
+        people += n
+        cams.append({"camera_id": f"cam-{i+1}", "people": n, "status": "ok", "engine": engine, "changed": f.changed})
+
+    prev = await store_call(get_wait_for_hospital, hospital_id) or {}
+    doctors = prev.get("doctors_working") or random.randint(RNG_DOCTORS_MIN, RNG_DOCTORS_MAX)
+    est = int(math.ceil(people / max(1, doctors)) * PER_PERSON_FOR_CAMERA)
+    record = {
+        "hospital_id": hospital_id,
+        "people": people,
+        "per_person_minutes": PER_PERSON_FOR_CAMERA,
+        "doctors_working": doctors,
+        "estimated_wait_minutes": est,
+        "cameras": cams,
+        "source": "poller",
+    }
+    await store_call(set_wait_for_hospital, hospital_id, record)
+    # keep the MySQL row (read by /nearby-hospitals) in step; a DB hiccup must not stop polling
+    try:
+        now = datetime.utcnow()
+        await update_hospital_waits_async([{
+            "hospital_id": hospital_id, "last_people": people, "per_person_minutes": PER_PERSON_FOR_CAMERA,
+            "doctors_working": doctors, "estimated_wait_minutes": est, "wait_last_updated": now, "updated_at": now,
+        }])
+    except Exception as e:
+        log.debug("wait row for %s not persisted: %s", hospital_id, e)
+    return record
+
+class CameraPoller:
+    """
+    Polls every hospital in the camera registry on its own interval (with
+    jitter so hospitals don't synchronise), with at most `max_concurrency`
+    hospitals in flight at once.
+    """
+
+    def __init__(self, client_getter, *, max_concurrency: int = POLL_MAX_CONCURRENCY):
+        self._client_getter = client_getter
+        self._sem = asyncio.Semaphore(max(1, max_concurrency))
+        self._next_due: Dict[str, float] = {}
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _base_interval(hospital_id: str, intervals: Dict[str, float]) -> float:
+        return max(1.0, intervals.get(hospital_id, POLL_INTERVAL_S))
+
+    @classmethod
+    def _interval(cls, hospital_id: str, intervals: Dict[str, float]) -> float:
+        return max(1.0, cls._base_interval(hospital_id, intervals) * (1.0 + random.uniform(-POLL_JITTER, POLL_JITTER)))
+
+    @staticmethod
+    def _snapshot() -> Tuple[Dict[str, List[str]], Dict[str, float]]:
+        """Registry and intervals as plain dicts (read off the event loop: they may live in SQLite)."""
+        return {k: list(v or []) for k, v in _CAMERA_REGISTRY.items()}, dict(_POLL_INTERVAL)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="camera-poller")
+
+    async def stop(self) -> None:
+        tasks = [t for t in (self._task, *self._in_flight.values()) if t]
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._in_flight.clear()
+
+    async def _run(self) -> None:
+        while True:
+            # uvicorn --workers N: only the lease holder polls, so frames aren't counted N times
+            if not await asyncio.to_thread(hold_lease, "camera-poller", POLL_LEASE_TTL_S):
+                await asyncio.sleep(POLL_TICK_S)
+                continue
+            registry, intervals = await store_call(self._snapshot)
+            now = time.monotonic()
+            for hid, urls in registry.items():
+                if hid in self._in_flight:
+                    continue
+                # first sight: spread initial polls over one interval instead of firing all at once
+                due = self._next_due.setdefault(hid, now + random.uniform(0, self._base_interval(hid, intervals)))
+                if due <= now:
+                    self._in_flight[hid] = asyncio.create_task(self._poll(hid, urls, intervals))
+            for hid in list(self._next_due):
+                if hid not in registry:
+                    self._next_due.pop(hid, None)
+            await asyncio.sleep(POLL_TICK_S)
+
+    async def _poll(self, hospital_id: str, urls: List[str], intervals: Dict[str, float]) -> None:
+        try:
+            async with self._sem:
+                if urls:
+                    await poll_hospital(hospital_id, urls, client=self._client_getter().cameras)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.warning("camera poll failed for %s: %s", hospital_id, e)
+        finally:
+            self._next_due[hospital_id] = time.monotonic() + self._interval(hospital_id, intervals)
+            self._in_flight.pop(hospital_id, None)
@@ -0,0 +1,193 @@
+# apis/counters.py
+import os, abc, json, base64, hashlib, random, threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, MutableMapping, Optional, Sequence
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from . import local_vision
+from .frame_cache import dhash_b64, frame_counts
+from .shared_store import shared_dict
+from .metrics import count_cache, timed
+
+# Engine used when neither the request nor the hospital picks one
+DEFAULT_ENGINE = os.getenv("PEOPLE_COUNTER_ENGINE", "openai")
+# {"<hospital_id>": "opencv", ...}; also settable at runtime via set_hospital_engine() (shared across workers)
+_HOSPITAL_ENGINE: MutableMapping[str, str] = shared_dict(
+    "hospital_engine", json.loads(os.getenv("COUNTER_ENGINE_BY_HOSPITAL", "") or "{}"))
+
+# Several frames of one hospital go into a single vision request (split into chunks)
+VISION_MAX_IMAGES_PER_CALL = max(1, int(os.getenv("VISION_MAX_IMAGES_PER_CALL", "4")))
+LOCAL_COUNTER_WORKERS = int(os.getenv("LOCAL_COUNTER_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+
+OPENAI_MODEL = os.getenv("OPENAI_VISION_MODEL", "gpt-5-nano")  # fixed default
+# per vision request; the SDK default (10 min, 2 retries) would outlive any request
+VISION_TIMEOUT_S = float(os.getenv("VISION_TIMEOUT_S", "20"))
+VISION_MAX_RETRIES = int(os.getenv("VISION_MAX_RETRIES", "1"))
+_OPENAI_CLIENT = None
+try:
+    from openai import OpenAI
+    if os.getenv("OPENAI_API_KEY"):
+        _OPENAI_CLIENT = OpenAI(timeout=VISION_TIMEOUT_S, max_retries=VISION_MAX_RETRIES)
+except Exception:
+    _OPENAI_CLIENT = None
+
+class PeopleCounter(abc.ABC):
+    """
+    A headcount backend: per-image people counts, in input order. `scopes`
+    names each image's camera (or hospital); engines that cache counts only
+    reuse one within the same scope, and never for images without one.
+    """
+    name = "base"
+
+    def ready(self) -> bool:
+        return True
+
+    @abc.abstractmethod
+    def count_many(self, images: List[bytes], scopes: Optional[Sequence[Optional[str]]] = None) -> List[int]:
+        ...
+
+    def count_many_b64(self, images_b64: List[str], scopes: Optional[Sequence[Optional[str]]] = None) -> List[int]:
+        return self.count_many([base64.b64decode(b64) for b64 in images_b64], scopes)
+
+class HeuristicCounter(PeopleCounter):
+    """Deterministic fake counts (demo only) for when no real engine is configured."""
+    name = "heuristic"
+
+    def count_many(self, images: List[bytes], scopes: Optional[Sequence[Optional[str]]] = None) -> List[int]:
+        return self.count_many_b64([base64.b64encode(img).decode("ascii") for img in images])
+
+    def count_many_b64(self, images_b64: List[str], scopes: Optional[Sequence[Optional[str]]] = None) -> List[int]:
+        out = []
+        for b64 in images_b64:
+            h = int(hashlib.sha256(b64[:1024].encode("utf-8")).hexdigest(), 16)
+            out.append(random.Random(h).randint(1, 8))
+        return out
+
+class OpenAICounter(PeopleCounter):
+    """
+    OpenAI vision. Frames that match one recently counted for the same camera
+    (perceptual hash) are answered from cache; the rest are packed VISION_MAX_IMAGES_PER_CALL
+    per chat-completions request.
+    """
+    name = "openai"
+
+    def __init__(self, client=None, model: str = OPENAI_MODEL):
+        self.client, self.model = client, model
+
+    def ready(self) -> bool:
+        return self.client is not None
+
+    def count_many(self, images: List[bytes], scopes: Optional[Sequence[Optional[str]]] = None) -> List[int]:
+        return self.count_many_b64([base64.b64encode(img).decode("ascii") for img in images], scopes)
+
+    def count_many_b64(self, images_b64: List[str], scopes: Optional[Sequence[Optional[str]]] = None) -> List[int]:
+        out: List[Optional[int]] = [None] * len(images_b64)
+        scopes = list(scopes) if scopes is not None else [None] * len(images_b64)
+        hashes = [dhash_b64(b64) if scope is not None else None for b64, scope in zip(images_b64, scopes)]
+        pending = []
+        for i, ph in enumerate(hashes):
+            # near-identical frame from this camera counted recently (static waiting room) -> reuse that headcount
+            out[i] = frame_counts.get(scopes[i], ph)
+            if out[i] is None:
+                pending.append(i)
+        count_cache("vision_frames", hits=len(out) - len(pending), misses=len(pending))
+        for k in range(0, len(pending), VISION_MAX_IMAGES_PER_CALL):
+            chunk = pending[k:k + VISION_MAX_IMAGES_PER_CALL]
+            for i, people in zip(chunk, self._request([images_b64[i] for i in chunk])):
+                out[i] = people
+                frame_counts.put(scopes[i], hashes[i], people)
+        return [int(c or 0) for c in out]
+
+    @timed("openai")
+    def _request(self, images_b64: List[str]) -> List[int]:
+        n = len(images_b64)
+        if n == 1:
+            prompt = (
+                "Count the number of distinct people visible in the photo. "
+                "Return JSON like {\"people\": <integer>} with no extra text."
+            )
+        else:
+            prompt = (
+                f"You are given {n} photos from different cameras, in order. "
+                "Count the number of distinct people visible in each photo separately. "
+                f"Return JSON like {{\"counts\": [<integer>, ...]}} with exactly {n} integers "
+                "in photo order and no extra text."
+            )
+        content = [{"type": "text", "text": prompt}] + [
+            {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{b64}"}} for b64 in images_b64
+        ]
+        resp = self.client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": content}],
+            response_format={"type": "json_object"},
+        )
+        data = json.loads(resp.choices[0].message.content)
+        if n == 1:
+            return [max(0, int(data.get("people", 0)))]
+        counts = data.get("counts")
+        if not isinstance(counts, list) or len(counts) != n:
+            # model ignored the shape: fall back to one frame per call for this chunk
+            return [self._request([b64])[0] for b64 in images_b64]
+        return [max(0, int(c)) for c in counts]
+
+class OpenCVCounter(PeopleCounter):
+    """Local CPU HOG person detector, run in a process pool (no GPU, no API cost)."""
+    name = "opencv"
+
+    def __init__(self, workers: int = LOCAL_COUNTER_WORKERS):
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def ready(self) -> bool:
+        return local_vision.available()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=local_vision.init_worker)
+            return self._pool
+
+    def count_many(self, images: List[bytes], scopes: Optional[Sequence[Optional[str]]] = None) -> List[int]:
+        if not images:
+            return []
+        return [c or 0 for c in self._executor().map(local_vision.count_people_jpeg, images)]
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+_COUNTERS: Dict[str, PeopleCounter] = {
+    "openai": OpenAICounter(_OPENAI_CLIENT, OPENAI_MODEL),
+    "opencv": OpenCVCounter(),
+    "heuristic": HeuristicCounter(),
+}
+
+def is_openai_ready() -> bool:
+    return _OPENAI_CLIENT is not None
+
+def set_hospital_engine(hospital_id: str, engine: Optional[str]) -> None:
+    if engine:
+        resolve_engine(engine)  # validate
+        _HOSPITAL_ENGINE[hospital_id] = engine
+    else:
+        _HOSPITAL_ENGINE.pop(hospital_id, None)
+
+def resolve_engine(engine: Optional[str] = None, hospital_id: Optional[str] = None) -> str:
+    """Request engine > per-hospital engine > PEOPLE_COUNTER_ENGINE."""
+    name = engine or (_HOSPITAL_ENGINE.get(hospital_id) if hospital_id else None) or DEFAULT_ENGINE
+    if name not in _COUNTERS:
+        raise ValueError(f"Unknown people-counter engine '{name}' (choose from {', '.join(_COUNTERS)})")
+    return name
+
+def get_counter(engine: Optional[str] = None, hospital_id: Optional[str] = None) -> PeopleCounter:
+    return _COUNTERS[resolve_engine(engine, hospital_id)]
+
+def shutdown_counters() -> None:
+    for c in _COUNTERS.values():
+        if isinstance(c, OpenCVCounter):
+            c.shutdown()
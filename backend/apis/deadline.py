@@ -0,0 +1,57 @@
+# apis/deadline.py
+# One latency budget per request, shared by all of its stages (Places, Routes,
+# cameras, vision, MySQL). A stage that would overrun returns its fallback
+# instead, and the request records which stages were cut short.
+import os, asyncio, time
+from typing import Any, Awaitable, Iterable, List, Optional, Set, TypeVar
+
+REQUEST_BUDGET_MS = int(os.getenv("REQUEST_BUDGET_MS", "5000"))
+REQUEST_BUDGET_MAX_MS = int(os.getenv("REQUEST_BUDGET_MAX_MS", "30000"))
+REQUEST_BUDGET_RESERVE_MS = int(os.getenv("REQUEST_BUDGET_RESERVE_MS", "100"))  # kept back to build the response
+# upper bound on the share of what's left that Places / Routes may use, so later stages still get a turn
+PLACES_BUDGET_SHARE = float(os.getenv("PLACES_BUDGET_SHARE", "0.5"))
+ROUTES_BUDGET_SHARE = float(os.getenv("ROUTES_BUDGET_SHARE", "0.6"))
+MIN_STAGE_S = 0.02  # not worth starting a stage with less than this
+
+T = TypeVar("T")
+
+class Deadline:
+    def __init__(self, budget_ms: Optional[int] = None):
+        self.budget_ms = min(budget_ms or REQUEST_BUDGET_MS, REQUEST_BUDGET_MAX_MS)
+        self.expires = time.monotonic() + max(0, self.budget_ms - REQUEST_BUDGET_RESERVE_MS) / 1000.0
+        self.degraded: List[str] = []
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+    def degrade(self, stage: str) -> None:
+        if stage not in self.degraded:
+            self.degraded.append(stage)
+
+    async def run(self, stage: str, aw: Awaitable[T], fallback: Any = None, *, share: float = 1.0) -> T:
+        """`await aw` within `share` of the remaining budget; past that, cancel it, mark `stage` degraded and return `fallback`."""
+        left = self.remaining() * share
+        if left < MIN_STAGE_S:
+            if asyncio.iscoroutine(aw):
+                aw.close()
+            self.degrade(stage)
+            return fallback
+        try:
+            return await asyncio.wait_for(aw, left)
+        except asyncio.TimeoutError:
+            self.degrade(stage)
+            return fallback
+
+# tasks that outlived their request's budget; they finish in the background so
+# their results (headcounts, waits) still land in the caches for the next request
+_background: Set["asyncio.Task[Any]"] = set()
+
+def detach(tasks: Iterable["asyncio.Task[Any]"]) -> None:
+    for t in tasks:
+        _background.add(t)
+        t.add_done_callback(_forget)
+
+def _forget(t: "asyncio.Task[Any]") -> None:
+    _background.discard(t)
+    if not t.cancelled():
+        t.exception()  # retrieved, so a failure isn't logged as "never retrieved"
@@ -0,0 +1,87 @@
+# apis/frame_cache.py
+import base64, io, os, threading, time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+# Pillow is optional here: without it every frame is simply a cache miss
+try:
+    from PIL import Image
+except Exception:
+    Image = None
+
+FRAME_CACHE_ENABLED = os.getenv("FRAME_CACHE_ENABLED", "1") != "0"
+FRAME_CACHE_HAMMING = int(os.getenv("FRAME_CACHE_HAMMING", "4"))    # of 64 bits
+FRAME_CACHE_TTL = float(os.getenv("FRAME_CACHE_TTL_SECONDS", "120"))
+FRAME_CACHE_MAX_ENTRIES = int(os.getenv("FRAME_CACHE_MAX_ENTRIES", "512"))
+
+def dhash(img_bytes: bytes) -> Optional[int]:
+    """64-bit difference hash: grayscale 9x8 thumbnail, one bit per horizontal gradient."""
+    if Image is None or not img_bytes:
+        return None
+    try:
+        im = Image.open(io.BytesIO(img_bytes))
+        im.draft("L", (64, 64))  # JPEG: let the decoder downscale via DCT, much cheaper than a full decode
+        px = im.convert("L").resize((9, 8), Image.BILINEAR).tobytes()  # one byte per pixel
+    except Exception:
+        return None
+    h = 0
+    for row in range(8):
+        for col in range(8):
+            h = (h << 1) | (px[row * 9 + col] > px[row * 9 + col + 1])
+    return h
+
+def dhash_b64(img_b64: str) -> Optional[int]:
+    try:
+        return dhash(base64.b64decode(img_b64, validate=False))
+    except Exception:
+        return None
+
+class FrameCountCache:
+    """
+    Recently counted frames by (scope, perceptual hash). A frame within
+    `max_distance` bits of a cached one from the same scope (camera, or
+    hospital when the camera is unknown) and younger than `ttl` reuses that
+    headcount; different cameras never share counts, however alike the frames.
+    """
+
+    def __init__(self, maxsize: int = FRAME_CACHE_MAX_ENTRIES, ttl: float = FRAME_CACHE_TTL, max_distance: int = FRAME_CACHE_HAMMING):
+        self.maxsize, self.ttl, self.max_distance = maxsize, ttl, max_distance
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[tuple, tuple]" = OrderedDict()  # (scope, hash) -> (ts, people)
+        self._lock = threading.Lock()
+
+    def get(self, scope: Optional[Hashable], h: Optional[int]) -> Optional[int]:
+        if scope is None or h is None or not FRAME_CACHE_ENABLED:
+            return None
+        now = time.time()
+        with self._lock:
+            best = None
+            for k, (ts, people) in list(self._data.items()):
+                if now - ts > self.ttl:
+                    del self._data[k]
+                    continue
+                if k[0] != scope:
+                    continue
+                d = (k[1] ^ h).bit_count()
+                if d <= self.max_distance and (best is None or d < best[0]):
+                    best = (d, k, people)
+                    if d == 0:
+                        break
+            if best is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(best[1])
+            self.hits += 1
+            return best[2]
+
+    def put(self, scope: Optional[Hashable], h: Optional[int], people: int) -> None:
+        if scope is None or h is None or not FRAME_CACHE_ENABLED:
+            return
+        with self._lock:
+            self._data[(scope, h)] = (time.time(), int(people))
+            self._data.move_to_end((scope, h))
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+frame_counts = FrameCountCache()
@@ -0,0 +1,114 @@
+# apis/geo.py
+import math
+from typing import List, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+# ---------------- Geohash (base32, interleaved lng/lat bits) ----------------
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_DECODE = {c: i for i, c in enumerate(_BASE32)}
+
+def geohash_encode(lat: float, lng: float, precision: int = 6) -> str:
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    out, bits, ch, even = [], 0, 0, True
+    while len(out) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if lng >= mid:
+                ch = (ch << 1) | 1
+                lng_lo = mid
+            else:
+                ch <<= 1
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                ch = (ch << 1) | 1
+                lat_lo = mid
+            else:
+                ch <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            out.append(_BASE32[ch])
+            bits, ch = 0, 0
+    return "".join(out)
+
+def geohash_bounds(cell: str) -> Tuple[float, float, float, float]:
+    """Return (min_lat, max_lat, min_lng, max_lng) of a geohash cell."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    even = True
+    for c in cell:
+        v = _DECODE[c]
+        for shift in (4, 3, 2, 1, 0):
+            bit = (v >> shift) & 1
+            if even:
+                mid = (lng_lo + lng_hi) / 2
+                if bit: lng_lo = mid
+                else: lng_hi = mid
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                if bit: lat_lo = mid
+                else: lat_hi = mid
+            even = not even
+    return lat_lo, lat_hi, lng_lo, lng_hi
+
+def geohash_neighbors(cell: str) -> List[str]:
+    """The (up to) 8 cells surrounding `cell`, same precision."""
+    min_lat, max_lat, min_lng, max_lng = geohash_bounds(cell)
+    dlat, dlng = max_lat - min_lat, max_lng - min_lng
+    clat, clng = (min_lat + max_lat) / 2, (min_lng + max_lng) / 2
+    out = []
+    for i in (-1, 0, 1):
+        for j in (-1, 0, 1):
+            if i == 0 and j == 0:
+                continue
+            lat = clat + i * dlat
+            if lat <= -90.0 or lat >= 90.0:
+                continue
+            lng = (clng + j * dlng + 180.0) % 360.0 - 180.0
+            n = geohash_encode(lat, lng, len(cell))
+            if n != cell and n not in out:
+                out.append(n)
+    return out
+
+def deg_box(lat: float, lng: float, radius_m: float) -> Tuple[float, float, float, float]:
+    """(min_lat, max_lat, min_lng, max_lng) enclosing a radius_m circle (longitude widened at the far edge)."""
+    dlat = radius_m / 111_000.0
+    min_lat, max_lat = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+    dlng = radius_m / (111_000.0 * max(0.1, math.cos(math.radians(min(89.9, max(abs(min_lat), abs(max_lat)))))))
+    return min_lat, max_lat, lng - dlng, lng + dlng
+
+def geohash_cover(min_lat: float, max_lat: float, min_lng: float, max_lng: float, precision: int) -> List[str]:
+    """Every geohash cell of `precision` that intersects the box."""
+    c_lat_lo, c_lat_hi, c_lng_lo, c_lng_hi = geohash_bounds(geohash_encode(min_lat, min_lng, precision))
+    step_lat, step_lng = c_lat_hi - c_lat_lo, c_lng_hi - c_lng_lo
+    out = []
+    y = c_lat_lo + step_lat / 2
+    while y - step_lat / 2 <= max_lat:
+        x = c_lng_lo + step_lng / 2
+        while x - step_lng / 2 <= max_lng:
+            out.append(geohash_encode(y, x, precision))
+            x += step_lng
+        y += step_lat
+    return out
+
+# ---------------- Distances ----------------
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def haversine_km_many(lat: float, lng: float, lats, lngs) -> np.ndarray:
+    """Vectorised great-circle distance from one origin to many points."""
+    p1 = math.radians(lat)
+    p2 = np.radians(np.asarray(lats, dtype=np.float64))
+    dl = np.radians(np.asarray(lngs, dtype=np.float64) - lng)
+    a = np.sin((p2 - p1) / 2) ** 2 + math.cos(p1) * np.cos(p2) * np.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(a)))
@@ -0,0 +1,63 @@
+# apis/http_clients.py
+import os
+from typing import Optional
+
+import httpx
+
+# HTTP/2 needs the optional `h2` package (pip install "httpx[http2]")
+try:
+    import h2  # noqa: F401
+    HTTP2 = os.getenv("HTTP2_ENABLED", "1") != "0"
+except ImportError:
+    HTTP2 = False
+
+def _pool(name: str, *, max_conn: int, keepalive: int, timeout: float) -> dict:
+    """Per-upstream pool settings, overridable via HTTP_<NAME>_{MAX_CONNECTIONS,KEEPALIVE,TIMEOUT_S}."""
+    p = f"HTTP_{name.upper()}_"
+    return {
+        "limits": httpx.Limits(
+            max_connections=int(os.getenv(p + "MAX_CONNECTIONS", str(max_conn))),
+            max_keepalive_connections=int(os.getenv(p + "KEEPALIVE", str(keepalive))),
+            keepalive_expiry=30.0,
+        ),
+        "timeout": httpx.Timeout(float(os.getenv(p + "TIMEOUT_S", str(timeout))), connect=5.0),
+    }
+
+# Google endpoints; overridable so bench/ can point them at local stand-ins
+PLACES_URL = os.getenv("GOOGLE_PLACES_URL", "https://places.googleapis.com/v1/places:searchNearby")
+ROUTES_URL = os.getenv("GOOGLE_ROUTES_URL", "https://routes.googleapis.com/distanceMatrix/v2:computeRouteMatrix")
+
+PLACES_POOL = _pool("places", max_conn=50, keepalive=20, timeout=12.0)
+ROUTES_POOL = _pool("routes", max_conn=50, keepalive=20, timeout=12.0)
+CAMERAS_POOL = _pool("cameras", max_conn=100, keepalive=40, timeout=6.0)
+
+class HttpClients:
+    """One keep-alive pool per upstream, shared by every (async) route."""
+
+    def __init__(self):
+        self.places = httpx.AsyncClient(http2=HTTP2, **PLACES_POOL)
+        self.routes = httpx.AsyncClient(http2=HTTP2, **ROUTES_POOL)
+        # camera agents are plain HTTP/1.1 on the LAN
+        self.cameras = httpx.AsyncClient(**CAMERAS_POOL)
+
+    async def aclose(self) -> None:
+        for c in (self.places, self.routes, self.cameras):
+            await c.aclose()
+
+_CLIENTS: Optional[HttpClients] = None
+
+def open_clients() -> HttpClients:
+    global _CLIENTS
+    if _CLIENTS is None:
+        _CLIENTS = HttpClients()
+    return _CLIENTS
+
+async def close_clients() -> None:
+    global _CLIENTS
+    if _CLIENTS is not None:
+        await _CLIENTS.aclose()
+        _CLIENTS = None
+
+def get_http() -> HttpClients:
+    """FastAPI dependency; opened by the app lifespan (lazily if running without it)."""
+    return open_clients()
@@ -0,0 +1,50 @@
+# apis/ingest.py
+# Raw frame uploads: JPEG bytes straight from the request body (no base64, no JSON),
+# for edge devices pushing to /camera-frame/raw and /wait-time/raw.
+import os
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from starlette.datastructures import UploadFile
+
+INGEST_MAX_FRAME_BYTES = int(os.getenv("INGEST_MAX_FRAME_BYTES", str(8 * 1024 * 1024)))
+INGEST_MAX_FRAMES = int(os.getenv("INGEST_MAX_FRAMES", "16"))
+# multipart field names that don't identify a camera
+_GENERIC_FIELDS = {"image", "images", "frame", "frames", "file", "files"}
+
+async def _read_body(request: Request) -> bytes:
+    chunks, size = [], 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > INGEST_MAX_FRAME_BYTES:
+            raise HTTPException(413, f"frame larger than {INGEST_MAX_FRAME_BYTES} bytes")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+async def read_frames(request: Request, camera_id: Optional[str] = None) -> List[Tuple[Optional[str], bytes]]:
+    """
+    (camera_id, jpeg) pairs from either
+      - a single frame as the body (application/octet-stream or image/*), or
+      - multipart/form-data with one file part per camera; a non-generic field
+        name (e.g. "lobby") becomes the camera_id.
+    """
+    ct = request.headers.get("content-type", "")
+    if ct.startswith("multipart/form-data"):
+        form = await request.form(max_files=INGEST_MAX_FRAMES)
+        frames = []
+        try:
+            for field, value in form.multi_items():
+                if not isinstance(value, UploadFile):
+                    continue
+                if value.size is not None and value.size > INGEST_MAX_FRAME_BYTES:
+                    raise HTTPException(413, f"frame larger than {INGEST_MAX_FRAME_BYTES} bytes")
+                data = await value.read()
+                if data:
+                    frames.append((None if field.lower() in _GENERIC_FIELDS else field, data))
+        finally:
+            await form.close()
+        return frames
+    if ct.startswith(("application/octet-stream", "image/")) or not ct:
+        data = await _read_body(request)
+        return [(camera_id, data)] if data else []
+    raise HTTPException(415, "Send multipart/form-data, application/octet-stream or image/jpeg")
@@ -1,11 +1,13 @@
 # apis/live_status.py
-import base64, asyncio
-from typing import List, Dict, Any, Optional, Tuple
-import httpx
-from fastapi import APIRouter, HTTPException
+import asyncio
+from typing import List, Dict, Any, Optional
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel, Field
 
-from .wait_time import _count_people_from_image_b64, is_openai_ready  # reuse strict counter
+from .wait_time import _count_people_batch_bytes, _engine_or_400, counter_ready, is_openai_ready  # reuse strict counter
+from .http_clients import HttpClients, get_http
+from .camera_fetch import count_frames, fetch_frame
+from .preprocess import stats as preprocess_stats
 
 router = APIRouter(prefix="/live-status", tags=["live-status"])
 
@@ -13,6 +15,7 @@ class LiveQuery(BaseModel):
     hospital_id: str = Field(..., description="Target hospital for display purposes")
     camera_urls: List[str] = Field(..., description="List of http(s) URLs that return a fresh JPEG (e.g., /capture.jpg)")
     per_person_minutes: Optional[int] = Field(None, ge=1, le=60)
+    engine: Optional[str] = Field(None, description="People counter: openai | opencv (default: per hospital, then PEOPLE_COUNTER_ENGINE)")
 
 class LiveResult(BaseModel):
     hospital_id: str
@@ -22,40 +25,35 @@ class LiveResult(BaseModel):
     cameras: List[Dict[str, Any]]
     stored: bool = False  # privacy: nothing persisted
 
-async def _fetch_image(url: str, client: httpx.AsyncClient) -> Tuple[Optional[bytes], Optional[str]]:
-    try:
-        r = await client.get(url, timeout=8)
-        r.raise_for_status()
-        data = r.content or b""
-        if len(data) < 100:  # tiny responses are likely errors
-            return None, f"tiny_response len={len(data)} ct={r.headers.get('content-type','n/a')}"
-        return data, None
-    except Exception as e:
-        return None, f"{type(e).__name__}: {e}"
-
 @router.post("", response_model=LiveResult, summary="On-demand webcam capture and headcount (no persistence)")
-async def live_status(q: LiveQuery):
+async def live_status(q: LiveQuery, http: HttpClients = Depends(get_http)):
     if not q.camera_urls:
         raise HTTPException(400, "camera_urls required")
-    if not is_openai_ready():
-        raise HTTPException(500, "OpenAI vision is not configured. Set OPENAI_API_KEY (and OPENAI_VISION_MODEL).")
+    engine = _engine_or_400(q.engine, q.hospital_id)
+    if not counter_ready(engine):
+        if engine == "openai":
+            raise HTTPException(500, "OpenAI vision is not configured. Set OPENAI_API_KEY (and OPENAI_VISION_MODEL).")
+        raise HTTPException(500, f"People counter '{engine}' is not available on this node.")
 
-    async with httpx.AsyncClient() as client:
-        results = await asyncio.gather(*(_fetch_image(u, client) for u in q.camera_urls))
+    results = await asyncio.gather(*(fetch_frame(u, http.cameras) for u in q.camera_urls))
+
+    try:
+        # unchanged frames reuse their headcount; the rest go in one (chunked) vision request, off the event loop
+        counts = await asyncio.to_thread(
+            count_frames, q.camera_urls, results,
+            lambda imgs, scopes: _count_people_batch_bytes(imgs, require_openai=True, engine=engine, scopes=scopes),
+            hospital_id=q.hospital_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Vision error: {e}")
 
     cam_records, total_people = [], 0
-    for i, (img, err) in enumerate(results):
+    for i, (f, n) in enumerate(zip(results, counts)):
         cam_id = f"cam-{i+1}"
-        if not img:
-            cam_records.append({"camera_id": cam_id, "people": 0, "status": "no_image", "error": err})
+        if n is None:
+            cam_records.append({"camera_id": cam_id, "people": 0, "status": "no_image", "error": f.error})
             continue
-        b64 = base64.b64encode(img).decode("ascii")
-        try:
-            n = _count_people_from_image_b64(b64, require_openai=True)  # << force OpenAI
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Vision error ({cam_id}): {e}")
         total_people += n
-        cam_records.append({"camera_id": cam_id, "people": n, "status": "ok", "engine": "openai"})
+        cam_records.append({"camera_id": cam_id, "people": n, "status": "ok", "engine": engine, "changed": f.changed})
 
     per_person = q.per_person_minutes or 10
     est = int(total_people * per_person)
@@ -70,4 +68,4 @@ async def live_status(q: LiveQuery):
 
 @router.get("/health")
 def health():
-    return {"openai_ready": is_openai_ready()}
+    return {"openai_ready": is_openai_ready(), "opencv_ready": counter_ready("opencv"), "preprocess": preprocess_stats.snapshot()}
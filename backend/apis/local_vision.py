@@ -0,0 +1,45 @@
+# apis/local_vision.py
+# CPU people detection with OpenCV's HOG + linear SVM pedestrian model.
+# Kept free of app imports: this module is what the counter's worker processes load.
+import os
+from typing import Optional
+
+import numpy as np
+
+try:
+    import cv2
+except Exception:
+    cv2 = None
+
+HOG_MAX_WIDTH = int(os.getenv("HOG_MAX_WIDTH", "640"))
+HOG_MIN_WEIGHT = float(os.getenv("HOG_MIN_WEIGHT", "0.5"))
+HOG_WIN_STRIDE = int(os.getenv("HOG_WIN_STRIDE", "8"))
+HOG_SCALE = float(os.getenv("HOG_SCALE", "1.05"))
+
+_HOG = None
+
+def available() -> bool:
+    return cv2 is not None and hasattr(cv2, "HOGDescriptor")
+
+def init_worker() -> None:
+    """Process-pool initializer: build the detector once per worker, single-threaded."""
+    global _HOG
+    cv2.setNumThreads(1)
+    _HOG = cv2.HOGDescriptor()
+    _HOG.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+
+def count_people_jpeg(img: bytes) -> Optional[int]:
+    """People in one encoded image, or None if it can't be decoded."""
+    if _HOG is None:
+        init_worker()
+    frame = cv2.imdecode(np.frombuffer(img, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if frame is None:
+        return None
+    h, w = frame.shape[:2]
+    if w > HOG_MAX_WIDTH:
+        frame = cv2.resize(frame, (HOG_MAX_WIDTH, int(h * HOG_MAX_WIDTH / w)), interpolation=cv2.INTER_AREA)
+    rects, weights = _HOG.detectMultiScale(
+        frame, winStride=(HOG_WIN_STRIDE, HOG_WIN_STRIDE), padding=(8, 8), scale=HOG_SCALE)
+    if len(rects) == 0:
+        return 0
+    return int(np.sum(np.asarray(weights).reshape(-1) >= HOG_MIN_WEIGHT))
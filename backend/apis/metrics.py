@@ -0,0 +1,188 @@
+# apis/metrics.py
+# Per-stage timings (Places, Routes, camera fetch, people counting, OpenAI,
+# MySQL) and cache hit/miss counters. They are kept in in-process histograms
+# and served in Prometheus text format on GET /metrics, and each response gets
+# a Server-Timing header with its own stages. Every worker process has its own
+# numbers (scrape each worker, or run one).
+import os, time, bisect, asyncio, functools, threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "1") != "0"  # header reveals internal stages to clients
+BUCKETS = tuple(float(b) for b in os.getenv(
+    "METRICS_BUCKETS_S", "0.001,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30").split(","))
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+def _escape(v: Any) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Histogram:
+    """Cumulative-bucket latency histogram per label set (Prometheus semantics). Thread-safe."""
+
+    def __init__(self, name: str, doc: str, labels: Tuple[str, ...], buckets: Tuple[float, ...] = BUCKETS):
+        self.name, self.doc, self.labels, self.buckets = name, doc, labels, tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List[float]] = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, values: Tuple[str, ...], seconds: float) -> None:
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            s = self._series.get(values)
+            if s is None:
+                s = self._series[values] = [0.0] * (len(self.buckets) + 2)
+            s[i] += 1
+            s[-1] += seconds
+
+    def render(self) -> List[str]:
+        out = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: list(v) for k, v in sorted(self._series.items())}
+        for values, s in series.items():
+            acc = 0.0
+            for le, n in zip((*[f"{b:g}" for b in self.buckets], "+Inf"), s[:-1]):
+                acc += n
+                bucket = 'le="' + le + '"'
+                out.append(f"{self.name}_bucket{_labels(self.labels, values, bucket)} {acc:g}")
+            out.append(f"{self.name}_sum{_labels(self.labels, values)} {s[-1]:.6f}")
+            out.append(f"{self.name}_count{_labels(self.labels, values)} {acc:g}")
+        return out
+
+class Counter:
+    """Monotonic counter per label set. Thread-safe."""
+
+    def __init__(self, name: str, doc: str, labels: Tuple[str, ...]):
+        self.name, self.doc, self.labels = name, doc, labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, values: Tuple[str, ...], n: float = 1.0) -> None:
+        with self._lock:
+            self._values[values] = self._values.get(values, 0.0) + n
+
+    def render(self) -> List[str]:
+        out = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        out.extend(f"{self.name}{_labels(self.labels, k)} {v:g}" for k, v in values)
+        return out
+
+stage_seconds = Histogram("hospital_stage_duration_seconds", "Time per call of an instrumented stage.", ("stage",))
+stage_errors = Counter("hospital_stage_errors_total", "Stage calls that raised (including cancellation by a deadline).", ("stage",))
+cache_lookups = Counter("hospital_cache_lookups_total", "Cache lookups by cache and result (hit / miss / stale).", ("cache", "result"))
+http_seconds = Histogram("hospital_http_request_duration_seconds", "Time to the response headers, per route.",
+                         ("method", "route", "status"))
+_REGISTRY = (http_seconds, stage_seconds, stage_errors, cache_lookups)
+
+# ---------------- per-request stage totals (Server-Timing) ----------------
+# One dict per request, shared (not copied) by the tasks and threads the request
+# starts, since they inherit this context: stage -> [total ms, calls].
+_request_stages: ContextVar[Optional[Dict[str, List[float]]]] = ContextVar("request_stages", default=None)
+_stages_lock = threading.Lock()
+
+def record(stage: str, seconds: float, ok: bool = True) -> None:
+    if not METRICS_ENABLED:
+        return
+    stage_seconds.observe((stage,), seconds)
+    if not ok:
+        stage_errors.inc((stage,))
+    stages = _request_stages.get()
+    if stages is not None:
+        with _stages_lock:
+            s = stages.setdefault(stage, [0.0, 0])
+            s[0] += seconds * 1000.0
+            s[1] += 1
+
+@contextmanager
+def timing(stage: str) -> Iterator[None]:
+    """Time the block as `stage` (an error if it raises), e.g. only the upstream call on a cache miss."""
+    t0, ok = time.perf_counter(), False
+    try:
+        yield
+        ok = True
+    finally:
+        record(stage, time.perf_counter() - t0, ok)
+
+def timed(stage: str) -> Callable[[F], F]:
+    """Decorator: time every call of a sync or async function as `stage`."""
+    def wrap(fn: F) -> F:
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def run_async(*args: Any, **kwargs: Any) -> Any:
+                with timing(stage):
+                    return await fn(*args, **kwargs)
+            return run_async  # type: ignore[return-value]
+
+        @functools.wraps(fn)
+        def run(*args: Any, **kwargs: Any) -> Any:
+            with timing(stage):
+                return fn(*args, **kwargs)
+        return run  # type: ignore[return-value]
+    return wrap
+
+def count_cache(cache: str, hits: int = 0, misses: int = 0, stale: int = 0) -> None:
+    if not METRICS_ENABLED:
+        return
+    for result, n in (("hit", hits), ("miss", misses), ("stale", stale)):
+        if n:
+            cache_lookups.inc((cache, result), n)
+
+def server_timing(stages: Dict[str, List[float]], total_s: float) -> str:
+    with _stages_lock:
+        items = [(name, ms, n) for name, (ms, n) in stages.items()]
+    parts = [f"{name};dur={ms:.1f}" + (f';desc="x{int(n)}"' if n > 1 else "") for name, ms, n in items]
+    parts.append(f"total;dur={total_s * 1000.0:.1f}")
+    return ", ".join(parts)
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware: per-route request histogram, plus a Server-Timing header
+    with the stages run before the headers went out (for streamed responses
+    that is the part before the first event).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            return await self.app(scope, receive, send)
+        stages: Dict[str, List[float]] = {}
+        token = _request_stages.set(stages)
+        t0 = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - t0
+                route = getattr(scope.get("route"), "path", None) or "unmatched"
+                http_seconds.observe((scope.get("method", ""), route, str(message["status"])), elapsed)
+                if SERVER_TIMING_ENABLED:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", server_timing(stages, elapsed).encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_stages.reset(token)
+
+def render() -> str:
+    return "\n".join(line for m in _REGISTRY for line in m.render()) + "\n"
+
+router = APIRouter(tags=["metrics"])
+
+@router.get("/metrics", summary="Prometheus metrics (this worker)", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,36 +1,388 @@
 # apis/mysql_client.py
-import os
+import os, re, time, logging, threading, functools
+from decimal import Decimal
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
-from sqlalchemy import create_engine, text
+from sqlalchemy import bindparam, create_engine, make_url, text
 from sqlalchemy.engine import Engine, RowMapping
+from sqlalchemy.sql.elements import TextClause
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from dotenv import load_dotenv
 
+from .cache import TTLCache
+from .spatial_index import hospital_index
+from .geo import deg_box, geohash_cover, geohash_encode, haversine_km
+from .metrics import timed
+
 load_dotenv()
 
+# Two engines on the same database: the async one (aiomysql) serves request
+# handlers without taking a threadpool slot per query; the sync one (pymysql)
+# is for the write-behind thread, startup index load and CLI scripts.
+MYSQL_POOL_SIZE = int(os.getenv("MYSQL_POOL_SIZE", "10"))          # per engine, per worker
+MYSQL_MAX_OVERFLOW = int(os.getenv("MYSQL_MAX_OVERFLOW", "20"))
+MYSQL_POOL_TIMEOUT_S = float(os.getenv("MYSQL_POOL_TIMEOUT_S", "10"))
+MYSQL_ASYNC_DRIVER = os.getenv("MYSQL_ASYNC_DRIVER", "aiomysql")
+# full SQLAlchemy URL instead of MYSQL_HOST/PORT/...; `sqlite:///path.db` runs on a local file (offline benchmarks)
+MYSQL_URL = os.getenv("MYSQL_URL", "")
+_ASYNC_DRIVERS = {"mysql": MYSQL_ASYNC_DRIVER, "sqlite": "aiosqlite"}
+
 _engine: Optional[Engine] = None
+_async_engine: Optional[AsyncEngine] = None
 
-def _dsn_from_env() -> str:
+def _dsn_from_env(driver: str = "pymysql") -> str:
+    if MYSQL_URL:
+        url = make_url(MYSQL_URL)
+        if driver != "pymysql":
+            url = url.set(drivername=f"{url.get_backend_name()}+{_ASYNC_DRIVERS[url.get_backend_name()]}")
+        return url.render_as_string(hide_password=False)
     host = os.getenv("MYSQL_HOST", "127.0.0.1")
     port = int(os.getenv("MYSQL_PORT", "3306"))
     user = os.getenv("MYSQL_USER", "root")
     pw = os.getenv("MYSQL_PASSWORD", "")
     db = os.getenv("MYSQL_DB", "hackathon")
-    return f"mysql+pymysql://{user}:{pw}@{host}:{port}/{db}?charset=utf8mb4"
+    return f"mysql+{driver}://{user}:{pw}@{host}:{port}/{db}?charset=utf8mb4"
+
+def _pool_options() -> Dict[str, Any]:
+    return {"pool_size": MYSQL_POOL_SIZE, "max_overflow": MYSQL_MAX_OVERFLOW, "pool_timeout": MYSQL_POOL_TIMEOUT_S,
+            "pool_pre_ping": True, "pool_recycle": 1800}
 
 def db() -> Engine:
     global _engine
     if _engine is None:
-        _engine = create_engine(_dsn_from_env(), pool_pre_ping=True, pool_recycle=1800, future=True)
+        _engine = create_engine(_dsn_from_env(), future=True, **_pool_options())
     return _engine
 
+def adb() -> AsyncEngine:
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_engine(_dsn_from_env(MYSQL_ASYNC_DRIVER), **_pool_options())
+    return _async_engine
+
+async def dispose_engines() -> None:
+    global _engine, _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+    if _engine is not None:
+        _engine.dispose()
+        _engine = None
+
+# ---------------- geohash column (indexed spatial lookups) ----------------
+# `hospitals.geohash` holds a precision-9 cell (~5 m); a radius query becomes a
+# handful of index range scans (one per covering cell) instead of a table scan.
+# Added to existing tables by migrate_geohash(); until then queries fall back
+# to the lat/lng box and writes leave the column out.
+GEOHASH_PRECISION = 9
+NEAR_MAX_CELLS = int(os.getenv("NEAR_MAX_CELLS", "64"))  # covering cells per query (finer cells = tighter scans)
+
+_has_geohash: Optional[bool] = None
+_HAS_GEOHASH_SQL = text("""
+    SELECT COUNT(*) FROM information_schema.COLUMNS
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'hospitals' AND COLUMN_NAME = 'geohash'
+""")
+_HAS_GEOHASH_SQLITE = text("SELECT COUNT(*) FROM pragma_table_info('hospitals') WHERE name = 'geohash'")
+
+def _has_geohash_sql(dialect: str) -> TextClause:
+    return _HAS_GEOHASH_SQLITE if dialect == "sqlite" else _HAS_GEOHASH_SQL
+
+def has_geohash_column() -> bool:
+    global _has_geohash
+    if _has_geohash is None:
+        with db().connect() as conn:
+            _has_geohash = bool(conn.execute(_has_geohash_sql(conn.dialect.name)).scalar())
+    return _has_geohash
+
+async def has_geohash_column_async() -> bool:
+    global _has_geohash
+    if _has_geohash is None:
+        async with adb().connect() as conn:
+            _has_geohash = bool((await conn.execute(_has_geohash_sql(conn.dialect.name))).scalar())
+    return _has_geohash
+
+def _geohash(lat: Any, lng: Any) -> Optional[str]:
+    if lat is None or lng is None:
+        return None
+    return geohash_encode(float(lat), float(lng), GEOHASH_PRECISION)
+
+@timed("mysql.migrate_geohash")
+def migrate_geohash(batch: int = 5000) -> int:
+    """Add the geohash column + index if missing and backfill rows without one. Returns rows backfilled."""
+    global _has_geohash
+    _has_geohash = None
+    if not has_geohash_column():
+        with db().begin() as conn:
+            conn.execute(text(
+                f"ALTER TABLE hospitals ADD COLUMN geohash CHAR({GEOHASH_PRECISION}) "
+                "CHARACTER SET ascii COLLATE ascii_bin NULL, ADD INDEX ix_hospitals_geohash (geohash)"))
+        _has_geohash = True
+    select = text("""
+        SELECT hospital_id, lat, lng FROM hospitals
+        WHERE geohash IS NULL AND lat IS NOT NULL AND lng IS NOT NULL LIMIT :n
+    """)
+    update = text("UPDATE hospitals SET geohash=:geohash WHERE hospital_id=:hospital_id")
+    done = 0
+    while True:
+        with db().begin() as conn:
+            rows = conn.execute(select, {"n": batch}).mappings().all()
+            if not rows:
+                return done
+            conn.execute(update, [{"hospital_id": r["hospital_id"], "geohash": _geohash(r["lat"], r["lng"])} for r in rows])
+        done += len(rows)
+
 def now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
-def upsert_hospitals(rows: List[Dict[str, Any]]) -> None:
-    if not rows:
+# ---------------- change detection + write-behind ----------------
+# Rows are hashed (static columns and wait columns separately, updated_at ignored)
+# and only changed parts are written. Writes are queued per hospital_id, coalesced,
+# and flushed in one transaction when the batch fills or the oldest is too old.
+# Reads in this process overlay the queue, so they see writes not yet flushed.
+MYSQL_WRITE_BEHIND = os.getenv("MYSQL_WRITE_BEHIND", "1") != "0"
+WRITE_BEHIND_BATCH = int(os.getenv("WRITE_BEHIND_BATCH", "200"))
+WRITE_BEHIND_MAX_DELAY_S = float(os.getenv("WRITE_BEHIND_MAX_DELAY_S", "0.5"))
+
+STATIC_COLS = ("name", "lat", "lng", "maps_url")
+WAIT_COLS = ("last_people", "per_person_minutes", "doctors_working", "estimated_wait_minutes", "wait_last_updated")
+
+log = logging.getLogger(__name__)
+
+def _norm_value(v: Any) -> Any:
+    if isinstance(v, (float, Decimal)):
+        return round(float(v), 7)
+    if isinstance(v, datetime):
+        # DATETIME columns drop tz and sub-second precision
+        return v.replace(tzinfo=None, microsecond=0)
+    return v
+
+def _content_hash(row: Dict[str, Any], cols: Tuple[str, ...]) -> int:
+    return hash(tuple(_norm_value(row.get(c)) for c in cols))
+
+# hospital_id -> (static hash, wait hash) of what MySQL holds (or will, once queued writes flush)
+_row_hashes = TTLCache(int(os.getenv("ROW_HASH_MAX_ENTRIES", "100000")), float(os.getenv("ROW_HASH_TTL_SECONDS", "86400")))
+
+def _remember_rows(rows) -> None:
+    for r in rows:
+        _row_hashes.set(r["hospital_id"], (_content_hash(r, STATIC_COLS), _content_hash(r, WAIT_COLS)))
+
+_UPSERT_SQL = text("""
+    INSERT INTO hospitals
+    (hospital_id, name, lat, lng, maps_url,
+    last_people, per_person_minutes, doctors_working, estimated_wait_minutes,
+    wait_last_updated, updated_at)
+    VALUES
+    (:hospital_id, :name, :lat, :lng, :maps_url,
+    :last_people, :per_person_minutes, :doctors_working, :estimated_wait_minutes,
+    :wait_last_updated, :updated_at)
+    ON DUPLICATE KEY UPDATE
+    name=VALUES(name),
+    lat=VALUES(lat),
+    lng=VALUES(lng),
+    maps_url=VALUES(maps_url),
+    last_people=VALUES(last_people),
+    per_person_minutes=VALUES(per_person_minutes),
+    doctors_working=VALUES(doctors_working),
+    estimated_wait_minutes=VALUES(estimated_wait_minutes),
+    wait_last_updated=VALUES(wait_last_updated),
+    updated_at=VALUES(updated_at)
+""")
+
+# same statement, also keeping hospitals.geohash in step with lat/lng
+_UPSERT_GEOHASH_SQL = text(_UPSERT_SQL.text
+    .replace("wait_last_updated, updated_at)", "wait_last_updated, updated_at, geohash)", 1)
+    .replace(":wait_last_updated, :updated_at)", ":wait_last_updated, :updated_at, :geohash)", 1)
+    .replace("updated_at=VALUES(updated_at)", "updated_at=VALUES(updated_at),\n    geohash=VALUES(geohash)", 1))
+
+_UPDATE_WAITS_SQL = text("""
+    UPDATE hospitals SET
+    last_people=:last_people,
+    per_person_minutes=:per_person_minutes,
+    doctors_working=:doctors_working,
+    estimated_wait_minutes=:estimated_wait_minutes,
+    wait_last_updated=:wait_last_updated,
+    updated_at=:updated_at
+    WHERE hospital_id=:hospital_id
+""")
+_EXISTING_IDS_SQL = text("SELECT hospital_id FROM hospitals WHERE hospital_id IN :ids").bindparams(bindparam("ids", expanding=True))
+
+@functools.lru_cache(maxsize=None)
+def _sqlite_upsert(sql: str) -> TextClause:
+    sql = sql.replace("ON DUPLICATE KEY UPDATE", "ON CONFLICT (hospital_id) DO UPDATE SET")
+    return text(re.sub(r"VALUES\((\w+)\)", r"excluded.\1", sql))
+
+def _upsert(stmt: TextClause, dialect: str) -> TextClause:
+    """`stmt` as written for MySQL, or its ON CONFLICT twin on SQLite."""
+    return _sqlite_upsert(stmt.text) if dialect == "sqlite" else stmt
+
+def _with_geohash(full: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # wait-only rows upserted in full may lack static columns the caller never knew: those stay NULL
+    return [{**dict.fromkeys(STATIC_COLS), **r, "geohash": _geohash(r.get("lat"), r.get("lng"))} for r in full]
+
+def _unmatched(waits: List[Dict[str, Any]], found: Iterable[str]) -> List[Dict[str, Any]]:
+    """Wait updates whose hospital row isn't among `found`."""
+    found = set(found)
+    return [r for r in waits if r["hospital_id"] not in found]
+
+@timed("mysql.write_rows")
+def _write_rows(full: List[Dict[str, Any]], waits: List[Dict[str, Any]]) -> None:
+    """
+    Full upserts and wait-only updates in one transaction. A wait update that
+    matches no row (never upserted, or deleted) falls back to the full upsert
+    instead of being lost.
+    """
+    if not full and not waits:
         return
+    geohash = has_geohash_column()
+    with db().begin() as conn:
+        if waits and conn.execute(_UPDATE_WAITS_SQL, waits).rowcount < len(waits):
+            found = conn.execute(_EXISTING_IDS_SQL, {"ids": [r["hospital_id"] for r in waits]}).scalars().all()
+            full = full + _unmatched(waits, found)
+        if full:
+            conn.execute(_upsert(_UPSERT_GEOHASH_SQL if geohash else _UPSERT_SQL, conn.dialect.name), _with_geohash(full))
+
+@timed("mysql.write_rows_async")
+async def _write_rows_async(full: List[Dict[str, Any]], waits: List[Dict[str, Any]]) -> None:
+    if not full and not waits:
+        return
+    geohash = await has_geohash_column_async()
+    async with adb().begin() as conn:
+        if waits and (await conn.execute(_UPDATE_WAITS_SQL, waits)).rowcount < len(waits):
+            found = (await conn.execute(_EXISTING_IDS_SQL, {"ids": [r["hospital_id"] for r in waits]})).scalars().all()
+            full = full + _unmatched(waits, found)
+        if full:
+            await conn.execute(_upsert(_UPSERT_GEOHASH_SQL if geohash else _UPSERT_SQL, conn.dialect.name), _with_geohash(full))
+
+class WriteBehind:
+    """
+    Pending writes keyed by hospital_id. A newer write for the same hospital
+    replaces (or, for a wait-only update over a pending full row, merges into)
+    the queued one, so each flush writes every hospital at most once.
+    """
+
+    def __init__(self, batch: int = WRITE_BEHIND_BATCH, max_delay: float = WRITE_BEHIND_MAX_DELAY_S):
+        self.batch, self.max_delay = max(1, batch), max_delay
+        self._pending: Dict[str, Tuple[str, Dict[str, Any]]] = {}  # id -> ("full" | "wait", row)
+        self._oldest: Optional[float] = None
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def put(self, kind: str, rows: List[Dict[str, Any]]) -> None:
+        with self._cond:
+            for r in rows:
+                hid = r["hospital_id"]
+                self._pending[hid] = self._coalesce(self._pending.get(hid), (kind, r))
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="mysql-write-behind", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    @staticmethod
+    def _coalesce(older: Optional[Tuple[str, Dict[str, Any]]], newer: Tuple[str, Dict[str, Any]]) -> Tuple[str, Dict[str, Any]]:
+        """One queued write for both: a wait-only update lands on top of a full row, otherwise the newer wins."""
+        if older is not None and older[0] == "full" and newer[0] == "wait":
+            return "full", {**older[1], **_wait_update(newer[1])}
+        return newer
+
+    def pending(self, hospital_id: str) -> bool:
+        with self._cond:
+            return hospital_id in self._pending
+
+    def overlay(self, hospital_id: str, row: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """`row` as it will be once pending writes land (None stays None for a wait-only update)."""
+        with self._cond:
+            item = self._pending.get(hospital_id)
+        if item is None:
+            return row
+        kind, pending = item
+        if kind == "wait" and row is None:
+            return None
+        return {**(row or {}), **pending}
+
+    def _take(self) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+        batch, self._pending, self._oldest = self._pending, {}, None
+        return batch
+
+    def flush(self) -> None:
+        with self._cond:
+            batch = self._take()
+        self._write(batch)
+
+    def _write(self, batch: Dict[str, Tuple[str, Dict[str, Any]]]) -> bool:
+        if not batch:
+            return True
+        full = [r for kind, r in batch.values() if kind == "full"]
+        waits = [r for kind, r in batch.values() if kind == "wait"]
+        try:
+            _write_rows(full, waits)
+        except Exception as e:
+            log.warning("write-behind flush of %d rows failed, requeued: %s", len(batch), e)
+            with self._cond:
+                for hid, item in batch.items():
+                    newer = self._pending.get(hid)
+                    self._pending[hid] = item if newer is None else self._coalesce(item, newer)
+                if self._pending and self._oldest is None:
+                    self._oldest = time.monotonic()
+            return False
+        return True
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._closed:
+                    if len(self._pending) >= self.batch:
+                        break
+                    if self._oldest is not None:
+                        left = self._oldest + self.max_delay - time.monotonic()
+                        if left <= 0:
+                            break
+                        self._cond.wait(left)
+                    else:
+                        self._cond.wait()
+                closing = self._closed
+                batch = self._take()
+            ok = self._write(batch)
+            if closing:
+                return  # close() makes one last attempt
+            if not ok:
+                time.sleep(1.0)  # MySQL down: don't spin
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        self.flush()
+        self._closed = False
+        if self._pending:
+            log.warning("write-behind: %d rows not written at close", len(self._pending))
+
+write_behind = WriteBehind()
+
+def _queue(full: List[Dict[str, Any]], waits: List[Dict[str, Any]]) -> None:
+    if full:
+        write_behind.put("full", full)
+    if waits:
+        write_behind.put("wait", waits)
+
+async def _enqueue_async(full: List[Dict[str, Any]], waits: List[Dict[str, Any]]) -> None:
+    if MYSQL_WRITE_BEHIND:
+        _queue(full, waits)  # no I/O here; the write-behind thread does the writing
+    else:
+        await _write_rows_async(full, waits)
+
+@timed("mysql.close_writes")
+def close_writes() -> None:
+    """Stop the write-behind thread after writing everything queued (shutdown)."""
+    write_behind.close()
+
+def _classify(rows: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """(all rows normalised, rows needing a full upsert, wait-only updates)."""
     # Normalize keys and ensure all columns exist
     norm = []
     for r in rows:
@@ -47,49 +399,200 @@ def upsert_hospitals(rows: List[Dict[str, Any]]) -> None:
             "updated_at": r.get("updated_at") or datetime.utcnow(),
             "doctors_working": r.get("doctors_working"),
         })
-    sql = text("""
-        INSERT INTO hospitals
-        (hospital_id, name, lat, lng, maps_url,
-        last_people, per_person_minutes, doctors_working, estimated_wait_minutes,
-        wait_last_updated, updated_at)
-        VALUES
-        (:hospital_id, :name, :lat, :lng, :maps_url,
-        :last_people, :per_person_minutes, :doctors_working, :estimated_wait_minutes,
-        :wait_last_updated, :updated_at)
-        ON DUPLICATE KEY UPDATE
-        name=VALUES(name),
-        lat=VALUES(lat),
-        lng=VALUES(lng),
-        maps_url=VALUES(maps_url),
-        last_people=VALUES(last_people),
-        per_person_minutes=VALUES(per_person_minutes),
-        doctors_working=VALUES(doctors_working),
-        estimated_wait_minutes=VALUES(estimated_wait_minutes),
-        wait_last_updated=VALUES(wait_last_updated),
-        updated_at=VALUES(updated_at)
-    """)
+    # unchanged rows are skipped, rows whose static info didn't change only get their wait columns written
+    full, wait_only = [], []
+    for r in norm:
+        known = _row_hashes.get(r["hospital_id"])
+        if known is None or known[0] != _content_hash(r, STATIC_COLS):
+            full.append(r)
+        elif known[1] != _content_hash(r, WAIT_COLS):
+            wait_only.append(r)
+    return norm, full, wait_only
+
+def _wait_update(r: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: r[k] for k in ("hospital_id", *WAIT_COLS, "updated_at")}
+
+@timed("mysql.upsert_hospitals_async")
+async def upsert_hospitals_async(rows: List[Dict[str, Any]]) -> None:
+    if not rows:
+        return
+    norm, full, wait_only = _classify(rows)
+    await _enqueue_async(full, wait_only)  # whole rows: a wait update that finds no row is upserted
+    _remember_rows(full + wait_only)
+    hospital_index.upsert(norm)
+
+@timed("mysql.upsert_hospitals_static")
+def upsert_hospitals_static(rows: List[Dict[str, Any]]) -> None:
+    """Insert/refresh only id/name/lat/lng/maps_url; existing wait columns are left alone (registry imports)."""
+    if not rows:
+        return
+    norm = [{
+        "hospital_id": r.get("hospital_id"),
+        "name": r.get("name"),
+        "lat": r.get("lat"),
+        "lng": r.get("lng"),
+        "maps_url": r.get("maps_url"),
+        "updated_at": r.get("updated_at") or datetime.utcnow(),
+    } for r in rows]
+    if has_geohash_column():
+        sql = text("""
+            INSERT INTO hospitals (hospital_id, name, lat, lng, maps_url, updated_at, geohash)
+            VALUES (:hospital_id, :name, :lat, :lng, :maps_url, :updated_at, :geohash)
+            ON DUPLICATE KEY UPDATE
+            name=VALUES(name),
+            lat=VALUES(lat),
+            lng=VALUES(lng),
+            maps_url=COALESCE(VALUES(maps_url), maps_url),
+            updated_at=VALUES(updated_at),
+            geohash=VALUES(geohash)
+        """)
+        params = [{**r, "geohash": _geohash(r["lat"], r["lng"])} for r in norm]
+    else:
+        sql = text("""
+            INSERT INTO hospitals (hospital_id, name, lat, lng, maps_url, updated_at)
+            VALUES (:hospital_id, :name, :lat, :lng, :maps_url, :updated_at)
+            ON DUPLICATE KEY UPDATE
+            name=VALUES(name),
+            lat=VALUES(lat),
+            lng=VALUES(lng),
+            maps_url=COALESCE(VALUES(maps_url), maps_url),
+            updated_at=VALUES(updated_at)
+        """)
+        params = norm
     with db().begin() as conn:
-        conn.execute(sql, norm)
+        conn.execute(_upsert(sql, conn.dialect.name), params)
+    hospital_index.upsert(norm)
+
+def _changed_waits(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    norm = [{
+        "hospital_id": r.get("hospital_id"),
+        **{k: r.get(k) for k in STATIC_COLS},  # only used if the row turns out not to exist
+        "last_people": r.get("last_people"),
+        "per_person_minutes": r.get("per_person_minutes"),
+        "doctors_working": r.get("doctors_working"),
+        "estimated_wait_minutes": r.get("estimated_wait_minutes"),
+        "wait_last_updated": r.get("wait_last_updated") or datetime.utcnow(),
+        "updated_at": r.get("updated_at") or datetime.utcnow(),
+    } for r in rows]
+    changed = []
+    for r in norm:
+        known = _row_hashes.get(r["hospital_id"])
+        if known is None or known[1] != _content_hash(r, WAIT_COLS):
+            changed.append(r)
+            if known is not None:
+                _row_hashes.set(r["hospital_id"], (known[0], _content_hash(r, WAIT_COLS)))
+    return changed
+
+@timed("mysql.update_hospital_waits_async")
+async def update_hospital_waits_async(rows: List[Dict[str, Any]]) -> None:
+    if rows:
+        await _enqueue_async([], _changed_waits(rows))
+
+@timed("mysql.load_hospital_index")
+def load_hospital_index() -> int:
+    """Fill the in-process spatial index from every hospital row we know about."""
+    sql = text("SELECT hospital_id, name, lat, lng, maps_url FROM hospitals WHERE lat IS NOT NULL AND lng IS NOT NULL")
+    with db().connect() as conn:
+        rows = conn.execute(sql).mappings().all()
+    hospital_index.upsert(dict(r) for r in rows)
+    return len(rows)
+
+_COLUMNS = """hospital_id, name, lat, lng, maps_url,
+    last_people, per_person_minutes, estimated_wait_minutes, wait_last_updated, updated_at, doctors_working"""
 
+_BBOX_SQL = text(f"""
+    SELECT {_COLUMNS}
+    FROM hospitals
+    WHERE lat BETWEEN :min_lat AND :max_lat
+      AND lng BETWEEN :min_lng AND :max_lng
+""")
+_BY_IDS_SQL = text(f"SELECT {_COLUMNS} FROM hospitals WHERE hospital_id IN :ids").bindparams(bindparam("ids", expanding=True))
+
+def _box_params(min_lat: float, max_lat: float, min_lng: float, max_lng: float) -> Dict[str, float]:
+    return {"min_lat": min_lat, "max_lat": max_lat, "min_lng": min_lng, "max_lng": max_lng}
+
+def _overlaid(rows) -> List[Dict[str, Any]]:
+    return [write_behind.overlay(r["hospital_id"], dict(r)) for r in rows]
+
+@timed("mysql.fetch_hospitals_in_bbox")
 def fetch_hospitals_in_bbox(min_lat: float, max_lat: float, min_lng: float, max_lng: float) -> List[Dict[str, Any]]:
-    sql = text("""
-        SELECT hospital_id, name, lat, lng, maps_url,
-               last_people, per_person_minutes, estimated_wait_minutes, wait_last_updated, updated_at, doctors_working
+    with db().connect() as conn:
+        rows = conn.execute(_BBOX_SQL, _box_params(min_lat, max_lat, min_lng, max_lng)).mappings().all()
+    return _overlaid(rows)
+
+@timed("mysql.fetch_hospitals_in_bbox_async")
+async def fetch_hospitals_in_bbox_async(min_lat: float, max_lat: float, min_lng: float, max_lng: float) -> List[Dict[str, Any]]:
+    async with adb().connect() as conn:
+        rows = (await conn.execute(_BBOX_SQL, _box_params(min_lat, max_lat, min_lng, max_lng))).mappings().all()
+    return _overlaid(rows)
+
+def _near_precision(min_lat: float, max_lat: float, min_lng: float, max_lng: float) -> int:
+    """Finest geohash precision (<= 7) whose cells cover the box in at most NEAR_MAX_CELLS."""
+    for p in range(7, 0, -1):
+        lng_bits = (5 * p + 1) // 2
+        cell_lat, cell_lng = 180.0 / 2 ** (5 * p - lng_bits), 360.0 / 2 ** lng_bits
+        cells = (int((max_lat - min_lat) / cell_lat) + 2) * (int((max_lng - min_lng) / cell_lng) + 2)
+        if cells <= NEAR_MAX_CELLS:
+            return p
+    return 1
+
+def near_query(min_lat: float, max_lat: float, min_lng: float, max_lng: float):
+    """(statement, params) selecting the rows of the covering geohash cells inside the box."""
+    cells = geohash_cover(min_lat, max_lat, min_lng, max_lng, _near_precision(min_lat, max_lat, min_lng, max_lng))
+    ranges = " OR ".join(f"geohash BETWEEN :lo{i} AND :hi{i}" for i in range(len(cells)))
+    params: Dict[str, Any] = _box_params(min_lat, max_lat, min_lng, max_lng)
+    for i, cell in enumerate(cells):
+        # every precision-9 hash with this prefix sorts between cell and cell+"zz.."
+        params[f"lo{i}"], params[f"hi{i}"] = cell, cell.ljust(GEOHASH_PRECISION, "z")
+    sql = text(f"""
+        SELECT {_COLUMNS}
         FROM hospitals
-        WHERE lat BETWEEN :min_lat AND :max_lat
+        WHERE ({ranges})
+          AND lat BETWEEN :min_lat AND :max_lat
           AND lng BETWEEN :min_lng AND :max_lng
     """)
-    with db().begin() as conn:
-        rows = conn.execute(sql, {"min_lat": min_lat, "max_lat": max_lat, "min_lng": min_lng, "max_lng": max_lng}).mappings().all()
-    return [dict(r) for r in rows]
-
-def fetch_hospital_by_id(hospital_id: str) -> Optional[Dict[str, Any]]:
-    sql = text("""
-        SELECT hospital_id, name, lat, lng, maps_url,
-               last_people, per_person_minutes, estimated_wait_minutes, wait_last_updated, updated_at, doctors_working
-        FROM hospitals WHERE hospital_id=:hospital_id
-        LIMIT 1
-    """)
-    with db().begin() as conn:
-        row = conn.execute(sql, {"hospital_id": hospital_id}).mappings().first()
-    return dict(row) if row else None
+    return sql, params
+
+def _within(lat: float, lng: float, radius_m: float, rows: List[Dict[str, Any]], limit: Optional[int]) -> List[Dict[str, Any]]:
+    out = []
+    for row in rows:
+        d = haversine_km(lat, lng, float(row["lat"]), float(row["lng"]))
+        if d * 1000.0 <= radius_m:
+            out.append({**row, "distance_km": round(d, 2)})
+    out.sort(key=lambda r: r["distance_km"])
+    return out[:limit] if limit else out
+
+@timed("mysql.fetch_hospitals_near_async")
+async def fetch_hospitals_near_async(lat: float, lng: float, radius_m: float, *, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Hospitals within radius_m, nearest first, each with a `distance_km`.
+    With the geohash column this is one index range per covering cell; without
+    it (not migrated yet) the plain lat/lng box scan.
+    """
+    box = deg_box(lat, lng, radius_m)
+    if await has_geohash_column_async():
+        async with adb().connect() as conn:
+            rows = _overlaid((await conn.execute(*near_query(*box))).mappings().all())
+    else:
+        rows = await fetch_hospitals_in_bbox_async(*box)
+    return _within(lat, lng, radius_m, rows, limit)
+
+def _by_ids(ids: List[str], rows) -> Dict[str, Dict[str, Any]]:
+    found = {r["hospital_id"]: dict(r) for r in rows}
+    # what MySQL holds is the baseline for change detection (unless a newer write is queued)
+    _remember_rows(r for hid, r in found.items() if not write_behind.pending(hid))
+    out = {}
+    for hid in ids:
+        row = write_behind.overlay(hid, found.get(hid))
+        if row is not None:
+            out[hid] = row
+    return out
+
+@timed("mysql.fetch_hospitals_by_ids_async")
+async def fetch_hospitals_by_ids_async(hospital_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    ids = list(dict.fromkeys(i for i in hospital_ids if i))
+    if not ids:
+        return {}
+    async with adb().connect() as conn:
+        rows = (await conn.execute(_BY_IDS_SQL, {"ids": ids})).mappings().all()
+    return _by_ids(ids, rows)
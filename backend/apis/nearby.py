@@ -1,23 +1,38 @@
-import os, requests, random, base64, math
+import os, random, math, asyncio, logging
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timezone, timedelta
 
-from fastapi import APIRouter, HTTPException
+import httpx
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 load_dotenv()
 
-from .mysql_client import upsert_hospitals, fetch_hospitals_in_bbox, fetch_hospital_by_id, now_iso
-from .wait_time import _count_people_from_image_b64, is_openai_ready
+from .mysql_client import upsert_hospitals_async, update_hospital_waits_async, fetch_hospitals_by_ids_async, fetch_hospitals_near_async
+from .wait_time import _count_people_batch_bytes, counter_ready, get_camera_wait, set_wait_for_hospital, wait_age_seconds
+from .counters import get_counter
+from .singleflight import SingleFlight, origin_key
+from .http_clients import PLACES_URL, ROUTES_URL, HttpClients, get_http
+from .camera_fetch import count_frames, fetch_frame
+from .spatial_index import hospital_index
+from .cache import get_cached_places, put_cached_places, get_cached_routes, put_cached_route
+from .deadline import PLACES_BUDGET_SHARE, REQUEST_BUDGET_MAX_MS, ROUTES_BUDGET_SHARE, Deadline, detach
+from .camera_poller import poll_hospital
+from .shared_store import store_call
+from .metrics import count_cache, timed, timing
+from .recommend import straight_line_stats
 
 router = APIRouter(prefix="/nearby-hospitals", tags=["nearby-hospitals"])
+log = logging.getLogger(__name__)
 
 # Config
 API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
 if not API_KEY:
     raise RuntimeError("Set GOOGLE_MAPS_API_KEY in .env")
 
-CACHE_TTL = int(os.getenv("CACHE_TTL_SECONDS", "300"))  # 5 min
+CACHE_TTL = int(os.getenv("CACHE_TTL_SECONDS", "300"))  # 5 min; soft TTL of the camera target's wait
+# older than CACHE_TTL but within this: served at once while a background recapture runs
+WAIT_HARD_TTL = max(CACHE_TTL, int(os.getenv("NEARBY_WAIT_HARD_TTL_SECONDS", "1800")))
 RADIUS_M_DEFAULT = 10_000
 
 # Camera config for FIRST hospital
@@ -25,6 +40,10 @@ PRIMARY_CAMERA_ID = os.getenv("PRIMARY_CAMERA_ID", "").strip()
 PRIMARY_CAMERA_URLS = [u.strip() for u in os.getenv("PRIMARY_CAMERA_URLS", "").split(";") if u.strip()]
 PER_PERSON_FOR_CAMERA = int(os.getenv("PER_PERSON_FOR_CAMERA", "10"))
 
+# Offline-first candidates: answer from the in-memory hospital index when Places
+# was asked about this area recently (or always, with NEARBY_OFFLINE_ONLY=1)
+NEARBY_OFFLINE_ONLY = os.getenv("NEARBY_OFFLINE_ONLY", "0") == "1"
+
 # RNG fallback (others)
 RNG_MIN_PEOPLE = 20
 RNG_MAX_PEOPLE = 80
@@ -38,26 +57,53 @@ class Query(BaseModel):
     lng: float
     max_results: int = Field(20, ge=1, le=20)
     radius_m: int = Field(RADIUS_M_DEFAULT, ge=1000, le=20000)
+    budget_ms: Optional[int] = Field(None, ge=100, le=REQUEST_BUDGET_MAX_MS,
+                                     description="Latency budget for the whole request, ms (default REQUEST_BUDGET_MS)")
 
-def _deg_box(lat: float, radius_m: float) -> Tuple[float, float, float, float]:
-    dlat = radius_m / 111_000.0
-    dlng = radius_m / (111_000.0 * max(0.1, math.cos(math.radians(lat))))
-    return lat - dlat, lat + dlat, ( -180.0 ), ( 180.0 )  # lng limits handled separately
-
-def _is_fresh_wait(row, now_utc, ttl_sec: int) -> bool:
+def _wait_age_seconds(row, now_utc) -> Optional[float]:
     ts = row.get("wait_last_updated")
     if not ts:
-        return False
+        return None
     if isinstance(ts, str):
         try:
             ts = datetime.fromisoformat(ts.replace("Z", "+00:00"))
         except Exception:
-            return False
+            return None
     delta = (now_utc - ts) if getattr(ts, "tzinfo", None) else (datetime.utcnow() - ts)
-    return delta.total_seconds() <= ttl_sec
+    return delta.total_seconds()
 
-def _places_nearby_hospitals(lat: float, lng: float, *, max_results: int, radius_m: int) -> List[Dict[str, Any]]:
-    url = "https://places.googleapis.com/v1/places:searchNearby"
+def _is_fresh_wait(row, now_utc, ttl_sec: int) -> bool:
+    age = _wait_age_seconds(row, now_utc)
+    return age is not None and age <= ttl_sec
+
+def _polled_row(row: Dict[str, Any], hospital_id: str, polled: Dict[str, Any], polled_age: float, now: datetime) -> Dict[str, Any]:
+    """`row` with its wait columns taken from a wait-store record `polled_age` seconds old."""
+    return {
+        **row,
+        "hospital_id": hospital_id,
+        "last_people": polled.get("people"),
+        "per_person_minutes": polled.get("per_person_minutes"),
+        "doctors_working": polled.get("doctors_working"),
+        "estimated_wait_minutes": polled.get("estimated_wait_minutes"),
+        "wait_last_updated": now - timedelta(seconds=polled_age),
+        "updated_at": now,
+    }
+
+# one background recapture per hospital at a time
+_revalidating: Dict[str, "asyncio.Task[Any]"] = {}
+
+def _revalidate(hospital_id: str, http: HttpClients) -> None:
+    """Recapture + count in the background; the result lands in the wait store and MySQL (see poll_hospital)."""
+    if hospital_id in _revalidating:
+        return
+    task = asyncio.create_task(poll_hospital(hospital_id, PRIMARY_CAMERA_URLS, client=http.cameras),
+                               name=f"revalidate:{hospital_id}")
+    _revalidating[hospital_id] = task
+    task.add_done_callback(lambda t: _revalidating.pop(hospital_id, None))
+    detach([task])
+
+async def _places_nearby_hospitals(lat: float, lng: float, *, client: httpx.AsyncClient, max_results: int, radius_m: int) -> List[Dict[str, Any]]:
+    url = PLACES_URL
     headers = {
         "Content-Type": "application/json",
         "X-Goog-Api-Key": API_KEY,
@@ -68,11 +114,16 @@ def _places_nearby_hospitals(lat: float, lng: float, *, max_results: int, radius
         "maxResultCount": max_results,
         "locationRestriction": {"circle": {"center": {"latitude": lat, "longitude": lng}, "radius": float(radius_m)}}
     }
-    r = requests.post(url, headers=headers, json=body, timeout=12)
-    if not r.ok:
-        raise HTTPException(status_code=r.status_code, detail=r.text)
+    raw = get_cached_places(lat, lng, radius_m=radius_m, max_results=max_results)
+    if raw is None:
+        with timing("places"):
+            r = await client.post(url, headers=headers, json=body)
+            if not r.is_success:
+                raise HTTPException(status_code=r.status_code, detail=r.text)
+        raw = r.json().get("places", [])
+        put_cached_places(lat, lng, raw, radius_m=radius_m, max_results=max_results)
     out = []
-    for p in r.json().get("places", []):
+    for p in raw:
         loc = p.get("location", {})
         name = (p.get("displayName") or {}).get("text")
         pid = p.get("id") or (p.get("name") or "").split("/", 1)[-1]
@@ -82,9 +133,13 @@ def _places_nearby_hospitals(lat: float, lng: float, *, max_results: int, radius
         out.append({"hospital_id": pid, "name": name, "lat": loc["latitude"], "lng": loc["longitude"], "maps_url": maps})
     return out
 
-def _route_matrix(origin_lat: float, origin_lng: float, dests: List[Dict[str, Any]]):
-    if not dests: return []
-    url = "https://routes.googleapis.com/distanceMatrix/v2:computeRouteMatrix"
+async def _route_matrix(origin_lat: float, origin_lng: float, dests: List[Dict[str, Any]], *, client: httpx.AsyncClient) -> Dict[int, Tuple[Optional[float], Optional[float]]]:
+    """(distance_km, eta_minutes) per destination index; only cache misses go to Routes."""
+    if not dests: return {}
+    stats, missing = get_cached_routes(origin_lat, origin_lng, [d.get("hospital_id") for d in dests])
+    if not missing:
+        return stats
+    url = ROUTES_URL
     headers = {
         "Content-Type": "application/json",
         "X-Goog-Api-Key": API_KEY,
@@ -92,14 +147,26 @@ def _route_matrix(origin_lat: float, origin_lng: float, dests: List[Dict[str, An
     }
     body = {
         "origins": [{"waypoint": {"location": {"latLng": {"latitude": origin_lat, "longitude": origin_lng}}}}],
-        "destinations": [{"waypoint": {"location": {"latLng": {"latitude": d['lat'], "longitude": d['lng']}}}} for d in dests],
+        "destinations": [{"waypoint": {"location": {"latLng": {"latitude": dests[i]['lat'], "longitude": dests[i]['lng']}}}} for i in missing],
         "travelMode": "DRIVE",
         "routingPreference": "TRAFFIC_AWARE_OPTIMAL"
     }
-    r = requests.post(url, headers=headers, json=body, timeout=12)
-    if not r.ok:
-        raise HTTPException(status_code=r.status_code, detail=r.text)
-    return r.json()
+    with timing("routes"):
+        r = await client.post(url, headers=headers, json=body)
+        if not r.is_success:
+            raise HTTPException(status_code=r.status_code, detail=r.text)
+    for row in r.json():
+        if row.get("status", {}).get("code"):
+            continue
+        if row.get("condition") != "ROUTE_EXISTS":
+            continue
+        di = missing[row["destinationIndex"]]
+        dist_km = round(row.get("distanceMeters", 0) / 1000.0, 2) if "distanceMeters" in row else None
+        dur_s = _parse_duration_seconds(row.get("duration"))
+        eta_min = round(dur_s / 60.0, 1) if dur_s else None
+        stats[di] = (dist_km, eta_min)
+        put_cached_route(origin_lat, origin_lng, dests[di].get("hospital_id"), dist_km, eta_min)
+    return stats
 
 def _parse_duration_seconds(val: str) -> Optional[float]:
     if isinstance(val, str) and val.endswith("s"):
@@ -107,57 +174,87 @@ def _parse_duration_seconds(val: str) -> Optional[float]:
         except: return None
     return None
 
-def _fetch_camera_bytes(url: str, timeout: float = 6.0) -> Optional[bytes]:
+@timed("cameras")
+async def _capture_and_count(camera_urls: List[str], *, client: httpx.AsyncClient, hospital_id: Optional[str] = None) -> Tuple[int, List[Dict[str, Any]]]:
+    if not camera_urls or not counter_ready(hospital_id=hospital_id):
+        return 0, []
+    engine = get_counter(hospital_id=hospital_id).name
+    frames = await asyncio.gather(*(fetch_frame(u, client) for u in camera_urls))
+    # unchanged frames reuse their headcount; the rest go in one (chunked) counting call, off the event loop
+    counts = await asyncio.to_thread(
+        count_frames, camera_urls, frames,
+        lambda imgs, scopes: _count_people_batch_bytes(imgs, require_openai=True, engine=engine, scopes=scopes),
+        hospital_id=hospital_id)
+    cams: List[Dict[str, Any]] = []
+    for i, (f, n) in enumerate(zip(frames, counts)):
+        if n is None:
+            cams.append({"camera_id": f"cam-{i+1}", "people": 0, "status": "no_image"})
+        else:
+            cams.append({"camera_id": f"cam-{i+1}", "people": n, "status": "ok", "engine": engine, "changed": f.changed})
+    return sum(c["people"] for c in cams), cams
+
+async def _known_near(q: Query, dl: Deadline) -> List[Dict[str, Any]]:
+    local = hospital_index.near(q.lat, q.lng, q.radius_m, limit=q.max_results)
+    if local or len(hospital_index):
+        return local
+    # index never loaded (MySQL was down at startup): ask the table directly
     try:
-        rr = requests.get(url, timeout=timeout)
-        if not rr.ok: return None
-        data = rr.content or b""
-        return data if len(data) >= 100 else None
+        return await dl.run("db", fetch_hospitals_near_async(q.lat, q.lng, q.radius_m, limit=q.max_results), [])
     except Exception:
-        return None
+        return []
 
-def _capture_and_count(camera_urls: List[str]) -> Tuple[int, List[Dict[str, Any]]]:
-    if not camera_urls or not is_openai_ready():
-        return 0, []
-    people, cams = 0, []
-    for i, u in enumerate(camera_urls):
-        img = _fetch_camera_bytes(u)
-        if not img:
-            cams.append({"camera_id": f"cam-{i+1}", "people": 0, "status": "no_image"})
-            continue
-        b64 = base64.b64encode(img).decode("ascii")
-        n = _count_people_from_image_b64(b64, require_openai=True)
-        people += n
-        cams.append({"camera_id": f"cam-{i+1}", "people": n, "status": "ok", "engine": "openai"})
-    return people, cams
+async def _candidates(q: Query, http: HttpClients, dl: Deadline) -> List[Dict[str, Any]]:
+    if NEARBY_OFFLINE_ONLY or hospital_index.seen_recently(q.lat, q.lng, q.radius_m, q.max_results):
+        local = await _known_near(q, dl)
+        if local or NEARBY_OFFLINE_ONLY:
+            count_cache("hospital_index", hits=1)
+            return local
+    count_cache("hospital_index", misses=1)
+    try:
+        places = await dl.run("places", _places_nearby_hospitals(
+            q.lat, q.lng, client=http.places, max_results=q.max_results, radius_m=q.radius_m), share=PLACES_BUDGET_SHARE)
+        error = None
+    except (HTTPException, httpx.HTTPError) as e:
+        places, error = None, e
+    if places is None:
+        # Places down / out of quota / out of time: keep serving whatever we already know
+        if error is not None:
+            dl.degrade("places")
+        local = await _known_near(q, dl)
+        if not local and error is not None:
+            raise error
+        return local
+    hospital_index.mark_seen(q.lat, q.lng, q.radius_m, q.max_results, len(places))
+    return places
+
+async def _save_wait(row: Dict[str, Any]) -> None:
+    try:
+        await update_hospital_waits_async([row])
+    except Exception as e:
+        log.warning("wait for %s not persisted: %s", row["hospital_id"], e)
+
+_inflight = SingleFlight()
 
 @router.post("", summary="Nearby hospitals with MySQL cache (5-min TTL).")
-def nearby(q: Query):
+async def nearby(q: Query, http: HttpClients = Depends(get_http)):
+    # identical concurrent queries (same ~11 m origin + params) share one computation
+    key = (*origin_key(q.lat, q.lng), q.max_results, q.radius_m, q.budget_ms)
+    return await _inflight.do_async(key, _nearby, q, http)
+
+async def _nearby(q: Query, http: HttpClients):
     ttl = CACHE_TTL
     now_utc = datetime.now(timezone.utc)
+    dl = Deadline(q.budget_ms)
 
-    # 1) Get candidates from Places
-    places = _places_nearby_hospitals(q.lat, q.lng, max_results=q.max_results, radius_m=q.radius_m)
-
-    # Always upsert static info (id/name/lat/lng/maps)
-    upsert_hospitals([{
-        "hospital_id": p["hospital_id"], "name": p["name"], "lat": p["lat"], "lng": p["lng"],
-        "maps_url": p.get("maps_url"), "updated_at": datetime.utcnow()
-    } for p in places])
+    # 1) Get candidates: in-memory index for recently seen areas, else Places
+    places = await _candidates(q, http, dl)
 
     # 2) Compute ETA/distance so we can decide the *first* hospital by ETA
-    matrix = _route_matrix(q.lat, q.lng, places)
-    stats: Dict[int, Tuple[Optional[float], Optional[float]]] = {}
-    for row in matrix:
-        if row.get("status", {}).get("code"):
-            continue
-        if row.get("condition") != "ROUTE_EXISTS":
-            continue
-        di = row["destinationIndex"]
-        dist_km = round(row.get("distanceMeters", 0) / 1000.0, 2) if "distanceMeters" in row else None
-        dur_s = _parse_duration_seconds(row.get("duration"))
-        eta_min = round(dur_s / 60.0, 1) if dur_s else None
-        stats[di] = (dist_km, eta_min)
+    #    (straight-line estimates if Routes runs out of budget)
+    stats = await dl.run("routes", _route_matrix(q.lat, q.lng, places, client=http.routes), share=ROUTES_BUDGET_SHARE)
+    eta_source = "routes"
+    if stats is None:
+        stats, eta_source = straight_line_stats(q.lat, q.lng, places), "straight_line"
 
     items_base = []
     for i, p in enumerate(places):
@@ -168,23 +265,11 @@ def nearby(q: Query):
             "google_maps_location_link": p.get("maps_url"),
             "distance_km": dist_km,
             "eta_minutes": eta_min,
+            "eta_source": eta_source if eta_min is not None else None,
         })
     # sort by ETA then distance (this defines "first hospital")
     items_base.sort(key=lambda x: (x["eta_minutes"] is None, x["eta_minutes"], x["distance_km"]))
 
-    # Helper: fresh wait?
-    def _is_fresh_wait(row) -> bool:
-        ts = row.get("wait_last_updated")
-        if not ts:
-            return False
-        if isinstance(ts, str):
-            try:
-                ts = datetime.fromisoformat(ts.replace("Z", "+00:00"))
-            except Exception:
-                return False
-        delta = (now_utc - ts) if getattr(ts, "tzinfo", None) else (datetime.utcnow() - ts)
-        return delta.total_seconds() <= ttl
-
     # 3) Decide target hospital (PRIMARY_CAMERA_ID > first by ETA)
     target_id = None
     if PRIMARY_CAMERA_ID:
@@ -192,81 +277,124 @@ def nearby(q: Query):
     elif items_base:
         target_id = items_base[0]["hospital_id"]
 
-    # 4) If target has NO fresh wait, capture once and upsert (so RNG never overwrites it)
+    # One DB read for every row we need (candidates + camera target)
+    try:
+        existing_map = await dl.run("db", fetch_hospitals_by_ids_async(
+            [p["hospital_id"] for p in places] + ([target_id] if target_id else [])), None)
+    except Exception as e:
+        log.warning("hospital rows not read: %s", e)
+        dl.degrade("db")
+        existing_map = None
+    db_ok = existing_map is not None
+    existing_map = existing_map or {}
+
+    # Rows to write back, keyed by id. Static info (id/name/lat/lng/maps) always
+    # comes from Places; wait columns are carried over unless refreshed below,
+    # so the static refresh never blanks a fresh wait.
+    now = datetime.utcnow()
+    merged: Dict[str, Dict[str, Any]] = {}
+    for p in places:
+        r = existing_map.get(p["hospital_id"]) or {}
+        merged[p["hospital_id"]] = {
+            **r,
+            "hospital_id": p["hospital_id"], "name": p["name"], "lat": p["lat"], "lng": p["lng"],
+            "maps_url": p.get("maps_url"), "updated_at": now,
+        }
+
+    # 4) Target's wait, stale-while-revalidate: fresh (row or background poller)
+    #    is used as is; stale within the hard TTL is served now and recaptured in
+    #    the background; older or missing is captured inline (so RNG never overwrites it)
+    stale: set = set()  # rows served with a wait older than CACHE_TTL
+    captured = None     # (row, wait-store record) of an inline capture
     if target_id and PRIMARY_CAMERA_URLS:
-        row = fetch_hospital_by_id(target_id) or {}
-        if not _is_fresh_wait(row):
+        row = merged.get(target_id) or existing_map.get(target_id) or {}
+        polled = await store_call(get_camera_wait, target_id)  # RNG records from /smart-nearby are not counts
+        polled_age = wait_age_seconds(polled)
+        row_age = _wait_age_seconds(row, now_utc)
+        use_polled = polled_age is not None and (row_age is None or polled_age < row_age)
+        age = polled_age if use_polled else row_age
+        if use_polled and age is not None and age <= WAIT_HARD_TTL:
+            merged[target_id] = _polled_row(row, target_id, polled, polled_age, now)
+        if age is not None and age <= ttl:
+            count_cache("camera_wait", hits=1)
+        elif age is not None and age <= WAIT_HARD_TTL:
+            count_cache("camera_wait", stale=1)
+            stale.add(target_id)
+            _revalidate(target_id, http)
+        else:
+            count_cache("camera_wait", misses=1)
             try:
-                ppl, _cams = _capture_and_count(PRIMARY_CAMERA_URLS)
-                existing = fetch_hospital_by_id(target_id) or {}
-                doctors = (existing.get("doctors_working")
+                captured = await dl.run("cameras", _capture_and_count(PRIMARY_CAMERA_URLS, client=http.cameras, hospital_id=target_id))
+                if captured is None:
+                    raise TimeoutError
+                ppl, _cams = captured
+                doctors = (row.get("doctors_working")
                         or random.randint(RNG_DOCTORS_MIN, RNG_DOCTORS_MAX))
                 est = int(math.ceil(ppl / max(1, doctors)) * PER_PERSON_FOR_CAMERA)
-                upsert_hospitals([{
+                merged[target_id] = {
+                    **row,
                     "hospital_id": target_id,
-                    "name": existing.get("name") or row.get("name") if (row:=existing) else None,
-                    "lat": existing.get("lat"),
-                    "lng": existing.get("lng"),
-                    "maps_url": existing.get("maps_url"),
                     "last_people": ppl,
                     "per_person_minutes": PER_PERSON_FOR_CAMERA,
                     "doctors_working": doctors,
                     "estimated_wait_minutes": est,
-                    "wait_last_updated": datetime.utcnow(),
-                    "updated_at": datetime.utcnow()
-                }])
+                    "wait_last_updated": now,
+                    "updated_at": now,
+                }
+                captured = {
+                    "hospital_id": target_id, "people": ppl, "per_person_minutes": PER_PERSON_FOR_CAMERA,
+                    "doctors_working": doctors, "estimated_wait_minutes": est, "cameras": _cams, "source": "camera",
+                }
+            except TimeoutError:
+                # out of budget: the last known wait (poller or row), if any, is served as stale
+                if use_polled:
+                    merged[target_id] = _polled_row(row, target_id, polled, polled_age, now)
+                if use_polled or row.get("estimated_wait_minutes") is not None:
+                    stale.add(target_id)
             except Exception:
                 # swallow camera errors; RNG will fill later if needed
                 pass
 
-    # 5) Re-read current rows (after any camera upsert)
-    #    RNG-fill ONLY rows that still lack a fresh wait
-    #    (This was the bug before; RNG was stomping the camera row.)
-    # Build a quick lookup
-    # NOTE: bbox not strictly required here; we have exact ids, but bbox is fine
-    # and cheaper than hitting by id in a loop.
-    min_lat = min(p["lat"] for p in places) if places else q.lat
-    max_lat = max(p["lat"] for p in places) if places else q.lat
-    min_lng = min(p["lng"] for p in places) if places else q.lng
-    max_lng = max(p["lng"] for p in places) if places else q.lng
-    existing = fetch_hospitals_in_bbox(min_lat, max_lat, min_lng, max_lng)
-    existing_map = {r["hospital_id"]: r for r in existing}
-
-    rng_rows = []
+    # 5) RNG-fill ONLY rows that still lack a fresh wait
+    #    (camera rows written above are fresh, so RNG never stomps them).
+    #    Without the stored rows we can't tell, so their waits stay unknown.
     for p in places:
-        r = existing_map.get(p["hospital_id"]) or {}
-        if _is_fresh_wait(r):
-            continue  # already has fresh wait (camera or previous)
+        r = merged[p["hospital_id"]]
+        if _is_fresh_wait(r, now_utc, ttl) or p["hospital_id"] in stale or not db_ok:
+            continue  # already has fresh wait (camera or previous), or a stale one we chose to serve
         rng_people   = random.randint(RNG_MIN_PEOPLE, RNG_MAX_PEOPLE)
         per_person   = random.randint(RNG_PER_PERSON_MIN, RNG_PER_PERSON_MAX)
         rng_doctors  = random.randint(RNG_DOCTORS_MIN, RNG_DOCTORS_MAX)
         rng_wait     = int(math.ceil(rng_people / max(1, rng_doctors)) * per_person)
-
-        rng_rows.append({
-        "hospital_id": p["hospital_id"],
-        "name": p["name"],
-        "lat": p["lat"], "lng": p["lng"],
-        "maps_url": p.get("maps_url"),
+        r.update({
         "last_people": rng_people,
         "per_person_minutes": per_person,
         "doctors_working": rng_doctors,
         "estimated_wait_minutes": rng_wait,
-        "wait_last_updated": datetime.utcnow(),
-        "updated_at": datetime.utcnow()
+        "wait_last_updated": now,
         })
-    if rng_rows:
-        upsert_hospitals(rng_rows)
 
-    # 6) Build the final response by reading DB values (so you see camera counts)
+    # One DB write: static refresh + camera + RNG rows together (queued, so not
+    # budgeted). When the read failed, a full upsert would blank the stored
+    # waits: only the inline count is kept, as a wait-only update in the background.
+    if captured is not None:
+        await store_call(set_wait_for_hospital, target_id, captured)
+    if db_ok:
+        await upsert_hospitals_async(list(merged.values()))
+    elif captured is not None:
+        detach([asyncio.ensure_future(_save_wait(merged[target_id]))])
+
+    # 6) Build the final response from the rows just written (so you see camera counts)
     items = []
     for it in items_base:
-        row_db = fetch_hospital_by_id(it["hospital_id"]) or {}
+        row_db = merged.get(it["hospital_id"]) or {}
         items.append({
         **it,
         "current_people": row_db.get("last_people"),
         "current_estimated_wait_minutes": row_db.get("estimated_wait_minutes"),
         "wait_last_updated": row_db.get("wait_last_updated"),
         "active_doctors": row_db.get("doctors_working"),
+        "wait_stale": it["hospital_id"] in stale,
         "_cache": {"source": "mysql", "updated_at": row_db.get("updated_at")}
         })
-    return {"count": len(items), "hospitals": items}
\ No newline at end of file
+    return {"count": len(items), "hospitals": items, "degraded": dl.degraded}
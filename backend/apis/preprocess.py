@@ -0,0 +1,126 @@
+# apis/preprocess.py
+# Shrinks frames before they are counted: crop to the waiting area, downscale,
+# optional grayscale, JPEG re-encode. Profiles are per camera (URL or camera_id),
+# then per hospital, then the FRAME_* defaults.
+import base64, io, json, os, threading
+from typing import Any, Dict, MutableMapping, NamedTuple, Optional, Tuple
+
+from .shared_store import shared_dict
+
+# Pillow is optional here: without it frames pass through unchanged
+try:
+    from PIL import Image
+except Exception:
+    Image = None
+
+FRAME_PREPROCESS_ENABLED = os.getenv("FRAME_PREPROCESS_ENABLED", "1") != "0"
+FRAME_MAX_EDGE = int(os.getenv("FRAME_MAX_EDGE", "768"))        # long edge after cropping, px (0 = keep)
+FRAME_GRAYSCALE = os.getenv("FRAME_GRAYSCALE", "0") == "1"
+FRAME_JPEG_QUALITY = int(os.getenv("FRAME_JPEG_QUALITY", "70"))
+
+class FrameProfile(NamedTuple):
+    roi: Optional[Tuple[float, float, float, float]] = None  # (left, top, right, bottom) as fractions of the frame
+    max_edge: int = FRAME_MAX_EDGE
+    grayscale: bool = FRAME_GRAYSCALE
+    quality: int = FRAME_JPEG_QUALITY
+
+DEFAULT_PROFILE = FrameProfile()
+
+def make_profile(spec: Dict[str, Any]) -> FrameProfile:
+    """FrameProfile from a JSON-ish dict; missing keys take the defaults. Raises ValueError on a bad ROI."""
+    roi = spec.get("roi")
+    if roi is not None:
+        l, t, r, b = (float(v) for v in roi)
+        if not (0.0 <= l < r <= 1.0 and 0.0 <= t < b <= 1.0):
+            raise ValueError(f"roi must be [left, top, right, bottom] fractions with left<right, top<bottom: {roi}")
+        roi = (l, t, r, b)
+    return FrameProfile(
+        roi=roi,
+        max_edge=int(spec.get("max_edge", FRAME_MAX_EDGE)),
+        grayscale=bool(spec.get("grayscale", FRAME_GRAYSCALE)),
+        quality=max(10, min(95, int(spec.get("quality", FRAME_JPEG_QUALITY)))),
+    )
+
+# {"<camera url | camera_id | hospital_id>": {"roi": [0, 0.3, 1, 1], "max_edge": 640, "grayscale": true, "quality": 60}}
+# Validated specs (JSON), shared by all workers when SHARED_STORE_PATH is set (see apis/shared_store.py)
+_PROFILES: MutableMapping[str, Dict[str, Any]] = shared_dict("camera_profiles", {
+    k: make_profile(v)._asdict() for k, v in json.loads(os.getenv("CAMERA_PREPROCESS", "") or "{}").items()
+})
+
+def set_profile(key: str, spec: Optional[Dict[str, Any]]) -> None:
+    if spec is None:
+        _PROFILES.pop(key, None)
+    else:
+        _PROFILES[key] = make_profile(spec)._asdict()
+
+def profile_for(camera: Optional[str] = None, hospital_id: Optional[str] = None) -> FrameProfile:
+    for key in (camera, hospital_id):
+        spec = _PROFILES.get(key) if key else None
+        if spec is not None:
+            return make_profile(spec)
+    return DEFAULT_PROFILE
+
+class _Stats:
+    def __init__(self):
+        self.frames = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._lock = threading.Lock()
+
+    def add(self, n_in: int, n_out: int) -> None:
+        with self._lock:
+            self.frames += 1
+            self.bytes_in += n_in
+            self.bytes_out += n_out
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {"frames": self.frames, "bytes_in": self.bytes_in, "bytes_out": self.bytes_out,
+                    "bytes_saved": self.bytes_in - self.bytes_out}
+
+stats = _Stats()
+
+def _shrink(img: bytes, p: FrameProfile) -> Optional[bytes]:
+    im = Image.open(io.BytesIO(img))
+    w, h = im.size
+    l, t, r, b = p.roi or (0.0, 0.0, 1.0, 1.0)
+    crop_w, crop_h = (r - l) * w, (b - t) * h
+    scale = min(1.0, p.max_edge / max(crop_w, crop_h)) if p.max_edge > 0 else 1.0
+    # JPEG: decode at the smallest DCT scale that still covers the target size
+    im.draft("L" if p.grayscale else "RGB", (max(1, int(w * scale)), max(1, int(h * scale))))
+    fx, fy = im.size[0] / w, im.size[1] / h
+    if p.roi:
+        im = im.crop((int(l * w * fx), int(t * h * fy), int(r * w * fx), int(b * h * fy)))
+    target = (max(1, int(crop_w * scale)), max(1, int(crop_h * scale)))
+    if im.size != target:
+        im = im.resize(target, Image.BILINEAR)
+    im = im.convert("L" if p.grayscale else "RGB")
+    out = io.BytesIO()
+    im.save(out, format="JPEG", quality=p.quality, optimize=True)
+    return out.getvalue()
+
+def preprocess_frame(img: bytes, *, camera: Optional[str] = None, hospital_id: Optional[str] = None) -> bytes:
+    """
+    Frame ready for counting. Falls back to the original bytes if Pillow can't
+    read it, or if a plain downscale/re-encode came out bigger. A cropped or
+    grayscale frame is always used: the original shows people outside the ROI.
+    """
+    if not FRAME_PREPROCESS_ENABLED or Image is None or not img:
+        return img
+    p = profile_for(camera, hospital_id)
+    try:
+        out = _shrink(img, p)
+    except Exception:
+        out = None
+    if not out or (len(out) >= len(img) and not p.roi and not p.grayscale):
+        out = img
+    stats.add(len(img), len(out))
+    return out
+
+def preprocess_b64(img_b64: str, *, camera: Optional[str] = None, hospital_id: Optional[str] = None) -> str:
+    try:
+        img = base64.b64decode(img_b64, validate=False)
+    except Exception:
+        return img_b64
+    out = preprocess_frame(img, camera=camera, hospital_id=hospital_id)
+    return img_b64 if out is img else base64.b64encode(out).decode("ascii")
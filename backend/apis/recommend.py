@@ -1,11 +1,23 @@
-import os, json, base64, asyncio, random, time
+import os, json, base64, asyncio, functools, logging, random, time
 from typing import List, Dict, Any, Optional, Tuple
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 import httpx
 
-from .wait_time import set_wait_for_hospital, get_wait_for_hospital
+from .wait_time import set_wait_for_hospital, get_camera_wait, get_wait_for_hospital, get_smoothed_wait, wait_age_seconds
+from .counters import VISION_MAX_RETRIES, VISION_TIMEOUT_S, OpenAICounter, PeopleCounter, get_counter, resolve_engine
+from .singleflight import SingleFlight, origin_key
+from .http_clients import PLACES_URL, ROUTES_URL, HttpClients, get_http
+from .camera_fetch import Frame, count_frames, fetch_frame
+from .cache import get_cached_places, put_cached_places, get_cached_routes, put_cached_route
+from .geo import haversine_km_many
+from .deadline import PLACES_BUDGET_SHARE, REQUEST_BUDGET_MAX_MS, ROUTES_BUDGET_SHARE, Deadline, detach
+from .spatial_index import hospital_index
+from .shared_store import store_call
+from .metrics import count_cache, timed, timing
 import math
+import numpy as np
 
 RNG_DOCTORS_MIN = 1
 RNG_DOCTORS_MAX = 20
@@ -14,6 +26,16 @@ RNG_MAX_PEOPLE = 80
 RNG_PER_PERSON_MIN = 8
 RNG_PER_PERSON_MAX = 15
 ENABLE_MOCK_RNG = os.getenv("MOCK_RNG_FOR_UNCOVERED", "1") != "0"
+# camera-backed waits younger than this (e.g. from the background poller) are reused as-is
+WAIT_FRESH_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", "300"))
+
+# Straight-line bounds used to prune candidates before Routes (billed per element)
+# and to estimate ETAs when Routes is unavailable.
+ROUTES_PREFILTER_FACTOR = float(os.getenv("ROUTES_PREFILTER_FACTOR", "0"))    # >0: also cap at limit*factor (0 = no cap)
+STRAIGHT_LINE_MAX_KMH = float(os.getenv("STRAIGHT_LINE_MAX_KMH", "90"))      # no drive beats this -> ETA lower bound
+STRAIGHT_LINE_MIN_KMH = float(os.getenv("STRAIGHT_LINE_MIN_KMH", "15"))      # congested city crawl -> ETA upper bound
+FALLBACK_DETOUR_FACTOR = float(os.getenv("FALLBACK_DETOUR_FACTOR", "1.4"))   # road km per straight-line km
+FALLBACK_SPEED_KMH = float(os.getenv("FALLBACK_SPEED_KMH", "35"))
 
 API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
 if not API_KEY:
@@ -24,11 +46,13 @@ _openai = None
 try:
     from openai import OpenAI
     if os.getenv("OPENAI_API_KEY"):
-        _openai = OpenAI()
+        _openai = OpenAI(timeout=VISION_TIMEOUT_S, max_retries=VISION_MAX_RETRIES)
 except Exception:
     _openai = None
+_openai_counter = OpenAICounter(_openai, OPENAI_MODEL)
 
 router = APIRouter(prefix="/smart-nearby", tags=["smart-nearby"])
+log = logging.getLogger(__name__)
 
 class SmartQuery(BaseModel):
     lat: float = Field(..., description="Latitude")
@@ -36,6 +60,9 @@ class SmartQuery(BaseModel):
     limit: int = Field(5, ge=1, le=20, description="How many hospitals to return")
     max_candidates: int = Field(12, ge=1, le=40, description="How many nearby hospitals to consider")
     cameras_by_hospital: Optional[Dict[str, List[str]]] = None  # map hospital_id -> [image_url, ...]
+    engine: Optional[str] = Field(None, description="People counter for camera frames: openai | opencv (default: per hospital)")
+    budget_ms: Optional[int] = Field(None, ge=100, le=REQUEST_BUDGET_MAX_MS,
+                                     description="Latency budget for the whole request, ms (default REQUEST_BUDGET_MS)")
 
 class SmartHospital(BaseModel):
     active_doctors: Optional[int] = None
@@ -49,11 +76,15 @@ class SmartHospital(BaseModel):
     estimated_wait_minutes: Optional[int] = None
     total_time_minutes: Optional[float] = None
     wait_last_updated: Optional[str] = None
+    smoothed_wait_minutes: Optional[float] = None  # median over WAIT_SMOOTHING_WINDOW_S; used for ranking
+    eta_source: Optional[str] = None  # "routes" | "straight_line"
+    wait_stale: Optional[bool] = None  # True: the budget ran out, this is the last known wait (any age)
 
 class SmartResponse(BaseModel):
     count: int
     origin: Dict[str, float]
     hospitals: List[SmartHospital]
+    degraded: List[str] = Field(default_factory=list, description="Stages cut short by the latency budget")
 
 PLACES_FIELDS = ",".join([
     "places.id",
@@ -64,7 +95,7 @@ PLACES_FIELDS = ",".join([
 ])
 
 async def places_nearby_hospitals(lat: float, lng: float, *, client: httpx.AsyncClient, max_results: int = 12) -> List[Dict[str, Any]]:
-    url = "https://places.googleapis.com/v1/places:searchNearby"
+    url = PLACES_URL
     headers = {
         "Content-Type": "application/json",
         "X-Goog-Api-Key": API_KEY,
@@ -77,11 +108,15 @@ async def places_nearby_hospitals(lat: float, lng: float, *, client: httpx.Async
             "circle": {"center": {"latitude": lat, "longitude": lng}, "radius": 10_000.0}
         }
     }
-    r = await client.post(url, headers=headers, json=body, timeout=12)
-    r.raise_for_status()
-    data = r.json()
+    raw = get_cached_places(lat, lng, radius_m=10_000, max_results=max_results)
+    if raw is None:
+        with timing("places"):
+            r = await client.post(url, headers=headers, json=body)
+            r.raise_for_status()
+        raw = r.json().get("places", [])
+        put_cached_places(lat, lng, raw, radius_m=10_000, max_results=max_results)
     out = []
-    for p in data.get("places", []):
+    for p in raw:
         loc = p.get("location", {})
         out.append({
             "id": p.get("id") or (p.get("name") or "").split("/", 1)[-1],
@@ -93,7 +128,10 @@ async def places_nearby_hospitals(lat: float, lng: float, *, client: httpx.Async
     return out
 
 async def routes_matrix(origin_lat: float, origin_lng: float, dests: List[Dict[str, Any]], *, client: httpx.AsyncClient) -> Dict[int, Tuple[Optional[float], Optional[float]]]:
-    url = "https://routes.googleapis.com/distanceMatrix/v2:computeRouteMatrix"
+    stats, missing = get_cached_routes(origin_lat, origin_lng, [d.get("id") for d in dests])
+    if not missing:
+        return stats
+    url = ROUTES_URL
     headers = {
         "Content-Type": "application/json",
         "X-Goog-Api-Key": API_KEY,
@@ -101,20 +139,20 @@ async def routes_matrix(origin_lat: float, origin_lng: float, dests: List[Dict[s
     }
     body = {
         "origins": [{"waypoint": {"location": {"latLng": {"latitude": origin_lat, "longitude": origin_lng}}}}],
-        "destinations": [{"waypoint": {"location": {"latLng": {"latitude": d["lat"], "longitude": d["lng"]}}}} for d in dests],
+        "destinations": [{"waypoint": {"location": {"latLng": {"latitude": dests[i]["lat"], "longitude": dests[i]["lng"]}}}} for i in missing],
         "travelMode": "DRIVE",
         "routingPreference": "TRAFFIC_AWARE_OPTIMAL"
     }
-    r = await client.post(url, headers=headers, json=body, timeout=12)
-    r.raise_for_status()
+    with timing("routes"):
+        r = await client.post(url, headers=headers, json=body)
+        r.raise_for_status()
     matrix = r.json()
-    stats: Dict[int, Tuple[Optional[float], Optional[float]]] = {}
     for row in matrix:
         if row.get("status", {}).get("code"):
             continue
         if row.get("condition") != "ROUTE_EXISTS":
             continue
-        di = row["destinationIndex"]
+        di = missing[row["destinationIndex"]]
         dist_km = round(row.get("distanceMeters", 0) / 1000.0, 2) if "distanceMeters" in row else None
         dur = row.get("duration")
         eta_min = None
@@ -124,131 +162,341 @@ async def routes_matrix(origin_lat: float, origin_lng: float, dests: List[Dict[s
             except Exception:
                 eta_min = None
         stats[di] = (dist_km, eta_min)
+        put_cached_route(origin_lat, origin_lng, dests[di].get("id"), dist_km, eta_min)
     return stats
 
-async def fetch_image_bytes(url: str, *, client: httpx.AsyncClient, timeout: float = 3.5) -> Optional[bytes]:
-    try:
-        r = await client.get(url, timeout=timeout)
-        r.raise_for_status()
-        ct = r.headers.get("content-type", "")
-        if not ct.startswith("image/"): return None
-        return r.content
-    except Exception:
-        return None
-
-async def count_people_in_bytes(img: bytes) -> int:
-    if _openai is None:
-        return max(0, (sum(img[:256]) % 7) + 1)
-    b64 = base64.b64encode(img).decode("ascii")
-    msgs = [{"role": "user", "content": [
-        {"type": "text", "text": "Count the number of people. Return JSON {\"people\": <int>}"},
-        {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{b64}"}}]}]
-    def _call():
-        try:
-            resp = _openai.chat.completions.create(
-                model=OPENAI_MODEL, messages=msgs, response_format={"type": "json_object"})
-            data = json.loads(resp.choices[0].message.content)
-            return int(data.get("people", 0))
-        except Exception:
-            return 0
-    return await asyncio.to_thread(_call)
-
-async def count_people_from_cameras(camera_urls: List[str], *, client: httpx.AsyncClient, max_parallel: int = 4) -> int:
+def _counter_for(engine: Optional[str] = None, hospital_id: Optional[str] = None) -> Optional[PeopleCounter]:
+    """Resolved people counter (this module keeps its own OpenAI model), or None -> demo heuristic."""
+    name = resolve_engine(engine, hospital_id)
+    counter = _openai_counter if name == "openai" else get_counter(name)
+    return counter if counter.ready() else None
+
+@timed("cameras")
+async def count_people_from_cameras(camera_urls: List[str], *, client: httpx.AsyncClient, max_parallel: int = 4,
+                                    engine: Optional[str] = None, hospital_id: Optional[str] = None) -> int:
     sem = asyncio.Semaphore(max_parallel)
-    async def worker(url: str) -> int:
+    async def fetch(url: str) -> Frame:
         async with sem:
-            img = await fetch_image_bytes(url, client=client)
-            if not img: return 0
-            return await count_people_in_bytes(img)
-    results = await asyncio.gather(*(worker(u) for u in camera_urls))
-    return sum(results)
+            return await fetch_frame(url, client)
+    frames = await asyncio.gather(*(fetch(u) for u in camera_urls))
+    if not any(f.data for f in frames):
+        return 0
+    counter = _counter_for(engine, hospital_id)
+    if counter is None:
+        return sum(max(0, (sum(f.data[:256]) % 7) + 1) for f in frames if f.data)
+    # unchanged frames reuse their headcount; the rest go in one (chunked) counting call
+    try:
+        counts = await asyncio.to_thread(
+            functools.partial(count_frames, camera_urls, frames, counter.count_many, hospital_id=hospital_id))
+        return sum(n or 0 for n in counts)
+    except Exception:
+        return 0
+
+def _known_wait(hospital_id: str) -> Optional[float]:
+    smoothed = get_smoothed_wait(hospital_id)
+    if smoothed is not None:
+        return smoothed
+    last = get_wait_for_hospital(hospital_id)
+    return float(last.get("estimated_wait_minutes") or 0) if last else None
+
+def prefilter_candidates(lat: float, lng: float, places: List[Dict[str, Any]], limit: int) -> List[int]:
+    """
+    Indexes of the candidates worth sending to Routes, nearest (by lower bound) first.
+    Heuristic: a candidate is dropped when its lower bound (straight line at
+    STRAIGHT_LINE_MAX_KMH + known wait, or 0) exceeds the limit-th smallest
+    upper bound (straight line * FALLBACK_DETOUR_FACTOR at STRAIGHT_LINE_MIN_KMH
+    + known wait). The upper bound is an estimate, not a guarantee, so a very
+    indirect route can be pruned wrongly. With ROUTES_PREFILTER_FACTOR > 0 the
+    survivors are also capped at limit * factor, which can drop candidates
+    that would have made the top `limit`.
+    """
+    n = len(places)
+    if n <= limit:
+        return list(range(n))
+    lats = np.array([p["lat"] if p.get("lat") is not None else np.nan for p in places], dtype=np.float64)
+    lngs = np.array([p["lng"] if p.get("lng") is not None else np.nan for p in places], dtype=np.float64)
+    dist = np.nan_to_num(haversine_km_many(lat, lng, lats, lngs), nan=np.inf)
+    waits = np.array([np.nan if (w := _known_wait(p["id"])) is None else w for p in places], dtype=np.float64)
+    lower = dist / STRAIGHT_LINE_MAX_KMH * 60.0 + np.nan_to_num(waits, nan=0.0)
+    upper = dist * FALLBACK_DETOUR_FACTOR / STRAIGHT_LINE_MIN_KMH * 60.0 + np.nan_to_num(waits, nan=np.inf)
+    cutoff = np.partition(upper, limit - 1)[limit - 1]
+    order = np.argsort(lower, kind="stable")
+    keep = [int(i) for i in order if lower[i] <= cutoff]
+    if len(keep) < limit:
+        return [int(i) for i in order[:limit]]
+    if ROUTES_PREFILTER_FACTOR > 0:
+        keep = keep[:max(limit, int(math.ceil(limit * ROUTES_PREFILTER_FACTOR)))]
+    return keep
+
+def straight_line_stats(lat: float, lng: float, places: List[Dict[str, Any]]) -> Dict[int, Tuple[Optional[float], Optional[float]]]:
+    """Degraded (distance_km, eta_minutes) from great-circle distance when Routes can't answer."""
+    lats = np.array([p["lat"] if p.get("lat") is not None else np.nan for p in places], dtype=np.float64)
+    lngs = np.array([p["lng"] if p.get("lng") is not None else np.nan for p in places], dtype=np.float64)
+    dist = haversine_km_many(lat, lng, lats, lngs)
+    stats: Dict[int, Tuple[Optional[float], Optional[float]]] = {}
+    for i, d in enumerate(dist):
+        if np.isfinite(d):
+            stats[i] = (round(float(d), 2), round(float(d) * FALLBACK_DETOUR_FACTOR / FALLBACK_SPEED_KMH * 60.0, 1))
+    return stats
+
+_inflight = SingleFlight()
 
 @router.post("", response_model=SmartResponse, summary="Top-N hospitals by drive ETA + live wait-time")
-async def smart_nearby(q: SmartQuery):
-    async with httpx.AsyncClient() as client:
-        places = await places_nearby_hospitals(q.lat, q.lng, client=client, max_results=q.max_candidates)
-        if not places:
-            return SmartResponse(count=0, origin={"lat": q.lat, "lng": q.lng}, hospitals=[])
-        stats = await routes_matrix(q.lat, q.lng, places, client=client)
-
-        hospitals: List[SmartHospital] = []
-        for i, p in enumerate(places):
-            dist, eta = stats.get(i, (None, None))
-            hospitals.append(SmartHospital(
-                hospital_id=p["id"], hospital_name=p["name"],
-                google_maps_location_link=p["maps_url"], distance_km=dist, eta_minutes=eta))
-
-        cameras_map = (q.cameras_by_hospital or {})
-
-        async def enrich_wait(h: SmartHospital):
-            camera_urls = cameras_map.get(h.hospital_id, [])
-            if not camera_urls:
-                last = get_wait_for_hospital(h.hospital_id)
-                if last:
-                    h.current_people = int(last.get("people", 0))
-                    h.per_person_minutes = int(last.get("per_person_minutes", 10))
-                    h.estimated_wait_minutes = int(last.get("estimated_wait_minutes", 0))
-                    h.wait_last_updated = str(last.get("ts"))
-                    return
-                # >>> DEMO RNG fallback when no cache & no cameras
-                if ENABLE_MOCK_RNG:
-                    rng_people = random.randint(RNG_MIN_PEOPLE, RNG_MAX_PEOPLE)
-                    per_person = random.randint(RNG_PER_PERSON_MIN, RNG_PER_PERSON_MAX)
-                    doctors    = random.randint(RNG_DOCTORS_MIN, RNG_DOCTORS_MAX)
-                    est        = int(math.ceil(rng_people / max(1, doctors)) * per_person)
-
-                    set_wait_for_hospital(h.hospital_id, {
-                    "hospital_id": h.hospital_id,
-                    "people": rng_people,
-                    "per_person_minutes": per_person,
-                    "doctors_working": doctors,
-                    "estimated_wait_minutes": est,
-                    "cameras": [{"camera_id": "rng", "people": rng_people}],
-                    })
-                    h.current_people = rng_people
-                    h.per_person_minutes = per_person
-                    h.active_doctors = doctors
-                    h.estimated_wait_minutes = est
-                    return
-                # <<< DEMO RNG
-            # If we do have camera URLs, count as before
-            people = await count_people_from_cameras(camera_urls, client=client)
-            per_person = 10 if people == 0 else random.randint(8, 15)
-            prev = get_wait_for_hospital(h.hospital_id) or {}
-            doctors = prev.get("doctors_working") or random.randint(RNG_DOCTORS_MIN, RNG_DOCTORS_MAX)
-            est = int(math.ceil(people / max(1, doctors)) * per_person)
-            set_wait_for_hospital(h.hospital_id, {
+async def smart_nearby(q: SmartQuery, http: HttpClients = Depends(get_http)):
+    # identical concurrent queries (same ~11 m origin + params) share one computation
+    cams = json.dumps(q.cameras_by_hospital or {}, sort_keys=True)
+    try:
+        resolve_engine(q.engine)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    key = (*origin_key(q.lat, q.lng), q.limit, q.max_candidates, cams, q.engine, q.budget_ms)
+    return await _inflight.do_async(key, _smart_nearby, q, http)
+
+@router.post("/stream", summary="Streaming /smart-nearby: ETA-ranked candidates, then each wait as it arrives, then the top-N")
+async def smart_nearby_stream(q: SmartQuery, request: Request, http: HttpClients = Depends(get_http)):
+    """
+    NDJSON (default) or server-sent events (`Accept: text/event-stream`), one event per line / message:
+      candidates  every candidate with its drive ETA, fastest first (as soon as Routes answers)
+      wait        one hospital with its wait estimate and total time, as each one is ready
+      result      the final top-N, same body as POST /smart-nearby
+    """
+    try:
+        resolve_engine(q.engine)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    # Places/Routes errors still become a proper status code: nothing is sent before they succeed
+    dl = Deadline(q.budget_ms)
+    hospitals = await _ranked_by_eta(q, http, dl)
+    sse = "text/event-stream" in request.headers.get("accept", "")
+    return StreamingResponse(_stream_events(q, http, hospitals, sse, dl),
+                             media_type="text/event-stream" if sse else "application/x-ndjson",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def _event(kind: str, data: Dict[str, Any], sse: bool) -> bytes:
+    if sse:
+        return f"event: {kind}\ndata: {json.dumps(data, default=str)}\n\n".encode()
+    return (json.dumps({"event": kind, **data}, default=str) + "\n").encode()
+
+async def _stream_events(q: SmartQuery, http: HttpClients, hospitals: List[SmartHospital], sse: bool, dl: Deadline):
+    yield _event("candidates", _response(q, hospitals, dl).model_dump(), sse)
+    sem = asyncio.Semaphore(6)
+    async def enrich(h: SmartHospital) -> SmartHospital:
+        async with sem:
+            await _enrich_wait(h, q, http)
+        return h
+    tasks = [asyncio.ensure_future(enrich(h)) for h in hospitals]
+    owner = dict(zip(tasks, hospitals))
+    late: List[int] = []
+    try:
+        # asyncio.wait, not as_completed: a task's own TimeoutError must not pass for the deadline
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, timeout=dl.remaining(), return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                break  # out of budget
+            for t in done:
+                if _failed(owner[t], t):
+                    continue
+                h = t.result()
+                _score(h)
+                yield _event("wait", {"hospital": h.model_dump()}, sse)
+        if pending:
+            late = await _serve_stale(hospitals, tasks, dl)
+            for i in late:
+                _score(hospitals[i])
+                yield _event("wait", {"hospital": hospitals[i].model_dump()}, sse)
+        yield _event("result", _response(q, _rank(hospitals, q.limit), dl).model_dump(), sse)
+    finally:
+        # client went away: stop fetching/counting for it (late tasks finish to refresh the caches)
+        for i, t in enumerate(tasks):
+            if i not in late:
+                t.cancel()
+
+def _failed(h: SmartHospital, t: "asyncio.Task[Any]") -> bool:
+    """True if the finished task enriching `h` raised; that hospital just stays without a wait."""
+    if t.cancelled():
+        return True
+    e = t.exception()
+    if e is not None:
+        log.warning("wait for %s failed: %s: %s", h.hospital_id, type(e).__name__, e)
+    return e is not None
+
+def _stale_wait(h: SmartHospital) -> SmartHospital:
+    """Copy of `h` with the last known wait whatever its age, flagged stale."""
+    s = h.model_copy()
+    s.smoothed_wait_minutes = get_smoothed_wait(h.hospital_id)
+    last = get_wait_for_hospital(h.hospital_id)
+    if last:
+        s.current_people = last.get("people")
+        s.per_person_minutes = last.get("per_person_minutes")
+        s.active_doctors = last.get("doctors_working")
+        s.estimated_wait_minutes = last.get("estimated_wait_minutes")
+        s.wait_last_updated = str(last.get("ts"))
+    s.wait_stale = True
+    return s
+
+async def _serve_stale(hospitals: List[SmartHospital], tasks: List["asyncio.Task[Any]"], dl: Deadline) -> List[int]:
+    """Swap hospitals whose wait didn't arrive in time for stale copies; their tasks keep running detached."""
+    late = [i for i, t in enumerate(tasks) if not t.done()]
+    if late:
+        dl.degrade("waits")
+        detach(tasks[i] for i in late)
+        stale = await store_call(lambda: [_stale_wait(hospitals[i]) for i in late])
+        for i, s in zip(late, stale):
+            hospitals[i] = s
+    return late
+
+async def _smart_nearby(q: SmartQuery, http: HttpClients) -> SmartResponse:
+    dl = Deadline(q.budget_ms)
+    hospitals = await _ranked_by_eta(q, http, dl)
+    sem = asyncio.Semaphore(6)
+    async def guarded_enrich(h: SmartHospital):
+        async with sem:
+            await _enrich_wait(h, q, http)
+
+    tasks = [asyncio.ensure_future(guarded_enrich(h)) for h in hospitals]
+    if tasks:
+        await asyncio.wait(tasks, timeout=dl.remaining())
+        for h, t in zip(hospitals, tasks):
+            if t.done():
+                _failed(h, t)
+        await _serve_stale(hospitals, tasks, dl)
+    return _response(q, _rank(hospitals, q.limit), dl)
+
+def _response(q: SmartQuery, hospitals: List[SmartHospital], dl: Optional[Deadline] = None) -> SmartResponse:
+    return SmartResponse(count=len(hospitals), origin={"lat": q.lat, "lng": q.lng}, hospitals=hospitals,
+                         degraded=list(dl.degraded) if dl else [])
+
+def _known_places(q: SmartQuery) -> List[Dict[str, Any]]:
+    """Hospitals we already know around the origin, shaped like places_nearby_hospitals() results."""
+    return [{"id": r["hospital_id"], "name": r["name"], "lat": r["lat"], "lng": r["lng"], "maps_url": r.get("maps_url") or ""}
+            for r in hospital_index.near(q.lat, q.lng, 10_000, limit=q.max_candidates)]
+
+async def _ranked_by_eta(q: SmartQuery, http: HttpClients, dl: Deadline) -> List[SmartHospital]:
+    """Candidates with drive ETAs (no waits yet), fastest first."""
+    try:
+        places = await dl.run("places", places_nearby_hospitals(q.lat, q.lng, client=http.places, max_results=q.max_candidates),
+                              share=PLACES_BUDGET_SHARE)
+        error = None
+    except httpx.HTTPError as e:
+        places, error = None, e
+    if places is None:
+        # Places down / out of quota / out of time: rank the hospitals we already know (as /nearby-hospitals does)
+        places = _known_places(q)
+        if error is not None:
+            dl.degrade("places")
+            if not places:
+                status = error.response.status_code if isinstance(error, httpx.HTTPStatusError) else 502
+                raise HTTPException(status, f"Places unavailable: {error}")
+    if not places:
+        return []
+    # only candidates that can still make the top `limit` go to Routes (and to vision below)
+    places = [places[i] for i in await store_call(prefilter_candidates, q.lat, q.lng, places, q.limit)]
+    eta_source = "routes"
+    try:
+        stats = await dl.run("routes", routes_matrix(q.lat, q.lng, places, client=http.routes), share=ROUTES_BUDGET_SHARE)
+    except httpx.HTTPError:
+        stats = None
+    if stats is None:
+        stats, eta_source = straight_line_stats(q.lat, q.lng, places), "straight_line"
+
+    hospitals: List[SmartHospital] = []
+    for i, p in enumerate(places):
+        dist, eta = stats.get(i, (None, None))
+        hospitals.append(SmartHospital(
+            hospital_id=p["id"], hospital_name=p["name"],
+            google_maps_location_link=p["maps_url"], distance_km=dist, eta_minutes=eta,
+            eta_source=eta_source if eta is not None else None))
+    hospitals.sort(key=lambda h: (h.eta_minutes is None, h.eta_minutes))
+    return hospitals
+
+async def _enrich_wait(h: SmartHospital, q: SmartQuery, http: HttpClients) -> None:
+    """Fill `h`'s wait (stored, camera or demo RNG) and the smoothed wait it is ranked on."""
+    await _fill_wait(h, q, http)
+    # one noisy headcount shouldn't reorder the list: rank on the recent median when there is history
+    h.smoothed_wait_minutes = await store_call(get_smoothed_wait, h.hospital_id)
+
+async def _fill_wait(h: SmartHospital, q: SmartQuery, http: HttpClients) -> None:
+    camera_urls = (q.cameras_by_hospital or {}).get(h.hospital_id, [])
+    if not camera_urls:
+        last = await store_call(get_wait_for_hospital, h.hospital_id)
+        if last:
+            h.current_people = int(last.get("people", 0))
+            h.per_person_minutes = int(last.get("per_person_minutes", 10))
+            h.estimated_wait_minutes = int(last.get("estimated_wait_minutes", 0))
+            h.wait_last_updated = str(last.get("ts"))
+            return
+        # >>> DEMO RNG fallback when no cache & no cameras
+        if ENABLE_MOCK_RNG:
+            rng_people = random.randint(RNG_MIN_PEOPLE, RNG_MAX_PEOPLE)
+            per_person = random.randint(RNG_PER_PERSON_MIN, RNG_PER_PERSON_MAX)
+            doctors    = random.randint(RNG_DOCTORS_MIN, RNG_DOCTORS_MAX)
+            est        = int(math.ceil(rng_people / max(1, doctors)) * per_person)
+
+            await store_call(set_wait_for_hospital, h.hospital_id, {
             "hospital_id": h.hospital_id,
-            "people": people,
+            "people": rng_people,
             "per_person_minutes": per_person,
             "doctors_working": doctors,
             "estimated_wait_minutes": est,
-            "cameras": [{"camera_id": url, "people": None} for url in camera_urls],
+            "cameras": [{"camera_id": "rng", "people": rng_people}],
+            "source": "rng",
             })
-            h.current_people = people
+            h.current_people = rng_people
             h.per_person_minutes = per_person
             h.active_doctors = doctors
             h.estimated_wait_minutes = est
-            
-        sem = asyncio.Semaphore(6)
-        async def guarded_enrich(h: SmartHospital):
-            async with sem:
-                await enrich_wait(h)
-
-        await asyncio.gather(*(guarded_enrich(h) for h in hospitals))
-
-        for h in hospitals:
-            if h.eta_minutes is None:
-                h.total_time_minutes = None
-            else:
-                wait = h.estimated_wait_minutes or 0
-                h.total_time_minutes = float(h.eta_minutes) + float(wait)
-
-        sortable = [h for h in hospitals if h.total_time_minutes is not None]
-        sortable.sort(key=lambda x: x.total_time_minutes)
-        top = sortable[:q.limit]
-        if len(top) < q.limit:
-            remaining = [h for h in hospitals if h not in top]
-            remaining.sort(key=lambda x: (x.eta_minutes is None, x.eta_minutes))
-            top += remaining[: (q.limit - len(top))]
-        return SmartResponse(count=len(top), origin={"lat": q.lat, "lng": q.lng}, hospitals=top)
+            return
+        # <<< DEMO RNG
+    # If we do have camera URLs, prefer the background poller's fresh estimate (never an RNG one)
+    polled = await store_call(get_camera_wait, h.hospital_id)
+    age = wait_age_seconds(polled)
+    fresh = polled and age is not None and age <= WAIT_FRESH_SECONDS
+    count_cache("camera_wait", hits=int(bool(fresh)), misses=int(not fresh))
+    if fresh:
+        h.current_people = int(polled.get("people", 0))
+        h.per_person_minutes = int(polled.get("per_person_minutes", 10))
+        h.active_doctors = polled.get("doctors_working")
+        h.estimated_wait_minutes = int(polled.get("estimated_wait_minutes", 0))
+        h.wait_last_updated = str(polled.get("ts"))
+        return
+    # otherwise count inline, as before
+    people = await count_people_from_cameras(camera_urls, client=http.cameras, engine=q.engine, hospital_id=h.hospital_id)
+    per_person = 10 if people == 0 else random.randint(8, 15)
+    prev = await store_call(get_wait_for_hospital, h.hospital_id) or {}
+    doctors = prev.get("doctors_working") or random.randint(RNG_DOCTORS_MIN, RNG_DOCTORS_MAX)
+    est = int(math.ceil(people / max(1, doctors)) * per_person)
+    await store_call(set_wait_for_hospital, h.hospital_id, {
+    "hospital_id": h.hospital_id,
+    "people": people,
+    "per_person_minutes": per_person,
+    "doctors_working": doctors,
+    "estimated_wait_minutes": est,
+    "cameras": [{"camera_id": url, "people": None} for url in camera_urls],
+    "source": "camera",
+    })
+    h.current_people = people
+    h.per_person_minutes = per_person
+    h.active_doctors = doctors
+    h.estimated_wait_minutes = est
+
+def _score(h: SmartHospital) -> None:
+    # smoothed_wait_minutes was filled with the wait (see _enrich_wait); no store reads here, on the event loop
+    if h.eta_minutes is None:
+        h.total_time_minutes = None
+    else:
+        wait = h.smoothed_wait_minutes if h.smoothed_wait_minutes is not None else (h.estimated_wait_minutes or 0)
+        h.total_time_minutes = float(h.eta_minutes) + float(wait)
+
+def _rank(hospitals: List[SmartHospital], limit: int) -> List[SmartHospital]:
+    """Top `limit` by ETA + wait; hospitals without an ETA only fill remaining slots."""
+    for h in hospitals:
+        _score(h)
+    sortable = [h for h in hospitals if h.total_time_minutes is not None]
+    sortable.sort(key=lambda x: x.total_time_minutes)
+    top = sortable[:limit]
+    if len(top) < limit:
+        remaining = [h for h in hospitals if h not in top]
+        remaining.sort(key=lambda x: (x.eta_minutes is None, x.eta_minutes))
+        top += remaining[: (limit - len(top))]
+    return top
@@ -0,0 +1,295 @@
+# apis/shared_store.py
+# State shared by every uvicorn worker on one host: wait history, camera registry,
+# per-hospital settings, and the lease that picks which worker runs the camera poller.
+# Backed by SQLite in WAL mode on local disk when SHARED_STORE_PATH is set; otherwise
+# everything stays process-local (single worker, as before).
+#
+# Each process keeps its own read-through copy; `PRAGMA data_version` says when
+# anything was committed, and a per-namespace version table then says which
+# copies to refresh. Nothing is opened until first use (not at import), and async
+# code reaches the store through store_call(), which keeps SQLite off the event loop.
+import os, json, socket, sqlite3, asyncio, threading, time
+from collections.abc import MutableMapping
+from typing import Any, Callable, Dict, Iterator, Optional, TypeVar
+
+from .cache import TTLCache
+from .wait_store import WAIT_HISTORY_LEN, FIELDS, WaitHistory
+
+SHARED_STORE_PATH = os.getenv("SHARED_STORE_PATH", "")            # e.g. /var/lib/hospital/shared.db
+SHARED_WAIT_RETENTION_S = float(os.getenv("SHARED_WAIT_RETENTION_S", "86400"))
+_PRUNE_EVERY = 500  # inserts between retention sweeps
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (ns TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, PRIMARY KEY (ns, key));
+CREATE TABLE IF NOT EXISTS versions (ns TEXT PRIMARY KEY, v INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS wait_samples (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    hospital_id TEXT NOT NULL, ts REAL NOT NULL,
+    people INTEGER, per_person_minutes INTEGER, doctors_working INTEGER, estimated_wait_minutes INTEGER,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_wait_samples_hospital ON wait_samples (hospital_id, id);
+"""
+
+T = TypeVar("T")
+
+class SqliteStore:
+    """
+    One process's view of the shared file. Reads and writes go through separate
+    connections (and locks), so a read never queues behind a write that is
+    waiting out another worker's lock (WAL readers don't block on writers).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._lock = threading.RLock()       # writer connection
+        self._read_lock = threading.RLock()  # reader connection, data_version, versions
+        self._writer: Optional[sqlite3.Connection] = None
+        self._reader: Optional[sqlite3.Connection] = None
+        self._data_version = None
+        self._versions: Dict[str, int] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _write_conn(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._writer is None:
+                self._writer = self._connect()
+                self._writer.executescript(_SCHEMA)
+            return self._writer
+
+    def _read_conn(self) -> sqlite3.Connection:
+        # caller holds _read_lock
+        if self._reader is None:
+            self._write_conn()  # creates the schema
+            self._reader = self._connect()
+        return self._reader
+
+    def execute(self, sql: str, params=()) -> list:
+        with self._read_lock:
+            return self._read_conn().execute(sql, params).fetchall()
+
+    def write(self, ns: str, statements) -> Optional[int]:
+        """Run (sql, params) pairs in one transaction and bump `ns`'s version. Returns the last rowid."""
+        with self._lock:
+            cur = self._write_conn().cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, params in statements:
+                    cur.execute(sql, params)
+                rowid = cur.lastrowid
+                cur.execute("INSERT INTO versions (ns, v) VALUES (?, 1) ON CONFLICT(ns) DO UPDATE SET v = v + 1", (ns,))
+                cur.execute("COMMIT")
+            except BaseException:
+                cur.execute("ROLLBACK")
+                raise
+            return rowid
+
+    def poll(self) -> Dict[str, int]:
+        """Namespace versions; re-read only when something (any process) has committed since the last call."""
+        with self._read_lock:
+            conn = self._read_conn()
+            dv = conn.execute("PRAGMA data_version").fetchone()[0]
+            if dv != self._data_version:
+                self._data_version = dv
+                self._versions = dict(conn.execute("SELECT ns, v FROM versions").fetchall())
+            return self._versions
+
+    def hold_lease(self, name: str, ttl: float) -> bool:
+        """Take or renew a named lease for this process; False while another live process holds it."""
+        now = time.time()
+        with self._lock:
+            conn = self._write_conn()
+            conn.execute(
+                "INSERT INTO leases (name, owner, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires = excluded.expires "
+                "WHERE leases.owner = excluded.owner OR leases.expires < ?",
+                (name, self.owner, now + ttl, now))
+            row = conn.execute("SELECT owner FROM leases WHERE name = ?", (name,)).fetchone()
+        return bool(row) and row[0] == self.owner
+
+_STORE: Optional[SqliteStore] = SqliteStore(SHARED_STORE_PATH) if SHARED_STORE_PATH else None  # opens on first use
+
+def shared_enabled() -> bool:
+    return _STORE is not None
+
+def hold_lease(name: str, ttl: float) -> bool:
+    return True if _STORE is None else _STORE.hold_lease(name, ttl)
+
+async def store_call(fn: Callable[..., T], *args: Any) -> T:
+    """`fn(*args)` from async code: in a worker thread when it may reach SQLite, inline when state is process-local."""
+    if _STORE is None:
+        return fn(*args)
+    return await asyncio.to_thread(fn, *args)
+
+# ---------------- key/value namespaces ----------------
+class SharedDict(MutableMapping):
+    """dict of JSON values in one namespace; reloaded when another worker changes it."""
+
+    def __init__(self, store: SqliteStore, ns: str, initial: Optional[Dict[str, Any]] = None):
+        self._store, self._ns = store, ns
+        self._initial = dict(initial or {})  # seeded on first use (existing keys win)
+        self._local: Dict[str, Any] = {}
+        self._version = -1
+        self._lock = threading.Lock()
+
+    def _sync(self) -> Dict[str, Any]:
+        v = self._store.poll().get(self._ns, 0)
+        if v != self._version:
+            with self._lock:
+                rows = self._store.execute("SELECT key, value FROM kv WHERE ns = ?", (self._ns,))
+                self._local = {k: json.loads(val) for k, val in rows}
+                self._version = v
+        if self._initial:
+            initial, self._initial = self._initial, {}
+            for k, val in initial.items():
+                if k not in self._local:
+                    self[k] = val
+        return self._local
+
+    def __getitem__(self, key: str) -> Any:
+        return self._sync()[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._sync()
+        self._store.write(self._ns, [(
+            "INSERT INTO kv (ns, key, value) VALUES (?, ?, ?) ON CONFLICT(ns, key) DO UPDATE SET value = excluded.value",
+            (self._ns, key, json.dumps(value)))])
+        with self._lock:
+            self._local[key] = value
+            self._version = self._store.poll().get(self._ns, 0)
+
+    def __delitem__(self, key: str) -> None:
+        if key not in self._sync():
+            raise KeyError(key)
+        self._store.write(self._ns, [("DELETE FROM kv WHERE ns = ? AND key = ?", (self._ns, key))])
+        with self._lock:
+            self._local.pop(key, None)
+            self._version = self._store.poll().get(self._ns, 0)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._sync()))
+
+    def __len__(self) -> int:
+        return len(self._sync())
+
+def shared_dict(ns: str, initial: Optional[Dict[str, Any]] = None) -> MutableMapping:
+    """A plain dict without a shared store; otherwise a SharedDict seeded with `initial` (existing keys win)."""
+    if _STORE is None:
+        return dict(initial or {})
+    return SharedDict(_STORE, ns, initial)
+
+# ---------------- wait history ----------------
+class SharedWaitHistory:
+    """
+    WaitHistory whose samples live in SQLite. The local WaitHistory is the
+    read-through cache: hospitals are loaded on first use, and samples other
+    workers append are pulled incrementally (by row id) when the "wait"
+    namespace version moves.
+    """
+    NS = "wait"
+
+    def __init__(self, store: SqliteStore, size: int = WAIT_HISTORY_LEN):
+        self._store = store
+        self._local = WaitHistory(size=size)
+        self._size = size
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None  # both set on first use
+        self._last_id = 0
+        self._empty = TTLCache(4096, 5.0)  # hospitals recently found to have no samples
+        self._inserts = 0
+
+    @staticmethod
+    def _record(row) -> Dict[str, Any]:
+        _id, hid, ts, *vals, extra = row
+        rec = json.loads(extra) if extra else {}
+        rec.update({f: v for f, v in zip(FIELDS, vals) if v is not None})
+        return rec
+
+    def _pull(self) -> None:
+        if self._version is None:
+            with self._lock:
+                if self._version is None:
+                    # version first: a sample added in between moves it, so the next pull fetches it.
+                    # Older samples are loaded per hospital on first use (_ensure).
+                    self._version = self._store.poll().get(self.NS, 0)
+                    self._last_id = self._store.execute("SELECT COALESCE(MAX(id), 0) FROM wait_samples")[0][0]
+        v = self._store.poll().get(self.NS, 0)
+        if v == self._version:
+            return
+        with self._lock:
+            rows = self._store.execute(
+                "SELECT id, hospital_id, ts, people, per_person_minutes, doctors_working, estimated_wait_minutes, extra "
+                "FROM wait_samples WHERE id > ? ORDER BY id", (self._last_id,))
+            for row in rows:
+                # not "empty" any more, whether or not it is cached here
+                self._empty.pop(row[1])
+                # hospitals not cached here are read in full on first use instead
+                if self._local.has(row[1]):
+                    self._local.append(row[1], self._record(row), ts=row[2])
+                self._last_id = max(self._last_id, row[0])
+            self._version = v
+
+    def _ensure(self, hospital_id: str) -> None:
+        self._pull()
+        if self._local.has(hospital_id) or self._empty.get(hospital_id):
+            return
+        with self._lock:
+            rows = self._store.execute(
+                "SELECT id, hospital_id, ts, people, per_person_minutes, doctors_working, estimated_wait_minutes, extra "
+                "FROM wait_samples WHERE hospital_id = ? AND id <= ? ORDER BY id DESC LIMIT ?",
+                (hospital_id, self._last_id, self._size))
+            if not rows:
+                self._empty.set(hospital_id, True)
+            for row in reversed(rows):
+                self._local.append(hospital_id, self._record(row), ts=row[2])
+
+    def append(self, hospital_id: str, record: Dict[str, Any], ts=None) -> None:
+        self._ensure(hospital_id)
+        t = time.time() if ts is None else ts
+        vals = [record.get(f) for f in FIELDS]
+        extra = json.dumps({k: v for k, v in record.items() if k not in FIELDS and k != "ts"}, default=str)
+        stmts = [("INSERT INTO wait_samples (hospital_id, ts, people, per_person_minutes, doctors_working, "
+                  "estimated_wait_minutes, extra) VALUES (?, ?, ?, ?, ?, ?, ?)", (hospital_id, t, *vals, extra))]
+        self._inserts += 1
+        if self._inserts % _PRUNE_EVERY == 0:
+            stmts.append(("DELETE FROM wait_samples WHERE ts < ?", (time.time() - SHARED_WAIT_RETENTION_S,)))
+        self._store.write(self.NS, stmts)
+        self._empty.pop(hospital_id)
+        # picks up our row and anything other workers added before it, in id order
+        self._version = -1
+        self._pull()
+        if not self._local.has(hospital_id):
+            self._ensure(hospital_id)
+
+    def has(self, hospital_id: str) -> bool:
+        self._ensure(hospital_id)
+        return self._local.has(hospital_id)
+
+    def latest(self, hospital_id: str):
+        self._ensure(hospital_id)
+        return self._local.latest(hospital_id)
+
+    def at(self, hospital_id: str, when):
+        self._ensure(hospital_id)
+        return self._local.at(hospital_id, when)
+
+    def window(self, hospital_id: str, seconds: float, field: str = "estimated_wait_minutes"):
+        self._ensure(hospital_id)
+        return self._local.window(hospital_id, seconds, field)
+
+    def stats(self, hospital_id: str, seconds: float, field: str = "estimated_wait_minutes"):
+        self._ensure(hospital_id)
+        return self._local.stats(hospital_id, seconds, field)
+
+    def __len__(self) -> int:
+        return len(self._local)
+
+def open_wait_history():
+    return WaitHistory() if _STORE is None else SharedWaitHistory(_STORE)
@@ -0,0 +1,35 @@
+# apis/singleflight.py
+import asyncio, os
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+# Origins are rounded to this many decimals before they become part of a key
+# (4 decimals ~ 11 m), so phones standing next to each other share one computation.
+COALESCE_DECIMALS = int(os.getenv("COALESCE_DECIMALS", "4"))
+
+def origin_key(lat: float, lng: float) -> Tuple[float, float]:
+    return round(lat, COALESCE_DECIMALS), round(lng, COALESCE_DECIMALS)
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key: the first caller runs the work,
+    everyone who arrives while it is in flight gets the same result (or exception).
+    Nothing is cached once the call completes.
+    """
+
+    def __init__(self):
+        self._async: Dict[Tuple[int, Hashable], "asyncio.Future[Any]"] = {}
+
+    async def do_async(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args: Any, **kwargs: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        k = (id(loop), key)
+        task = self._async.get(k)
+        if task is None:
+            task = self._async[k] = asyncio.ensure_future(fn(*args, **kwargs))
+            task.add_done_callback(lambda t: self._forget(k, t))
+        # shield: a caller that disconnects must not cancel the work for the others
+        return await asyncio.shield(task)
+
+    def _forget(self, k: Tuple[int, Hashable], task: "asyncio.Future[Any]") -> None:
+        self._async.pop(k, None)
+        if not task.cancelled():
+            task.exception()  # mark retrieved even if every caller went away
@@ -0,0 +1,94 @@
+# apis/spatial_index.py
+import os, time, threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .geo import deg_box, geohash_cover, geohash_encode, haversine_km
+
+# Grid precision 5 is a ~4.9 x 4.9 km cell: a 10 km radius query touches ~25 cells.
+INDEX_PRECISION = int(os.getenv("NEARBY_INDEX_PRECISION", "5"))
+# How long after a Places call an origin cell counts as "seen" (index answers instead of Places)
+INDEX_SEEN_TTL = float(os.getenv("NEARBY_INDEX_SEEN_TTL_SECONDS", "86400"))
+INDEX_SEEN_MAX_ENTRIES = int(os.getenv("NEARBY_INDEX_SEEN_MAX_ENTRIES", "50000"))
+
+_STATIC_KEYS = ("hospital_id", "name", "lat", "lng", "maps_url")
+
+class HospitalIndex:
+    """In-process geohash grid of known hospitals (static fields only)."""
+
+    def __init__(self, precision: int = INDEX_PRECISION, seen_max_entries: int = INDEX_SEEN_MAX_ENTRIES):
+        self.precision = precision
+        self.seen_max_entries = max(1, int(seen_max_entries))
+        self._cells: Dict[str, Set[str]] = {}
+        self._rows: Dict[str, Dict[str, Any]] = {}
+        self._cell_of: Dict[str, str] = {}
+        # cell -> (ts, radius_m, max_results, complete), oldest mark first
+        self._seen: "OrderedDict[str, Tuple[float, float, int, bool]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def upsert(self, rows: Iterable[Dict[str, Any]]) -> None:
+        with self._lock:
+            for r in rows:
+                hid, lat, lng = r.get("hospital_id"), r.get("lat"), r.get("lng")
+                if not hid or lat is None or lng is None:
+                    continue
+                prev = self._rows.get(hid) or {}
+                row = {k: (r.get(k) if r.get(k) is not None else prev.get(k)) for k in _STATIC_KEYS}
+                row["lat"], row["lng"] = float(lat), float(lng)
+                cell = geohash_encode(row["lat"], row["lng"], self.precision)
+                old = self._cell_of.get(hid)
+                if old and old != cell:
+                    self._cells.get(old, set()).discard(hid)
+                self._cells.setdefault(cell, set()).add(hid)
+                self._cell_of[hid] = cell
+                self._rows[hid] = row
+
+    def near(self, lat: float, lng: float, radius_m: float, *, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Hospitals within radius_m, nearest first, each with a `distance_km`."""
+        cells = geohash_cover(*deg_box(lat, lng, radius_m), self.precision)
+        out = []
+        with self._lock:
+            for cell in cells:
+                for hid in self._cells.get(cell, ()):
+                    row = self._rows[hid]
+                    d = haversine_km(lat, lng, row["lat"], row["lng"])
+                    if d * 1000.0 <= radius_m:
+                        out.append({**row, "distance_km": round(d, 2)})
+        out.sort(key=lambda r: r["distance_km"])
+        return out[:limit] if limit else out
+
+    # ---- which origins Places has answered for recently ----
+    def mark_seen(self, lat: float, lng: float, radius_m: float, max_results: int, returned: int) -> None:
+        """
+        Places answered (radius_m, max_results) from this cell with `returned` results.
+        Marks older than INDEX_SEEN_TTL, then the oldest beyond seen_max_entries, are dropped.
+        """
+        cell, now = geohash_encode(lat, lng, self.precision), time.time()
+        with self._lock:
+            self._seen[cell] = (now, float(radius_m), int(max_results), returned < max_results)
+            self._seen.move_to_end(cell)
+            while self._seen:
+                oldest = next(iter(self._seen.values()))
+                if now - oldest[0] <= INDEX_SEEN_TTL and len(self._seen) <= self.seen_max_entries:
+                    break
+                self._seen.popitem(last=False)
+
+    def seen_recently(self, lat: float, lng: float, radius_m: float, max_results: int,
+                      ttl: float = INDEX_SEEN_TTL) -> bool:
+        """
+        True if Places answered a query from this cell within `ttl` that covers this one:
+        at least this radius, and at least this many results (or all there were).
+        """
+        cell = geohash_encode(lat, lng, self.precision)
+        with self._lock:
+            seen = self._seen.get(cell)
+        if seen is None:
+            return False
+        ts, seen_radius, seen_results, complete = seen
+        return (time.time() - ts <= ttl and radius_m <= seen_radius
+                and (max_results <= seen_results or complete))
+
+hospital_index = HospitalIndex()
@@ -0,0 +1,135 @@
+# apis/wait_store.py
+# Wait-time history: a fixed-size ring of samples per hospital in NumPy arrays,
+# hospitals evicted least-recently-used, so memory is bounded however many we track.
+import os, threading, time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Union
+
+import numpy as np
+
+WAIT_HISTORY_LEN = int(os.getenv("WAIT_HISTORY_LEN", "120"))               # samples kept per hospital
+WAIT_STORE_MAX_HOSPITALS = int(os.getenv("WAIT_STORE_MAX_HOSPITALS", "5000"))
+
+# numeric columns of a sample; -1 marks "unknown" in the integer ones
+FIELDS = ("people", "per_person_minutes", "doctors_working", "estimated_wait_minutes")
+_DTYPES = {"people": np.int32, "per_person_minutes": np.int16, "doctors_working": np.int16, "estimated_wait_minutes": np.int32}
+
+def _epoch(t: Union[None, float, str, datetime]) -> float:
+    if t is None:
+        return time.time()
+    if isinstance(t, (int, float)):
+        return float(t)
+    if isinstance(t, str):
+        t = datetime.fromisoformat(t)
+    if t.tzinfo is None:
+        t = t.replace(tzinfo=timezone.utc)
+    return t.timestamp()
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+class _Series:
+    __slots__ = ("ts", "cols", "head", "n", "extra")
+
+    def __init__(self, size: int):
+        self.ts = np.zeros(size, dtype=np.float64)
+        self.cols = {f: np.full(size, -1, dtype=_DTYPES[f]) for f in FIELDS}
+        self.head = 0      # next write position
+        self.n = 0
+        self.extra: Dict[str, Any] = {}  # non-numeric fields of the latest sample (cameras, source, ...)
+
+    def append(self, ts: float, record: Dict[str, Any]) -> None:
+        i = self.head
+        self.ts[i] = ts
+        for f in FIELDS:
+            v = record.get(f)
+            self.cols[f][i] = -1 if v is None else int(v)
+        self.head = (i + 1) % len(self.ts)
+        self.n = min(self.n + 1, len(self.ts))
+        self.extra = {k: v for k, v in record.items() if k not in FIELDS and k != "ts"}
+
+    def order(self) -> np.ndarray:
+        """Ring positions oldest -> newest."""
+        return (self.head - self.n + np.arange(self.n)) % len(self.ts)
+
+    def row(self, i: int) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"ts": _iso(float(self.ts[i]))}
+        for f in FIELDS:
+            v = int(self.cols[f][i])
+            if v >= 0:  # unknown fields are left out, as in the record that was stored
+                out[f] = v
+        return out
+
+class WaitHistory:
+    """
+    Per-hospital ring buffers of (ts, people, per_person_minutes,
+    doctors_working, estimated_wait_minutes) with latest / window / at-time
+    queries. Thread-safe.
+    """
+
+    def __init__(self, size: int = WAIT_HISTORY_LEN, max_hospitals: int = WAIT_STORE_MAX_HOSPITALS):
+        self.size = max(1, size)
+        self.max_hospitals = max(1, max_hospitals)
+        self._series: "OrderedDict[str, _Series]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, hospital_id: str) -> Optional[_Series]:
+        s = self._series.get(hospital_id)
+        if s is not None:
+            self._series.move_to_end(hospital_id)
+        return s
+
+    def append(self, hospital_id: str, record: Dict[str, Any], ts: Union[None, float, str, datetime] = None) -> None:
+        t = _epoch(ts)
+        with self._lock:
+            s = self._get(hospital_id)
+            if s is None:
+                s = self._series[hospital_id] = _Series(self.size)
+                while len(self._series) > self.max_hospitals:
+                    self._series.popitem(last=False)
+            s.append(t, record)
+
+    def has(self, hospital_id: str) -> bool:
+        with self._lock:
+            return hospital_id in self._series
+
+    def latest(self, hospital_id: str) -> Optional[Dict[str, Any]]:
+        """The last sample as a full record (numeric fields + extras + ISO ts)."""
+        with self._lock:
+            s = self._get(hospital_id)
+            if s is None or s.n == 0:
+                return None
+            return {**s.extra, **s.row((s.head - 1) % len(s.ts))}
+
+    def at(self, hospital_id: str, when: Union[float, str, datetime]) -> Optional[Dict[str, Any]]:
+        """The sample in effect at `when` (latest one at or before it)."""
+        t = _epoch(when)
+        with self._lock:
+            s = self._get(hospital_id)
+            if s is None or s.n == 0:
+                return None
+            idx = s.order()
+            k = int(np.searchsorted(s.ts[idx], t, side="right")) - 1
+            return s.row(int(idx[k])) if k >= 0 else None
+
+    def window(self, hospital_id: str, seconds: float, field: str = "estimated_wait_minutes") -> np.ndarray:
+        """Known values of `field` from the last `seconds`, oldest first."""
+        with self._lock:
+            s = self._get(hospital_id)
+            if s is None or s.n == 0:
+                return np.empty(0)
+            idx = s.order()
+            idx = idx[s.ts[idx] >= time.time() - seconds]
+            vals = s.cols[field][idx]
+            return vals[vals >= 0].astype(np.float64)
+
+    def stats(self, hospital_id: str, seconds: float, field: str = "estimated_wait_minutes") -> Optional[Dict[str, float]]:
+        vals = self.window(hospital_id, seconds, field)
+        if vals.size == 0:
+            return None
+        return {"n": int(vals.size), "mean": float(vals.mean()), "median": float(np.median(vals)),
+                "min": float(vals.min()), "max": float(vals.max())}
+
+    def __len__(self) -> int:
+        return len(self._series)
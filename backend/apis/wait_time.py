@@ -1,72 +1,104 @@
-import os, base64, json, random
+import os, base64, json, random, asyncio
 from datetime import datetime, timezone
 from typing import Dict, Any, List, Optional
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request
 from pydantic import BaseModel, Field
 
-# ---------------- In-memory store (hackathon simple) ----------------
-_WAIT: Dict[str, Dict[str, Any]] = {}
+# ---------------- Wait store (bounded history, see wait_store.py; shared across workers, see shared_store.py) ----------------
+from .shared_store import open_wait_history, store_call
+
+wait_history = open_wait_history()
+
+# ranking uses the median estimate over this window instead of the single last sample
+WAIT_SMOOTHING_WINDOW_S = float(os.getenv("WAIT_SMOOTHING_WINDOW_S", "900"))
 
 def set_wait_for_hospital(hospital_id: str, record: Dict[str, Any]) -> None:
-    record = dict(record)
-    record["ts"] = datetime.now(timezone.utc).isoformat()
-    _WAIT[hospital_id] = record
+    wait_history.append(hospital_id, record)
 
 def get_wait_for_hospital(hospital_id: str) -> Optional[Dict[str, Any]]:
-    return _WAIT.get(hospital_id)
+    return wait_history.latest(hospital_id)
+
+# `source` of records counted from real frames; "rng" marks demo numbers
+CAMERA_SOURCES = ("poller", "camera", "upload")
 
-# ---------------- People counting (OpenAI optional) -----------------
+def get_camera_wait(hospital_id: str) -> Optional[Dict[str, Any]]:
+    """The latest record if it was counted from camera frames (None for RNG or unknown origin)."""
+    rec = get_wait_for_hospital(hospital_id)
+    return rec if rec and rec.get("source") in CAMERA_SOURCES else None
+
+def get_smoothed_wait(hospital_id: str, window_s: float = WAIT_SMOOTHING_WINDOW_S) -> Optional[float]:
+    """Median estimated wait over the last `window_s` seconds (None if no samples)."""
+    s = wait_history.stats(hospital_id, window_s)
+    return s["median"] if s else None
+
+def wait_age_seconds(record: Optional[Dict[str, Any]]) -> Optional[float]:
+    """Seconds since a stored record was written (None if unknown)."""
+    ts = (record or {}).get("ts")
+    if not ts:
+        return None
+    try:
+        return (datetime.now(timezone.utc) - datetime.fromisoformat(str(ts))).total_seconds()
+    except ValueError:
+        return None
+
+# ---------------- People counting (pluggable engines) ---------------
 from dotenv import load_dotenv
 load_dotenv()  # ensure .env is loaded even if main.py didn't run first
 
-OPENAI_MODEL = os.getenv("OPENAI_VISION_MODEL", "gpt-5-nano")  # fixed default
-_OPENAI_CLIENT = None
-try:
-    from openai import OpenAI
-    if os.getenv("OPENAI_API_KEY"):
-        _OPENAI_CLIENT = OpenAI()
-except Exception:
-    _OPENAI_CLIENT = None
-
-def is_openai_ready() -> bool:
-    return _OPENAI_CLIENT is not None
+from .counters import PeopleCounter, get_counter, is_openai_ready  # noqa: F401  (re-exported)
+from .preprocess import preprocess_b64, preprocess_frame
+from .ingest import read_frames
+from .metrics import timed
 
-def _count_people_from_image_b64(img_b64: str, *, require_openai: bool = False) -> int:
+def _resolve_counter(engine: Optional[str], hospital_id: Optional[str], require_openai: bool) -> PeopleCounter:
     """
-    If require_openai=True and the OpenAI client isn't ready,
-    raise an error instead of using the heuristic fallback.
+    Pick the engine (request > hospital > default). If require_openai=True and
+    that engine isn't ready, raise an error instead of using the heuristic fallback.
     """
-    if _OPENAI_CLIENT is None:
-        if require_openai:
-            raise RuntimeError("OpenAI vision is not configured or unavailable")
-        # ---- fallback heuristic (demo only) ----
-        try:
-            import hashlib, random
-            h = int(hashlib.sha256(img_b64[:1024].encode("utf-8")).hexdigest(), 16)
-            random.seed(h)
-            return random.randint(1, 8)
-        except Exception:
-            return 0
-
-    import json
-    prompt = (
-        "Count the number of distinct people visible in the photo. "
-        "Return JSON like {\"people\": <integer>} with no extra text."
-    )
-    resp = _OPENAI_CLIENT.chat.completions.create(
-        model=OPENAI_MODEL,
-        messages=[{
-            "role": "user",
-            "content": [
-                {"type": "text", "text": prompt},
-                {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{img_b64}"}},
-            ],
-        }],
-        response_format={"type": "json_object"},
-    )
-    data = json.loads(resp.choices[0].message.content)
-    return max(0, int(data.get("people", 0)))
+    counter = get_counter(engine, hospital_id)
+    if counter.ready():
+        return counter
+    if require_openai:
+        raise RuntimeError(f"People counter '{counter.name}' is not configured or unavailable")
+    return get_counter("heuristic")
+
+def counter_ready(engine: Optional[str] = None, hospital_id: Optional[str] = None) -> bool:
+    return get_counter(engine, hospital_id).ready()
+
+@timed("count")
+def _count_people_batch_b64(images_b64: List[str], *, require_openai: bool = False,
+                            engine: Optional[str] = None, hospital_id: Optional[str] = None,
+                            scopes: Optional[List[Optional[str]]] = None) -> List[int]:
+    """
+    Per-image headcounts for several frames of one hospital. `scopes` (camera
+    per image, see camera_scope) lets a counter reuse a recent count of the
+    same camera's near-identical frame.
+    """
+    if not images_b64:
+        return []
+    return _resolve_counter(engine, hospital_id, require_openai).count_many_b64(images_b64, scopes)
+
+@timed("count")
+def _count_people_batch_bytes(images: List[bytes], *, require_openai: bool = False,
+                              engine: Optional[str] = None, hospital_id: Optional[str] = None,
+                              scopes: Optional[List[Optional[str]]] = None) -> List[int]:
+    """Same as _count_people_batch_b64 for raw encoded frames (no base64 round trip for local engines)."""
+    if not images:
+        return []
+    return _resolve_counter(engine, hospital_id, require_openai).count_many(images, scopes)
+
+def camera_scope(hospital_id: Optional[str], camera_id: Optional[str]) -> Optional[str]:
+    """Frame-count cache scope for an uploaded frame: the hospital's camera, else the hospital."""
+    if not hospital_id:
+        return None
+    return f"{hospital_id}/{camera_id}" if camera_id else hospital_id
+
+def _engine_or_400(engine: Optional[str], hospital_id: Optional[str] = None) -> str:
+    try:
+        return get_counter(engine, hospital_id).name
+    except ValueError as e:
+        raise HTTPException(400, str(e))
 
 # ---------------- FastAPI models + routes ---------------------------
 class CameraImage(BaseModel):
@@ -77,6 +109,7 @@ class WaitTimeIn(BaseModel):
     hospital_id: str
     cameras: List[CameraImage] = Field(default_factory=list)
     per_person_minutes: Optional[int] = Field(None, ge=1, le=60)
+    engine: Optional[str] = Field(None, description="People counter: openai | opencv (default: per hospital, then PEOPLE_COUNTER_ENGINE)")
 
 class WaitTimeOut(BaseModel):
     hospital_id: str
@@ -93,30 +126,69 @@ def upload_wait_time(payload: WaitTimeIn):
     if not payload.hospital_id:
         raise HTTPException(400, "hospital_id required")
 
-    per_person = payload.per_person_minutes or random.randint(11,20)
-    people_counts = []
-    cam_records: List[Dict[str, Any]] = []
-    for i, cam in enumerate(payload.cameras or []):
-        n = _count_people_from_image_b64(cam.image_b64)
-        people_counts.append(n)
-        cam_records.append({"camera_id": cam.camera_id or f"cam-{i+1}", "people": n})
-
-    total_people = sum(people_counts)
+    engine = _engine_or_400(payload.engine, payload.hospital_id)
+    cams = payload.cameras or []
+    frames = [preprocess_b64(c.image_b64, camera=c.camera_id, hospital_id=payload.hospital_id) for c in cams]
+    counts = _count_people_batch_b64(
+        frames, engine=engine, scopes=[camera_scope(payload.hospital_id, c.camera_id) for c in cams])
+    return _store_wait(payload.hospital_id, [c.camera_id for c in cams], counts, payload.per_person_minutes)
+
+@router.post("/raw", response_model=WaitTimeOut,
+             summary="Upload raw JPEG frames: multipart/form-data (one file per camera) or an octet-stream body")
+async def upload_wait_time_raw(
+    request: Request,
+    hospital_id: str = Query(...),
+    camera_id: Optional[str] = Query(None, description="Camera id for a single-frame body"),
+    per_person_minutes: Optional[int] = Query(None, ge=1, le=60),
+    engine: Optional[str] = Query(None, description="People counter: openai | opencv"),
+):
+    engine = _engine_or_400(engine, hospital_id)
+    frames = await read_frames(request, camera_id)
+    # raw buffers go straight to preprocessing and the counter, off the event loop
+    counts = await asyncio.to_thread(lambda: _count_people_batch_bytes(
+        [preprocess_frame(img, camera=cam, hospital_id=hospital_id) for cam, img in frames], engine=engine,
+        scopes=[camera_scope(hospital_id, cam) for cam, _ in frames]))
+    return await store_call(_store_wait, hospital_id, [cam for cam, _ in frames], counts, per_person_minutes)
+
+def _store_wait(hospital_id: str, camera_ids: List[Optional[str]], counts: List[int],
+                per_person_minutes: Optional[int]) -> WaitTimeOut:
+    per_person = per_person_minutes or random.randint(11,20)
+    cam_records: List[Dict[str, Any]] = [
+        {"camera_id": cam or f"cam-{i+1}", "people": n} for i, (cam, n) in enumerate(zip(camera_ids, counts))
+    ]
+    total_people = sum(counts)
     est_wait = int(total_people * per_person)
 
     record = {
-        "hospital_id": payload.hospital_id,
+        "hospital_id": hospital_id,
         "people": total_people,
         "per_person_minutes": per_person,
         "estimated_wait_minutes": est_wait,
         "cameras": cam_records,
+        "source": "upload",
     }
-    set_wait_for_hospital(payload.hospital_id, record)
-    out = get_wait_for_hospital(payload.hospital_id)
+    set_wait_for_hospital(hospital_id, record)
+    out = get_wait_for_hospital(hospital_id)
     if not out:
         raise HTTPException(500, "Failed to store wait-time")
     return WaitTimeOut(**out)  # type: ignore
 
+@router.get("/{hospital_id}/history", summary="Wait-time summary over a window, or the estimate in effect at a given time")
+def get_wait_history(hospital_id: str, window_s: float = Query(WAIT_SMOOTHING_WINDOW_S, gt=0, le=7 * 86400),
+                     at: Optional[datetime] = Query(None, description="ISO time; returns the sample in effect then")):
+    if at is not None:
+        rec = wait_history.at(hospital_id, at)
+        if not rec:
+            raise HTTPException(404, "No wait-time for this hospital at that time")
+        return rec
+    return {
+        "hospital_id": hospital_id,
+        "window_s": window_s,
+        "estimated_wait_minutes": wait_history.stats(hospital_id, window_s),
+        "people": wait_history.stats(hospital_id, window_s, "people"),
+        "latest": wait_history.latest(hospital_id),
+    }
+
 @router.get("/{hospital_id}", response_model=WaitTimeOut, summary="Get the latest wait-time for a hospital")
 def get_current_wait(hospital_id: str):
     rec = get_wait_for_hospital(hospital_id)
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+End-to-end latency and throughput of /nearby-hospitals, /smart-nearby,
+/live-status and /wait-time against local stand-ins (bench/fakes.py) and SQLite.
+
+    python bench/bench_endpoints.py                                  # every endpoint, default profiles
+    python bench/bench_endpoints.py -e nearby,smart -n 1000 -c 32 --places 150:50:0.02
+    python bench/bench_endpoints.py --env CACHE_TTL_SECONDS=0 --env REQUEST_BUDGET_MS=1500
+    python bench/bench_endpoints.py --json before.json               # save a baseline ...
+    python bench/bench_endpoints.py --baseline before.json           # ... and compare a later run with it
+
+Nothing leaves the machine. The fakes and `uvicorn main:app` run as child
+processes, and the backend is pointed at them through GOOGLE_PLACES_URL,
+GOOGLE_ROUTES_URL, OPENAI_BASE_URL and MYSQL_URL=sqlite:///.... Hospitals,
+origins, frames and injected latencies all derive from --seed. Vision
+endpoints need the `openai` package (or --engine opencv).
+"""
+import argparse, asyncio, base64, importlib.util, json, os, random, socket, subprocess, sys, tempfile, time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Tuple
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND)
+
+import httpx
+from sqlalchemy import create_engine, text
+
+from apis.geo import geohash_encode, haversine_km
+from apis.mysql_client import GEOHASH_PRECISION
+from fakes import DEFAULT_PROFILES, add_profile_args, synthetic_frames, synthetic_hospitals
+
+ENDPOINTS = ("nearby", "smart", "live", "wait")
+
+HOSPITALS_DDL = """
+    CREATE TABLE hospitals (
+      hospital_id VARCHAR(64) PRIMARY KEY, name VARCHAR(255), lat DOUBLE, lng DOUBLE, maps_url TEXT,
+      last_people INT, per_person_minutes INT, doctors_working INT, estimated_wait_minutes INT,
+      wait_last_updated DATETIME, updated_at DATETIME, geohash CHAR(9))
+"""
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def build_db(path: str, hospitals: List[Dict[str, Any]]) -> None:
+    engine = create_engine(f"sqlite:///{path}", future=True)
+    with engine.begin() as conn:
+        conn.execute(text(HOSPITALS_DDL))
+        conn.execute(text("CREATE INDEX ix_hospitals_geohash ON hospitals (geohash)"))
+        conn.execute(text("INSERT INTO hospitals (hospital_id, name, lat, lng, maps_url, geohash) "
+                          "VALUES (:hospital_id, :name, :lat, :lng, :maps_url, :geohash)"),
+                     [{**h, "geohash": geohash_encode(h["lat"], h["lng"], GEOHASH_PRECISION)} for h in hospitals])
+    engine.dispose()
+
+def wait_ready(url: str, proc: subprocess.Popen, timeout: float = 30.0) -> None:
+    t_end = time.monotonic() + timeout
+    while time.monotonic() < t_end:
+        if proc.poll() is not None:
+            sys.exit(f"{' '.join(proc.args)} exited with {proc.returncode}")
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    sys.exit(f"{url} not ready after {timeout:.0f}s")
+
+class Workload:
+    """Request bodies per endpoint, drawn from a fixed set of origins around the synthetic hospitals."""
+
+    def __init__(self, hospitals: List[Dict[str, Any]], fakes_url: str, *, origins: int, cameras: int, seed: int):
+        self.rnd = random.Random(seed + 1)
+        self.hospitals = hospitals
+        self.cam = lambda n: f"{fakes_url}/cam/{n}/capture.jpg"
+        self.cameras = cameras
+        picks = self.rnd.sample(hospitals, min(origins, len(hospitals)))
+        self.origins = [(h["lat"] + self.rnd.uniform(-0.02, 0.02), h["lng"] + self.rnd.uniform(-0.02, 0.02)) for h in picks]
+        # the two hospitals nearest each origin get cameras in /smart-nearby bodies
+        self.nearest = {o: sorted(range(len(hospitals)), key=lambda i: haversine_km(*o, hospitals[i]["lat"], hospitals[i]["lng"]))[:2]
+                        for o in self.origins}
+        self.frames_b64 = [base64.b64encode(f).decode("ascii") for f in synthetic_frames(32, seed + 2)]
+
+    def _origin(self) -> Tuple[float, float]:
+        return self.rnd.choice(self.origins)
+
+    def _cams(self, hospital_index: int) -> List[str]:
+        return [self.cam(hospital_index * self.cameras + k) for k in range(self.cameras)]
+
+    def nearby(self):
+        lat, lng = self._origin()
+        return "/nearby-hospitals", {"lat": lat, "lng": lng}
+
+    def smart(self):
+        lat, lng = o = self._origin()
+        return "/smart-nearby", {"lat": lat, "lng": lng, "limit": 5,
+                                 "cameras_by_hospital": {self.hospitals[i]["hospital_id"]: self._cams(i) for i in self.nearest[o]}}
+
+    def live(self):
+        i = self.rnd.randrange(len(self.hospitals))
+        return "/live-status", {"hospital_id": self.hospitals[i]["hospital_id"], "camera_urls": self._cams(i)}
+
+    def wait(self):
+        h = self.rnd.choice(self.hospitals)
+        return "/wait-time", {"hospital_id": h["hospital_id"],
+                              "cameras": [{"image_b64": b64} for b64 in self.rnd.sample(self.frames_b64, self.cameras)]}
+
+async def drive(client: httpx.AsyncClient, base: str, build: Callable[[], Tuple[str, Dict[str, Any]]],
+                n: int, concurrency: int) -> Dict[str, Any]:
+    """Closed loop: `concurrency` clients issue `n` requests in total, each as soon as its previous one returns."""
+    todo = iter(range(n))
+    ms: List[float] = []
+    errors: Counter = Counter()
+
+    async def client_loop():
+        for _ in todo:
+            path, body = build()
+            t0 = time.perf_counter()
+            try:
+                status = (await client.post(base + path, json=body)).status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            if status == 200:
+                ms.append((time.perf_counter() - t0) * 1000.0)
+            else:
+                errors[str(status)] += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    wall = time.perf_counter() - t0
+    ms.sort()
+    p = lambda q: ms[min(len(ms) - 1, int(q * len(ms)))] if ms else float("nan")
+    return {"n": n, "ok": len(ms), "errors": dict(errors), "rps": len(ms) / wall if wall else 0.0,
+            "p50": p(0.50), "p95": p(0.95), "p99": p(0.99), "max": ms[-1] if ms else float("nan")}
+
+def upstream_delta(before: Dict[str, Any], after: Dict[str, Any]) -> str:
+    calls = Counter(after["calls"])
+    calls.subtract(before["calls"])
+    return " ".join(f"{k}={v}" for k, v in sorted(calls.items()) if v) or "-"
+
+def report(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]]) -> None:
+    print(f"\n{'endpoint':<9} {'ok/n':>11} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}  upstream calls")
+    for name, r in results.items():
+        print(f"{name:<9} {r['ok']:>5}/{r['n']:<5} {r['rps']:8.1f} {r['p50']:9.1f} {r['p95']:9.1f} {r['p99']:9.1f} "
+              f"{r['max']:9.1f}  {r['upstream']}")
+        if r["errors"]:
+            print(f"{'':<9} errors: {r['errors']}")
+        b = baseline.get(name)
+        if b:
+            d = lambda k: f"{(r[k] - b[k]) / b[k]:+.0%}" if b[k] else "n/a"
+            print(f"{'':<9} vs baseline: req/s {d('rps')}  p50 {d('p50')}  p95 {d('p95')}  p99 {d('p99')}")
+
+async def run_all(args, base: str, fakes_url: str, workload: Workload) -> Dict[str, Dict[str, Any]]:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        for name in args.endpoints:
+            build = getattr(workload, name)
+            if args.warmup:
+                await drive(client, base, build, args.warmup, args.concurrency)
+            before = (await client.get(f"{fakes_url}/stats")).json()
+            results[name] = await drive(client, base, build, args.requests, args.concurrency)
+            results[name]["upstream"] = upstream_delta(before, (await client.get(f"{fakes_url}/stats")).json())
+            print(f"{name}: done in {args.requests / max(results[name]['rps'], 1e-9):.1f}s" if results[name]["ok"]
+                  else f"{name}: every request failed {results[name]['errors']}")
+    return results
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("-e", "--endpoints", default=",".join(ENDPOINTS), help=f"Comma-separated subset of {','.join(ENDPOINTS)}")
+    ap.add_argument("-n", "--requests", type=int, default=300, help="Measured requests per endpoint")
+    ap.add_argument("-c", "--concurrency", type=int, default=16)
+    ap.add_argument("--warmup", type=int, default=20, help="Unmeasured requests per endpoint first")
+    ap.add_argument("--origins", type=int, default=50, help="Distinct user locations (fewer = more cache hits)")
+    ap.add_argument("--hospitals", type=int, default=2000)
+    ap.add_argument("--cameras", type=int, default=2, help="Cameras per hospital")
+    ap.add_argument("--workers", type=int, default=1, help="uvicorn workers for the backend")
+    ap.add_argument("--engine", default="openai", choices=("openai", "opencv"), help="PEOPLE_COUNTER_ENGINE")
+    ap.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="Extra backend environment (repeatable)")
+    ap.add_argument("--timeout", type=float, default=60.0, help="Client timeout per request, s")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--json", help="Write results here")
+    ap.add_argument("--baseline", help="Results JSON of an earlier run to compare with")
+    add_profile_args(ap)
+    args = ap.parse_args()
+    args.endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    unknown = set(args.endpoints) - set(ENDPOINTS)
+    if unknown:
+        ap.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+    if args.engine == "openai" and {"smart", "live", "wait"} & set(args.endpoints) and not importlib.util.find_spec("openai"):
+        sys.exit("vision endpoints with --engine openai need `pip install openai` (or use --engine opencv)")
+
+    tmp = tempfile.mkdtemp(prefix="bench-endpoints-")
+    hospitals = synthetic_hospitals(args.hospitals, args.seed)
+    build_db(os.path.join(tmp, "hospitals.db"), hospitals)
+    fakes_port, api_port = free_port(), free_port()
+    fakes_url, base = f"http://127.0.0.1:{fakes_port}", f"http://127.0.0.1:{api_port}"
+    profile_args = [a for name in DEFAULT_PROFILES for a in (f"--{name}", ":".join(f"{v:g}" for v in getattr(args, name)))]
+
+    env = {
+        **os.environ,
+        "GOOGLE_MAPS_API_KEY": "bench",
+        "GOOGLE_PLACES_URL": f"{fakes_url}/v1/places:searchNearby",
+        "GOOGLE_ROUTES_URL": f"{fakes_url}/distanceMatrix/v2:computeRouteMatrix",
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_BASE_URL": f"{fakes_url}/v1",
+        "MYSQL_URL": f"sqlite:///{os.path.join(tmp, 'hospitals.db')}",
+        "PEOPLE_COUNTER_ENGINE": args.engine,
+        "PRIMARY_CAMERA_ID": hospitals[0]["hospital_id"],
+        "PRIMARY_CAMERA_URLS": ";".join(Workload(hospitals, fakes_url, origins=1, cameras=args.cameras, seed=args.seed)._cams(0)),
+        "CAMERA_POLLER_ENABLED": "0",  # background polls would add load nobody asked for
+        "SHARED_STORE_PATH": "",
+    }
+    for kv in args.env:
+        k, _, v = kv.partition("=")
+        env[k] = v
+
+    procs = []
+    try:
+        procs.append(subprocess.Popen([sys.executable, os.path.join(BACKEND, "bench", "fakes.py"), "--port", str(fakes_port),
+                                       "--seed", str(args.seed), "--hospitals", str(args.hospitals), *profile_args]))
+        wait_ready(f"{fakes_url}/stats", procs[-1])
+        procs.append(subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(api_port),
+                                       "--workers", str(args.workers), "--log-level", "warning"], cwd=BACKEND, env=env))
+        wait_ready(f"{base}/", procs[-1])
+
+        workload = Workload(hospitals, fakes_url, origins=args.origins, cameras=args.cameras, seed=args.seed)
+        print(f"{len(args.endpoints)} endpoints x {args.requests} requests, concurrency {args.concurrency}, "
+              f"{args.origins} origins, seed {args.seed}")
+        results = asyncio.run(run_all(args, base, fakes_url, workload))
+    finally:
+        for p in reversed(procs):
+            p.terminate()
+            try:
+                p.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                p.kill()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    report(results, baseline)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": {k: v for k, v in vars(args).items() if k not in ("json", "baseline")},
+                       "results": results}, f, indent=2, default=str)
+
+if __name__ == "__main__":
+    main()
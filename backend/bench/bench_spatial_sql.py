@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Radius lookup: lat/lng box scan (fetch_hospitals_in_bbox) vs geohash index
+ranges (fetch_hospitals_near_async / near_query).
+
+    python bench/bench_spatial_sql.py                      # synthetic table in SQLite
+    python bench/bench_spatial_sql.py --rows 500000 --radius 20000
+    python bench/bench_spatial_sql.py --dsn "mysql+pymysql://user:pw@host/db"
+
+Without --dsn a throwaway SQLite file is filled with --rows synthetic hospitals
+(clustered around towns, like a national registry). With --dsn the existing
+`hospitals` table is only read; run `import_hospitals.py --migrate-geohash` first.
+"""
+import argparse, os, random, statistics, sys, tempfile, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sqlalchemy import create_engine, text
+
+from apis.geo import deg_box, geohash_encode, haversine_km
+from apis.mysql_client import GEOHASH_PRECISION, near_query
+
+BBOX_SQL = text("""
+    SELECT hospital_id, name, lat, lng, maps_url,
+           last_people, per_person_minutes, estimated_wait_minutes, wait_last_updated, updated_at, doctors_working
+    FROM hospitals
+    WHERE lat BETWEEN :min_lat AND :max_lat
+      AND lng BETWEEN :min_lng AND :max_lng
+""")
+
+# roughly Peninsular Malaysia + Borneo
+AREA = (0.8, 7.4, 99.6, 119.3)
+
+def build_sqlite(rows: int, seed: int):
+    path = os.path.join(tempfile.mkdtemp(prefix="bench-spatial-"), "hospitals.db")
+    engine = create_engine(f"sqlite:///{path}", future=True)
+    rnd = random.Random(seed)
+    towns = [(rnd.uniform(AREA[0], AREA[1]), rnd.uniform(AREA[2], AREA[3])) for _ in range(400)]
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE hospitals (
+              hospital_id VARCHAR(64) PRIMARY KEY, name VARCHAR(255), lat DOUBLE, lng DOUBLE, maps_url TEXT,
+              last_people INT, per_person_minutes INT, doctors_working INT, estimated_wait_minutes INT,
+              wait_last_updated DATETIME, updated_at DATETIME, geohash CHAR(9))
+        """))
+        conn.execute(text("CREATE INDEX ix_hospitals_geohash ON hospitals (geohash)"))
+        batch = []
+        for i in range(rows):
+            tlat, tlng = rnd.choice(towns)
+            lat, lng = tlat + rnd.gauss(0, 0.15), tlng + rnd.gauss(0, 0.15)
+            batch.append({"id": f"h{i}", "name": f"Hospital {i}", "lat": lat, "lng": lng,
+                          "gh": geohash_encode(lat, lng, GEOHASH_PRECISION)})
+            if len(batch) == 5000 or i == rows - 1:
+                conn.execute(text("INSERT INTO hospitals (hospital_id, name, lat, lng, geohash) "
+                                  "VALUES (:id, :name, :lat, :lng, :gh)"), batch)
+                batch = []
+    return engine, towns
+
+def within(rows, lat, lng, radius_m):
+    return {r["hospital_id"] for r in rows if haversine_km(lat, lng, r["lat"], r["lng"]) * 1000.0 <= radius_m}
+
+def timed(conn, sql, params):
+    t0 = time.perf_counter()
+    rows = conn.execute(sql, params).mappings().all()
+    return (time.perf_counter() - t0) * 1000.0, rows
+
+def summary(name, ms, scanned):
+    ms = sorted(ms)
+    p = lambda q: ms[min(len(ms) - 1, int(q * len(ms)))]
+    print(f"{name:<10} p50 {p(0.50):8.2f} ms  p95 {p(0.95):8.2f} ms  p99 {p(0.99):8.2f} ms  "
+          f"mean {statistics.fmean(ms):8.2f} ms  rows/query {statistics.fmean(scanned):8.1f}")
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--dsn", help="SQLAlchemy URL of an existing database (default: synthetic SQLite)")
+    ap.add_argument("--rows", type=int, default=200_000, help="Synthetic hospitals (SQLite only)")
+    ap.add_argument("--queries", type=int, default=300)
+    ap.add_argument("--radius", type=float, default=10_000, help="Search radius, metres")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    if args.dsn:
+        engine = create_engine(args.dsn, future=True)
+        with engine.connect() as conn:
+            pts = [(float(r[0]), float(r[1])) for r in conn.execute(text("SELECT lat, lng FROM hospitals LIMIT 1000"))]
+    else:
+        t0 = time.perf_counter()
+        engine, pts = build_sqlite(args.rows, args.seed)
+        print(f"built {args.rows} rows in {time.perf_counter() - t0:.1f}s")
+    if not pts:
+        sys.exit("hospitals table is empty")
+
+    rnd = random.Random(args.seed + 1)
+    origins = [(lat + rnd.uniform(-0.05, 0.05), lng + rnd.uniform(-0.05, 0.05)) for lat, lng in rnd.choices(pts, k=args.queries)]
+    res = {"bbox": ([], []), "geohash": ([], [])}
+    with engine.connect() as conn:
+        for lat, lng in origins:
+            box = deg_box(lat, lng, args.radius)
+            t_box, rows_box = timed(conn, BBOX_SQL, dict(zip(("min_lat", "max_lat", "min_lng", "max_lng"), box)))
+            t_gh, rows_gh = timed(conn, *near_query(*box))
+            if within(rows_box, lat, lng, args.radius) != within(rows_gh, lat, lng, args.radius):
+                sys.exit(f"result mismatch at {lat:.5f},{lng:.5f}")
+            for name, t, rows in (("bbox", t_box, rows_box), ("geohash", t_gh, rows_gh)):
+                res[name][0].append(t)
+                res[name][1].append(len(rows))
+    print(f"{args.queries} queries, radius {args.radius:.0f} m, results identical")
+    for name, (ms, scanned) in res.items():
+        summary(name, ms, scanned)
+
+if __name__ == "__main__":
+    main()
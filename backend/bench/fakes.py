@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for every upstream of the backend, for offline benchmarks.
+
+    python bench/fakes.py --port 8900
+    python bench/fakes.py --places 150:50:0.02 --vision 1200:400 --camera 30:10
+
+One server, four upstreams:
+  POST /v1/places:searchNearby                 Places (New), nearest synthetic hospitals
+  POST /distanceMatrix/v2:computeRouteMatrix   Routes, straight line x detour at city speed
+  POST /v1/chat/completions                    OpenAI vision, {"people": n} / {"counts": [...]}
+  GET  /cam/<n>/capture.jpg                    camera agent, ETag + If-None-Match like camera_agent.py
+  GET  /stats                                  calls / errors per upstream so far
+
+Each upstream takes a profile MS[:JITTER_MS[:ERROR_RATE]]: responses are
+delayed by MS +/- JITTER (uniform) and answered with a 503 at ERROR_RATE.
+Hospitals, frames and headcounts are derived from --seed, so runs repeat.
+"""
+import argparse, asyncio, hashlib, os, random, sys, time
+from collections import Counter
+from typing import Any, Dict, List, NamedTuple, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import cv2
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request, Response
+
+from apis.geo import haversine_km, haversine_km_many
+
+CENTER = (3.139, 101.6869)  # Kuala Lumpur
+DETOUR_FACTOR = 1.35        # road km per straight-line km
+CITY_SPEED_KMH = 32.0
+
+class Profile(NamedTuple):
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "Profile":
+        parts = [float(p) for p in spec.split(":")]
+        if not 1 <= len(parts) <= 3:
+            raise argparse.ArgumentTypeError(f"expected MS[:JITTER_MS[:ERROR_RATE]], got {spec!r}")
+        return cls(*parts)
+
+    def __str__(self) -> str:
+        return f"{self.latency_ms:g}±{self.jitter_ms:g} ms, {self.error_rate:.1%} errors"
+
+DEFAULT_PROFILES = {
+    "places": Profile(120, 40, 0.0),
+    "routes": Profile(180, 60, 0.0),
+    "vision": Profile(900, 300, 0.0),
+    "camera": Profile(25, 10, 0.0),
+}
+
+def synthetic_hospitals(n: int, seed: int, center=CENTER, spread_deg: float = 0.3) -> List[Dict[str, Any]]:
+    """`n` hospitals scattered around `center`, the same for the same seed."""
+    rnd = random.Random(seed)
+    out = []
+    for i in range(n):
+        lat, lng = center[0] + rnd.gauss(0, spread_deg / 2), center[1] + rnd.gauss(0, spread_deg / 2)
+        hid = f"bench{seed}-{i:05d}"
+        out.append({"hospital_id": hid, "name": f"Bench Hospital {i}", "lat": round(lat, 6), "lng": round(lng, 6),
+                    "maps_url": f"https://maps.google.com/?cid={hid}"})
+    return out
+
+def synthetic_frames(n: int, seed: int, size=(640, 480)) -> List[bytes]:
+    """`n` distinct JPEG frames: a waiting-room grey with a few dark "people" blobs each."""
+    rnd = random.Random(seed)
+    w, h = size
+    out = []
+    for _ in range(n):
+        img = np.full((h, w, 3), 170, dtype=np.uint8)
+        for _ in range(rnd.randint(0, 12)):
+            x, y = rnd.randint(0, w - 60), rnd.randint(h // 3, h - 150)
+            cv2.rectangle(img, (x, y), (x + rnd.randint(30, 60), y + rnd.randint(90, 150)), (rnd.randint(20, 90),) * 3, -1)
+        img += np.frombuffer(rnd.randbytes(w * h * 3), dtype=np.uint8).reshape(h, w, 3) % 8
+        out.append(cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 85])[1].tobytes())
+    return out
+
+def _people(b64: str) -> int:
+    return hashlib.sha1(b64.encode("ascii", "ignore")).digest()[0] % 13
+
+def make_app(profiles: Dict[str, Profile], hospitals: List[Dict[str, Any]], frames: List[bytes],
+             *, seed: int = 7, frame_period_s: float = 30.0) -> FastAPI:
+    app = FastAPI(title="bench fakes")
+    rnd = random.Random(seed)
+    calls: Counter = Counter()
+    errors: Counter = Counter()
+    lats = np.array([h["lat"] for h in hospitals])
+    lngs = np.array([h["lng"] for h in hospitals])
+
+    async def gate(upstream: str) -> None:
+        p = profiles[upstream]
+        calls[upstream] += 1
+        delay = max(0.0, p.latency_ms + rnd.uniform(-p.jitter_ms, p.jitter_ms)) / 1000.0
+        fail = rnd.random() < p.error_rate
+        if delay:
+            await asyncio.sleep(delay)
+        if fail:
+            errors[upstream] += 1
+            raise HTTPException(503, f"injected {upstream} failure")
+
+    @app.post("/v1/places:searchNearby")
+    async def places(body: Dict[str, Any]):
+        await gate("places")
+        circle = body["locationRestriction"]["circle"]
+        lat, lng = circle["center"]["latitude"], circle["center"]["longitude"]
+        d = haversine_km_many(lat, lng, lats, lngs)
+        idx = [i for i in np.argsort(d) if d[i] * 1000.0 <= circle.get("radius", 10_000.0)]
+        return {"places": [{
+            "id": h["hospital_id"],
+            "name": f"places/{h['hospital_id']}",
+            "displayName": {"text": h["name"], "languageCode": "en"},
+            "location": {"latitude": h["lat"], "longitude": h["lng"]},
+            "googleMapsUri": h["maps_url"],
+        } for h in (hospitals[i] for i in idx[:int(body.get("maxResultCount", 20))])]}
+
+    @app.post("/distanceMatrix/v2:computeRouteMatrix")
+    async def routes(body: Dict[str, Any]):
+        await gate("routes")
+        out = []
+        for oi, o in enumerate(body["origins"]):
+            a = o["waypoint"]["location"]["latLng"]
+            for di, dest in enumerate(body["destinations"]):
+                b = dest["waypoint"]["location"]["latLng"]
+                km = haversine_km(a["latitude"], a["longitude"], b["latitude"], b["longitude"]) * DETOUR_FACTOR
+                out.append({"originIndex": oi, "destinationIndex": di, "status": {}, "condition": "ROUTE_EXISTS",
+                            "distanceMeters": int(km * 1000), "duration": f"{int(km / CITY_SPEED_KMH * 3600) + 60}s"})
+        return out
+
+    @app.post("/v1/chat/completions")
+    async def chat(body: Dict[str, Any]):
+        await gate("vision")
+        images = [part["image_url"]["url"].rsplit(",", 1)[-1]
+                  for msg in body.get("messages", []) if isinstance(msg.get("content"), list)
+                  for part in msg["content"] if part.get("type") == "image_url"]
+        counts = [_people(b64) for b64 in images]
+        content = f'{{"people": {counts[0]}}}' if len(counts) == 1 else f'{{"counts": {counts}}}'
+        return {
+            "id": f"chatcmpl-bench-{calls['vision']}", "object": "chat.completion", "created": int(time.time()),
+            "model": body.get("model", "bench"),
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": 85 * len(images), "completion_tokens": 8, "total_tokens": 85 * len(images) + 8},
+        }
+
+    @app.get("/cam/{cam}/capture.jpg")
+    async def capture(cam: int, request: Request):
+        await gate("camera")
+        # each camera shows a new scene every frame_period_s (cameras out of step with each other)
+        i = (cam + int(time.time() / frame_period_s)) % len(frames) if frame_period_s > 0 else cam % len(frames)
+        etag = f'"bench-{i}"'
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(frames[i], media_type="image/jpeg", headers={"ETag": etag, "Cache-Control": "no-store"})
+
+    @app.get("/stats")
+    def stats():
+        return {"calls": dict(calls), "errors": dict(errors)}
+
+    return app
+
+def add_profile_args(ap: argparse.ArgumentParser) -> None:
+    for name, p in DEFAULT_PROFILES.items():
+        ap.add_argument(f"--{name}", type=Profile.parse, default=p, metavar="MS[:JITTER[:ERR]]",
+                        help=f"{name} upstream profile (default {p.latency_ms:g}:{p.jitter_ms:g}:{p.error_rate:g})")
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8900)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--hospitals", type=int, default=2000, help="Synthetic hospitals Places answers from")
+    ap.add_argument("--frames", type=int, default=32, help="Distinct camera frames")
+    ap.add_argument("--frame-period-s", type=float, default=30.0, help="How often each camera's scene changes (0 = never)")
+    add_profile_args(ap)
+    args = ap.parse_args(argv)
+
+    profiles = {name: getattr(args, name) for name in DEFAULT_PROFILES}
+    app = make_app(profiles, synthetic_hospitals(args.hospitals, args.seed), synthetic_frames(args.frames, args.seed),
+                   seed=args.seed, frame_period_s=args.frame_period_s)
+    for name, p in profiles.items():
+        print(f"{name:<7} {p}")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
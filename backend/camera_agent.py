@@ -1,10 +1,157 @@
 # camera_agent.py
+import os, sys, asyncio, hashlib, threading, time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional, Tuple
+
 import cv2
-from fastapi import FastAPI, Response, HTTPException
+from fastapi import FastAPI, Request, Response, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
-app = FastAPI(title="Camera Agent")
+CAMERA_INDEX = int(os.getenv("CAMERA_INDEX", "0"))
+CAPTURE_WIDTH = int(os.getenv("CAPTURE_WIDTH", "640"))
+CAPTURE_HEIGHT = int(os.getenv("CAPTURE_HEIGHT", "480"))
+CAPTURE_FPS = float(os.getenv("CAPTURE_FPS", "5"))        # how often a frame is encoded into the ring
+JPEG_QUALITY = int(os.getenv("JPEG_QUALITY", "85"))
+RING_SIZE = int(os.getenv("FRAME_RING_SIZE", "4"))
+WARMUP_FRAMES = int(os.getenv("WARMUP_FRAMES", "10"))     # let auto-exposure settle before serving
+STREAM_MAX_FPS = float(os.getenv("STREAM_MAX_FPS", "5"))
+STREAM_HEARTBEAT_S = float(os.getenv("STREAM_HEARTBEAT_S", "10"))  # empty part so readers can tell idle from dead
+MJPEG_BOUNDARY = "frame"
+AGENT_HOST = os.getenv("CAMERA_AGENT_HOST", "0.0.0.0")
+AGENT_PORT = int(os.getenv("CAMERA_AGENT_PORT", "9001"))  # or argv[1]: one agent per laptop/webcam
+
+def scene_etag(frame) -> str:
+    """
+    ETag keyed by frame content: hash of a 32x24 grayscale thumbnail quantised
+    to 16 levels, so sensor noise alone doesn't count as a new frame.
+    """
+    thumb = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), (32, 24), interpolation=cv2.INTER_AREA)
+    return '"' + hashlib.sha1((thumb >> 4).tobytes()).hexdigest()[:20] + '"'
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+class FrameGrabber:
+    """
+    Keeps the webcam open and, on a background thread, keeps a small ring of
+    pre-encoded JPEGs (plus the latest raw frame for custom sizes/qualities).
+    Readers get (ts, jpeg, etag, raw) for the newest entry, taken under one lock
+    so the raw frame always matches the ETag.
+    """
+
+    def __init__(self):
+        self._ring: deque = deque(maxlen=max(1, RING_SIZE))  # (ts, jpeg bytes, etag)
+        self._raw = None
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="frame-grabber", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=3)
+            self._thread = None
+
+    def _open(self):
+        # CAP_DSHOW helps on Windows
+        cap = cv2.VideoCapture(CAMERA_INDEX, cv2.CAP_DSHOW if os.name == "nt" else cv2.CAP_ANY)
+        if not cap.isOpened():
+            return None
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, CAPTURE_WIDTH)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, CAPTURE_HEIGHT)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        for _ in range(WARMUP_FRAMES):
+            cap.read()
+        return cap
+
+    def _run(self) -> None:
+        cap, last_encode = None, 0.0
+        period = 1.0 / max(0.1, CAPTURE_FPS)
+        while not self._stop.is_set():
+            if cap is None:
+                cap = self._open()
+                if cap is None:
+                    time.sleep(1.0)  # device busy/unplugged: retry
+                    continue
+            if time.monotonic() - last_encode < period:
+                # drain the driver buffer so the next frame we decode is current
+                if not cap.grab():
+                    cap.release()
+                    cap = None
+                continue
+            ok, frame = cap.read()
+            if not ok:
+                cap.release()
+                cap = None
+                continue
+            last_encode = time.monotonic()
+            etag = scene_etag(frame)
+            with self._cond:
+                if self._ring and self._ring[-1][2] == etag:
+                    continue  # scene unchanged: keep serving the same bytes under the same ETag
+            ok, buf = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), JPEG_QUALITY])
+            if not ok:
+                continue
+            with self._cond:
+                self._raw = frame
+                self._ring.append((time.time(), buf.tobytes(), etag))
+                self._cond.notify_all()
+        if cap is not None:
+            cap.release()
+
+    def _snapshot(self) -> Tuple[float, bytes, str, object]:
+        ts, data, etag = self._ring[-1]
+        return ts, data, etag, self._raw
+
+    def latest(self, timeout: float = 2.0) -> Tuple[float, bytes, str, object]:
+        with self._cond:
+            if not self._ring:
+                self._cond.wait_for(lambda: bool(self._ring), timeout=timeout)
+            if not self._ring:
+                raise HTTPException(status_code=503, detail="Webcam not available")
+            return self._snapshot()
+
+    def current(self) -> Optional[Tuple[float, bytes, str, object]]:
+        """Newest entry without waiting (None before the first frame)."""
+        with self._cond:
+            return self._snapshot() if self._ring else None
+
+    @staticmethod
+    def encode(frame, width: Optional[int], height: Optional[int], quality: int) -> bytes:
+        """`frame` at a custom size (never upscaled) and JPEG quality."""
+        h, w = frame.shape[:2]
+        if width or height:
+            scale = min((width or w) / w, (height or h) / h, 1.0)
+            if scale < 1.0:
+                frame = cv2.resize(frame, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+        ok, buf = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+        if not ok:
+            raise HTTPException(status_code=500, detail="JPEG encode failed")
+        return buf.tobytes()
+
+grabber = FrameGrabber()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    grabber.start()
+    try:
+        yield
+    finally:
+        grabber.stop()
+
+app = FastAPI(title="Camera Agent", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -12,30 +159,73 @@ app.add_middleware(
     allow_methods=["*"], allow_headers=["*"],
 )
 
-def grab_frame_jpeg() -> bytes:
-    cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)  # CAP_DSHOW helps on Windows
-    if not cap.isOpened():
-        raise HTTPException(status_code=500, detail="Webcam not available")
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-    ok, frame = cap.read()
-    cap.release()
-    if not ok:
-        raise HTTPException(status_code=500, detail="Failed to capture frame")
-    ok, buf = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), 85])
-    if not ok:
-        raise HTTPException(status_code=500, detail="JPEG encode failed")
-    return buf.tobytes()
+def _variant(etag: str, width: Optional[int], height: Optional[int], quality: Optional[int]) -> Tuple[bool, str]:
+    custom = bool(width or height or (quality and quality != JPEG_QUALITY))
+    if custom:
+        etag = f'{etag[:-1]}-{width or 0}x{height or 0}q{quality or JPEG_QUALITY}"'
+    return custom, etag
 
 @app.get("/capture.jpg")
-def capture_jpg():
-    data = grab_frame_jpeg()
-    return Response(content=data, media_type="image/jpeg")
+def capture_jpg(
+    request: Request,
+    width: Optional[int] = Query(None, ge=32, le=3840),
+    height: Optional[int] = Query(None, ge=32, le=2160),
+    quality: Optional[int] = Query(None, ge=10, le=100),
+):
+    _ts, data, etag, raw = grabber.latest()
+    custom, etag = _variant(etag, width, height, quality)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    # unchanged scene: the caller already has these bytes (and their headcount)
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if custom:
+        data = grabber.encode(raw, width, height, quality or JPEG_QUALITY)
+    return Response(content=data, media_type="image/jpeg", headers=headers)
+
+@app.get("/stream.mjpg")
+async def stream_mjpg(
+    width: Optional[int] = Query(None, ge=32, le=3840),
+    height: Optional[int] = Query(None, ge=32, le=2160),
+    quality: Optional[int] = Query(None, ge=10, le=100),
+    fps: float = Query(STREAM_MAX_FPS, gt=0, le=30),
+):
+    """
+    multipart/x-mixed-replace stream. A JPEG part is only sent when the scene
+    changes; otherwise a zero-length part every STREAM_HEARTBEAT_S. Polls the
+    ring at `fps` on the event loop, so an idle client holds no thread.
+    """
+    await asyncio.to_thread(grabber.latest)  # 503 up front if there is no camera
+
+    def part(data: bytes, etag: str) -> bytes:
+        return (f"--{MJPEG_BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                f"Content-Length: {len(data)}\r\nETag: {etag}\r\n\r\n").encode("ascii") + data + b"\r\n"
+
+    async def parts():
+        last, etag, min_gap = None, '""', 1.0 / fps
+        sent = time.monotonic()
+        while True:
+            item = grabber.current()
+            if item is None or item[2] == last:
+                if time.monotonic() - sent >= STREAM_HEARTBEAT_S:
+                    sent = time.monotonic()
+                    yield part(b"", etag)
+                await asyncio.sleep(min_gap)
+                continue
+            _ts, data, last, raw = item
+            custom, etag = _variant(last, width, height, quality)
+            if custom:
+                data = await asyncio.to_thread(grabber.encode, raw, width, height, quality or JPEG_QUALITY)
+            sent = time.monotonic()
+            yield part(data, etag)
+            await asyncio.sleep(min_gap)
+
+    return StreamingResponse(parts(), media_type=f"multipart/x-mixed-replace; boundary={MJPEG_BOUNDARY}",
+                             headers={"Cache-Control": "no-cache"})
 
 @app.get("/healthz")
 def health():
     return {"ok": True}
 
 if __name__ == "__main__":
-    # Change port per laptop, e.g. 9001, 9002
-    uvicorn.run(app, host="0.0.0.0", port=9001)
\ No newline at end of file
+    # one agent per laptop: `python camera_agent.py 9002` or CAMERA_AGENT_PORT=9002
+    uvicorn.run(app, host=AGENT_HOST, port=int(sys.argv[1]) if len(sys.argv) > 1 else AGENT_PORT)
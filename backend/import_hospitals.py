@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Seed the `hospitals` table (and so the in-memory nearby index) from a national
+hospital registry, so /nearby-hospitals can answer without Google Places.
+
+    python import_hospitals.py registry.csv
+    python import_hospitals.py registry.geojson --batch 1000
+
+CSV needs a header with name + lat/latitude + lng/lon/longitude columns
+(id/hospital_id and maps_url are optional). GeoJSON takes Point features and
+reads the same keys from `properties`. Wait-time columns of existing rows are
+never touched.
+
+    python import_hospitals.py --migrate-geohash
+
+adds the indexed `geohash` column to an existing table and backfills it.
+"""
+import argparse, csv, hashlib, json, sys
+from typing import Any, Dict, Iterator, Optional
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from apis.mysql_client import migrate_geohash, upsert_hospitals_static
+
+ID_KEYS = ("hospital_id", "id", "place_id")
+LAT_KEYS = ("lat", "latitude")
+LNG_KEYS = ("lng", "lon", "long", "longitude")
+
+def _pick(d: Dict[str, Any], keys) -> Optional[Any]:
+    for k in keys:
+        v = d.get(k)
+        if v not in (None, ""):
+            return v
+    return None
+
+def _row(props: Dict[str, Any], lat: Any, lng: Any) -> Optional[Dict[str, Any]]:
+    name = props.get("name")
+    try:
+        lat, lng = float(lat), float(lng)
+    except (TypeError, ValueError):
+        return None
+    if not name or not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    hid = _pick(props, ID_KEYS)
+    if not hid:
+        # stable synthetic id so re-imports update instead of duplicating
+        hid = "registry:" + hashlib.sha1(f"{name}|{lat:.5f}|{lng:.5f}".encode("utf-8")).hexdigest()[:16]
+    return {"hospital_id": str(hid), "name": name, "lat": lat, "lng": lng, "maps_url": props.get("maps_url")}
+
+def read_csv(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for rec in csv.DictReader(f):
+            rec = {k.strip().lower(): (v or "").strip() for k, v in rec.items() if k}
+            row = _row(rec, _pick(rec, LAT_KEYS), _pick(rec, LNG_KEYS))
+            if row:
+                yield row
+
+def read_geojson(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    for feat in data.get("features", []):
+        geom = feat.get("geometry") or {}
+        if geom.get("type") != "Point":
+            continue
+        lng, lat = (geom.get("coordinates") or [None, None])[:2]
+        props = {k.lower(): v for k, v in (feat.get("properties") or {}).items()}
+        if "id" not in props and feat.get("id") is not None:
+            props["id"] = feat["id"]
+        row = _row(props, lat, lng)
+        if row:
+            yield row
+
+def main():
+    p = argparse.ArgumentParser(description="Bulk-import a hospital registry (CSV or GeoJSON) into MySQL.")
+    p.add_argument("path", nargs="?", help="Registry file (.csv, .geojson or .json)")
+    p.add_argument("--format", choices=["auto", "csv", "geojson"], default="auto")
+    p.add_argument("--batch", type=int, default=500, help="Rows per INSERT batch")
+    p.add_argument("--dry-run", action="store_true", help="Parse and count only, don't write")
+    p.add_argument("--migrate-geohash", action="store_true", help="Add/backfill hospitals.geohash (indexed radius queries)")
+    args = p.parse_args()
+
+    if args.migrate_geohash:
+        print(f"geohash column ready, backfilled {migrate_geohash()} rows")
+        if not args.path:
+            return
+    elif not args.path:
+        p.error("path is required")
+
+    fmt = args.format
+    if fmt == "auto":
+        fmt = "csv" if args.path.lower().endswith(".csv") else "geojson"
+    rows = read_csv(args.path) if fmt == "csv" else read_geojson(args.path)
+
+    total, batch = 0, []
+    try:
+        for r in rows:
+            batch.append(r)
+            if len(batch) >= args.batch:
+                if not args.dry_run:
+                    upsert_hospitals_static(batch)
+                total += len(batch)
+                batch = []
+        if batch and not args.dry_run:
+            upsert_hospitals_static(batch)
+        total += len(batch)
+    except Exception as e:
+        sys.stderr.write(f"[error] import failed after {total} rows: {e}\n")
+        sys.exit(2)
+    print(f"{'parsed' if args.dry_run else 'imported'} {total} hospitals from {args.path}")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
 from dotenv import load_dotenv
 load_dotenv()  # <-- makes .env available to all imported modules
 
+import asyncio, logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -9,20 +12,61 @@ from apis.wait_time import router as wait_router
 from apis.camera import router as camera_router
 from apis.recommend import router as smart_router
 from apis.live_status import router as live_status_router
+from apis.metrics import router as metrics_router, ServerTimingMiddleware
+from apis.http_clients import open_clients, close_clients
+from apis.mysql_client import load_hospital_index, close_writes, dispose_engines
+from apis.counters import shutdown_counters
+from apis.camera import _CAMERA_REGISTRY
+from apis.camera_poller import CameraPoller, CAMERA_POLLER_ENABLED
+from apis.camera_fetch import stream_hub
+from apis.nearby import PRIMARY_CAMERA_ID, PRIMARY_CAMERA_URLS
+
+log = logging.getLogger("hospital-backend")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # one pooled keep-alive client per upstream, shared by every router
+    app.state.http = open_clients()
+    # offline-first nearby: known hospitals in memory (keep booting if MySQL is down)
+    try:
+        n = await asyncio.to_thread(load_hospital_index)
+        log.info("hospital index loaded: %d rows", n)
+    except Exception as e:
+        log.warning("hospital index not loaded: %s", e)
+    # headcounts for registered cameras happen in the background, never in a request
+    if PRIMARY_CAMERA_ID and PRIMARY_CAMERA_URLS:
+        _CAMERA_REGISTRY.setdefault(PRIMARY_CAMERA_ID, PRIMARY_CAMERA_URLS)
+    poller = CameraPoller(open_clients)
+    if CAMERA_POLLER_ENABLED:
+        poller.start()
+    try:
+        yield
+    finally:
+        await poller.stop()
+        await stream_hub.stop()
+        await close_clients()
+        # queued MySQL writes (write-behind) land before the process exits
+        await asyncio.to_thread(close_writes)
+        await dispose_engines()
+        shutdown_counters()
 
-app = FastAPI(title="Hospital Backend")
+app = FastAPI(title="Hospital Backend", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], allow_credentials=True,
     allow_methods=["*"], allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+# per-stage timings: Server-Timing header on every response, histograms on /metrics
+app.add_middleware(ServerTimingMiddleware)
 
 app.include_router(nearby_router)
 app.include_router(wait_router)
 app.include_router(camera_router)
 app.include_router(smart_router)
 app.include_router(live_status_router)
+app.include_router(metrics_router)
 
 @app.get("/")
 def root():
@@ -9,6 +9,7 @@ def main():
     p.add_argument("--limit", type=int, default=5)
     p.add_argument("--maxc", type=int, default=12, help="max candidates to consider")
     p.add_argument("--cams", type=str, default="", help="Path to JSON mapping hospital_id -> [camera_url, ...]")
+    p.add_argument("--stream", action="store_true", help="Use <url>/stream and print each NDJSON event as it arrives")
     args = p.parse_args()
 
     cams = None
@@ -26,6 +27,13 @@ def main():
         body["cameras_by_hospital"] = cams
 
     try:
+        if args.stream:
+            with requests.post(args.url.rstrip("/") + "/stream", json=body, timeout=60, stream=True) as r:
+                r.raise_for_status()
+                for line in r.iter_lines():
+                    if line:
+                        print(json.dumps(json.loads(line), indent=2), flush=True)
+            return
         r = requests.post(args.url, json=body, timeout=60)
         r.raise_for_status()
         print(json.dumps(r.json(), indent=2))
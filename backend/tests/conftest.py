@@ -0,0 +1,8 @@
+import os, sys
+
+# modules read their config at import time
+os.environ.setdefault("GOOGLE_MAPS_API_KEY", "test")
+os.environ.setdefault("CAMERA_POLLER_ENABLED", "0")
+os.environ["SHARED_STORE_PATH"] = ""
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
@@ -0,0 +1,32 @@
+from apis.camera_fetch import MjpegParser
+
+CT = "multipart/x-mixed-replace; boundary=frame"
+
+def _part(body: bytes, etag: str, length: bool = True) -> bytes:
+    head = b"--frame\r\nContent-Type: image/jpeg\r\nETag: " + etag.encode()
+    if length:
+        head += b"\r\nContent-Length: " + str(len(body)).encode()
+    return head + b"\r\n\r\n" + body + b"\r\n"
+
+def _feed_in(parser: MjpegParser, data: bytes, size: int):
+    out = []
+    for i in range(0, len(data), size):
+        out.extend(parser.feed(data[i:i + size]))
+    return out
+
+def test_parts_split_across_chunks():
+    a, b = b"\xff\xd8" + b"a" * 300 + b"\r\n\xff\xd9", b"\xff\xd8" + b"--fram" + b"b" * 200 + b"\xff\xd9"
+    stream = _part(a, '"1"') + _part(b"", '"hb"') + _part(b, '"2"')
+    for size in (1, 7, 64, len(stream)):
+        parts = _feed_in(MjpegParser(CT), stream, size)
+        assert [(h["etag"], body) for h, body in parts] == [('"1"', a), ('"hb"', b""), ('"2"', b)], size
+
+def test_parts_without_content_length_end_at_next_boundary():
+    a = b"\xff\xd8" + b"x" * 150 + b"\xff\xd9"
+    stream = _part(a, '"1"', length=False) + b"--frame\r\n"
+    parts = _feed_in(MjpegParser('multipart/x-mixed-replace;boundary="--frame"'), stream, 5)
+    assert [(h["etag"], body) for h, body in parts] == [('"1"', a)]
+
+def test_body_ending_in_newline_is_kept_whole_when_length_given():
+    body = b"\xff\xd8" + b"y" * 120 + b"\r\n"
+    assert MjpegParser(CT).feed(_part(body, '"1"'))[0][1] == body
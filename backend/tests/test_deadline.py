@@ -0,0 +1,64 @@
+import asyncio, json
+
+from apis.deadline import Deadline
+from apis import recommend
+from apis.recommend import SmartHospital, SmartQuery, _stream_events
+
+async def _slow(value, delay):
+    await asyncio.sleep(delay)
+    return value
+
+def test_run_returns_result_within_budget():
+    async def go():
+        dl = Deadline(1000)
+        return await dl.run("places", _slow("ok", 0.01), "fallback"), dl.degraded
+    assert asyncio.run(go()) == ("ok", [])
+
+def test_run_falls_back_and_marks_stage_degraded():
+    async def go():
+        dl = Deadline(300)
+        return await dl.run("routes", _slow("ok", 2.0), "fallback"), dl.degraded
+    assert asyncio.run(go()) == ("fallback", ["routes"])
+
+def test_run_skips_stage_when_budget_is_spent():
+    async def go():
+        dl = Deadline(100)  # all of it is the response reserve
+        coro = _slow("ok", 0)
+        out = await dl.run("db", coro, [])
+        return out, dl.degraded, coro.cr_frame is None
+    assert asyncio.run(go()) == ([], ["db"], True)
+
+def _hospital(hid):
+    return SmartHospital(hospital_id=hid, hospital_name=hid, google_maps_location_link="", eta_minutes=5.0)
+
+def test_stream_serves_stale_wait_when_budget_runs_out(monkeypatch):
+    finished = []
+
+    async def enrich(h, q, http):
+        if h.hospital_id == "slow":
+            await asyncio.sleep(0.5)
+            finished.append(h.hospital_id)
+            return
+        if h.hospital_id == "broken":
+            raise TimeoutError("camera timed out")  # a task's own timeout is not the deadline
+        h.estimated_wait_minutes = 10
+
+    monkeypatch.setattr(recommend, "_enrich_wait", enrich)
+    recommend.set_wait_for_hospital("slow", {"hospital_id": "slow", "people": 3, "per_person_minutes": 10,
+                                             "estimated_wait_minutes": 30})
+
+    async def go():
+        q = SmartQuery(lat=3.1, lng=101.6, limit=3)
+        events = [json.loads(b) async for b in _stream_events(q, None, [_hospital(h) for h in ("fast", "slow", "broken")],
+                                                              False, Deadline(300))]
+        await asyncio.sleep(0.6)  # the late task keeps running detached
+        return events
+
+    events = asyncio.run(go())
+    waits = {e["hospital"]["hospital_id"]: e["hospital"] for e in events if e["event"] == "wait"}
+    assert set(waits) == {"fast", "slow"}
+    assert waits["fast"]["estimated_wait_minutes"] == 10 and not waits["fast"]["wait_stale"]
+    assert waits["slow"]["wait_stale"] is True and waits["slow"]["estimated_wait_minutes"] == 30
+    result = events[-1]
+    assert result["event"] == "result" and "waits" in result["degraded"]
+    assert finished == ["slow"]
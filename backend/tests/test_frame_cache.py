@@ -0,0 +1,47 @@
+import base64, io, json
+from types import SimpleNamespace
+
+from PIL import Image
+
+from apis.counters import OpenAICounter
+from apis.frame_cache import FrameCountCache
+from apis import counters
+
+def _jpeg_b64(shade: int) -> str:
+    img = Image.new("RGB", (64, 48), (shade, shade, shade))
+    img.paste((255 - shade,) * 3, (0, 0, 32, 48))
+    buf = io.BytesIO()
+    img.save(buf, "JPEG")
+    return base64.b64encode(buf.getvalue()).decode("ascii")
+
+def test_counts_are_reused_within_a_scope_only():
+    cache = FrameCountCache()
+    cache.put("cam-a", 0b1011, 3)
+    assert cache.get("cam-a", 0b1010) == 3  # near-identical frame, same camera
+    assert cache.get("cam-b", 0b1011) is None
+    assert cache.get(None, 0b1011) is None
+    cache.put(None, 0b1011, 5)  # unscoped frames are never cached
+    assert cache.get("cam-b", 0b1011) is None
+
+class _FakeVision:
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kw):
+        self.calls += 1
+        n = sum(1 for p in kw["messages"][0]["content"] if p["type"] == "image_url")
+        body = {"people": 4} if n == 1 else {"counts": [4] * n}
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(body)))])
+
+def test_identical_frames_from_other_cameras_are_counted(monkeypatch):
+    monkeypatch.setattr(counters, "frame_counts", FrameCountCache())
+    vision = _FakeVision()
+    counter = OpenAICounter(vision)
+    frame = _jpeg_b64(40)
+    assert counter.count_many_b64([frame], ["h1/cam-1"]) == [4]
+    assert counter.count_many_b64([frame], ["h1/cam-1"]) == [4]
+    assert vision.calls == 1
+    counter.count_many_b64([frame], ["h2/cam-1"])
+    counter.count_many_b64([frame])
+    assert vision.calls == 3
@@ -0,0 +1,53 @@
+import asyncio
+from types import SimpleNamespace
+
+from apis import nearby, wait_time
+from apis.wait_store import WaitHistory
+
+PLACES = [{"hospital_id": h, "name": h, "lat": 3.14, "lng": 101.69 + i / 100, "maps_url": None}
+          for i, h in enumerate(("h1", "h2"))]
+
+def test_db_failure_leaves_waits_unknown_and_keeps_the_camera_count(monkeypatch):
+    saved, upserts = [], []
+
+    async def candidates(q, http, dl):
+        return PLACES
+
+    async def route_matrix(lat, lng, places, *, client):
+        return {0: (1.0, 3.0), 1: (2.0, 6.0)}
+
+    async def db_down(ids):
+        raise OSError("mysql down")
+
+    async def capture(urls, *, client, hospital_id=None):
+        return 4, [{"camera_id": "cam-1", "people": 4, "status": "ok"}]
+
+    async def update_waits(rows):
+        saved.extend(rows)
+
+    async def upsert(rows):
+        upserts.extend(rows)
+
+    monkeypatch.setattr(wait_time, "wait_history", WaitHistory())
+    monkeypatch.setattr(nearby, "_candidates", candidates)
+    monkeypatch.setattr(nearby, "_route_matrix", route_matrix)
+    monkeypatch.setattr(nearby, "fetch_hospitals_by_ids_async", db_down)
+    monkeypatch.setattr(nearby, "_capture_and_count", capture)
+    monkeypatch.setattr(nearby, "update_hospital_waits_async", update_waits)
+    monkeypatch.setattr(nearby, "upsert_hospitals_async", upsert)
+    monkeypatch.setattr(nearby, "PRIMARY_CAMERA_URLS", ["http://cam/capture.jpg"])
+    monkeypatch.setattr(nearby, "PRIMARY_CAMERA_ID", "")
+
+    async def run():
+        out = await nearby._nearby(nearby.Query(lat=3.14, lng=101.69), SimpleNamespace(places=None, routes=None, cameras=None))
+        await asyncio.sleep(0)  # let the background wait write run
+        return out
+
+    out = asyncio.run(run())
+    rows = {h["hospital_id"]: h for h in out["hospitals"]}
+    assert "db" in out["degraded"]
+    assert rows["h1"]["current_people"] == 4             # the camera target's fresh count
+    assert rows["h2"]["current_estimated_wait_minutes"] is None  # no RNG stand-in
+    assert upserts == []                                  # stored waits are not blanked
+    assert [r["last_people"] for r in saved] == [4]
+    assert wait_time.get_camera_wait("h1")["people"] == 4
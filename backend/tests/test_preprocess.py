@@ -0,0 +1,43 @@
+import io, random
+
+from PIL import Image
+
+from apis import preprocess
+from apis.preprocess import preprocess_frame, set_profile
+
+def _jpeg(w=200, h=100, quality=10):
+    rnd = random.Random(1)
+    # dark noisy left half, light noisy right half: re-encoding at a higher quality grows it
+    im = Image.frombytes("L", (w, h), bytes(rnd.randrange(0, 60) if x < w // 2 else rnd.randrange(190, 256)
+                                            for _ in range(h) for x in range(w))).convert("RGB")
+    out = io.BytesIO()
+    im.save(out, format="JPEG", quality=quality)
+    return out.getvalue()
+
+def test_roi_crop_is_used_even_when_not_smaller():
+    img = _jpeg()  # tiny low-quality source: re-encoding at quality 95 comes out bigger
+    set_profile("cam-roi", {"roi": [0.5, 0.0, 1.0, 1.0], "quality": 95, "max_edge": 0})
+    try:
+        out = preprocess_frame(img, camera="cam-roi")
+    finally:
+        set_profile("cam-roi", None)
+    assert len(out) >= len(img)
+    im = Image.open(io.BytesIO(out))
+    assert im.size == (100, 100)
+    assert im.convert("L").getextrema()[0] > 120  # only the light half is left
+
+def test_hospital_profile_applies_when_camera_has_none():
+    set_profile("hosp-1", {"roi": [0.0, 0.0, 0.5, 1.0], "max_edge": 0})
+    try:
+        out = preprocess_frame(_jpeg(), camera="unknown-cam", hospital_id="hosp-1")
+    finally:
+        set_profile("hosp-1", None)
+    assert Image.open(io.BytesIO(out)).size == (100, 100)
+
+def test_plain_reencode_that_grows_falls_back_to_original(monkeypatch):
+    img = _jpeg(quality=10)
+    monkeypatch.setattr(preprocess, "DEFAULT_PROFILE", preprocess.FrameProfile(max_edge=0, quality=95))
+    assert preprocess_frame(img) is img
+
+def test_unreadable_bytes_pass_through():
+    assert preprocess_frame(b"not a jpeg") == b"not a jpeg"
@@ -0,0 +1,66 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from apis import metrics, recommend
+from apis.recommend import SmartQuery
+from apis.spatial_index import HospitalIndex
+
+def _places_down(status=429):
+    async def places(lat, lng, *, client, max_results=12):
+        request = httpx.Request("POST", "https://places.test")
+        raise httpx.HTTPStatusError("quota", request=request, response=httpx.Response(status, request=request))
+    return places
+
+async def _no_routes(lat, lng, dests, *, client):
+    return None
+
+@pytest.fixture
+def offline(monkeypatch):
+    index = HospitalIndex()
+    monkeypatch.setattr(recommend, "hospital_index", index)
+    monkeypatch.setattr(recommend, "places_nearby_hospitals", _places_down())
+    monkeypatch.setattr(recommend, "routes_matrix", _no_routes)
+    return index
+
+HTTP = SimpleNamespace(places=None, routes=None, cameras=None)
+
+def test_places_error_falls_back_to_known_hospitals(offline, monkeypatch):
+    offline.upsert([{"hospital_id": "h1", "name": "General", "lat": 3.141, "lng": 101.69},
+                    {"hospital_id": "h2", "name": "Clinic", "lat": 3.15, "lng": 101.7}])
+    broken = []
+
+    async def enrich(h, q, http):
+        if h.hospital_id == "h2":
+            broken.append(h.hospital_id)
+            raise RuntimeError("camera unreachable")
+        h.estimated_wait_minutes = 10
+
+    monkeypatch.setattr(recommend, "_enrich_wait", enrich)
+    out = asyncio.run(recommend._smart_nearby(SmartQuery(lat=3.14, lng=101.69, limit=2), HTTP))
+    by_id = {h.hospital_id: h for h in out.hospitals}
+    assert set(by_id) == {"h1", "h2"} and "places" in out.degraded
+    assert by_id["h1"].estimated_wait_minutes == 10
+    assert broken == ["h2"] and by_id["h2"].estimated_wait_minutes is None  # logged and skipped
+
+def test_places_error_without_known_hospitals_keeps_its_status(offline):
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(recommend._ranked_by_eta(SmartQuery(lat=3.14, lng=101.69), HTTP, recommend.Deadline()))
+    assert e.value.status_code == 429
+
+def test_prefilter_keeps_every_candidate_that_could_rank(monkeypatch):
+    monkeypatch.setattr(recommend, "ROUTES_PREFILTER_FACTOR", 0.0)
+    places = [{"id": f"pf-{i}", "lat": 52.0 + 0.01 * i, "lng": 4.0} for i in range(10)]
+    assert recommend.prefilter_candidates(52.0, 4.0, places, 2) == list(range(10))
+    monkeypatch.setattr(recommend, "ROUTES_PREFILTER_FACTOR", 2.0)
+    assert recommend.prefilter_candidates(52.0, 4.0, places, 2) == [0, 1, 2, 3]
+
+def test_places_cache_hit_records_no_places_timing(monkeypatch):
+    stages = []
+    monkeypatch.setattr(metrics, "record", lambda stage, seconds, ok=True: stages.append(stage))
+    monkeypatch.setattr(recommend, "get_cached_places", lambda *a, **k: [])
+    assert asyncio.run(recommend.places_nearby_hospitals(52.0, 4.0, client=None)) == []
+    assert "places" not in stages
@@ -0,0 +1,67 @@
+from apis import preprocess
+from apis.shared_store import SharedDict, SharedWaitHistory, SqliteStore
+
+def _stores(tmp_path):
+    # two connections to one file stand in for two workers
+    path = str(tmp_path / "shared.db")
+    return SqliteStore(path), SqliteStore(path)
+
+def test_samples_from_another_worker_are_visible(tmp_path):
+    a_store, b_store = _stores(tmp_path)
+    a, b = SharedWaitHistory(a_store), SharedWaitHistory(b_store)
+    a.append("h1", {"people": 2, "estimated_wait_minutes": 20})
+    assert b.latest("h1")["estimated_wait_minutes"] == 20  # loaded on first use
+    a.append("h1", {"people": 5, "estimated_wait_minutes": 50})
+    assert b.latest("h1")["estimated_wait_minutes"] == 50  # pulled incrementally
+    assert b.stats("h1", 3600)["n"] == 2
+
+def test_first_sample_elsewhere_clears_negative_cache(tmp_path):
+    a_store, b_store = _stores(tmp_path)
+    a, b = SharedWaitHistory(a_store), SharedWaitHistory(b_store)
+    assert b.latest("h2") is None  # b now remembers "no samples" for a few seconds
+    a.append("h2", {"people": 1, "estimated_wait_minutes": 10})
+    assert b.latest("h2")["estimated_wait_minutes"] == 10
+
+def test_shared_dict_changes_reach_the_other_worker(tmp_path):
+    a_store, b_store = _stores(tmp_path)
+    a, b = SharedDict(a_store, "ns"), SharedDict(b_store, "ns")
+    a["k"] = {"x": 1}
+    assert b["k"] == {"x": 1}
+    del a["k"]
+    assert "k" not in b
+
+def test_frame_profiles_are_shared(tmp_path, monkeypatch):
+    a_store, b_store = _stores(tmp_path)
+    monkeypatch.setattr(preprocess, "_PROFILES", SharedDict(a_store, "camera_profiles"))
+    preprocess.set_profile("cam-1", {"roi": [0, 0.5, 1, 1], "grayscale": True})
+    monkeypatch.setattr(preprocess, "_PROFILES", SharedDict(b_store, "camera_profiles"))
+    p = preprocess.profile_for("cam-1")
+    assert p.roi == (0.0, 0.5, 1.0, 1.0) and p.grayscale
+    assert preprocess.profile_for("cam-2") is preprocess.DEFAULT_PROFILE
+
+def test_store_opens_on_first_use(tmp_path):
+    path = tmp_path / "lazy.db"
+    store = SqliteStore(str(path))
+    d = SharedDict(store, "ns", {"seed": 1})
+    assert not path.exists()  # nothing touched the file at construction
+    assert d["seed"] == 1 and path.exists()
+    d["seed"] = 2
+    assert SharedDict(SqliteStore(str(path)), "ns", {"seed": 1})["seed"] == 2  # existing keys win
+
+def test_reads_do_not_wait_behind_a_blocked_write(tmp_path):
+    import sqlite3, threading, time
+    path = str(tmp_path / "busy.db")
+    store = SqliteStore(path)
+    d = SharedDict(store, "ns")
+    d["k"] = 1
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")  # another worker holds the write lock
+    writer = threading.Thread(target=d.__setitem__, args=("k", 2))
+    writer.start()
+    time.sleep(0.2)  # the write is now waiting on SQLite's busy timeout, holding the store's write lock
+    t0 = time.monotonic()
+    assert d["k"] == 1
+    assert time.monotonic() - t0 < 1.0
+    other.execute("COMMIT")
+    writer.join()
+    assert d["k"] == 2
@@ -0,0 +1,27 @@
+from apis.spatial_index import HospitalIndex
+
+def test_seen_only_covers_smaller_queries():
+    idx = HospitalIndex()
+    assert not idx.seen_recently(3.14, 101.69, 5000, 10)
+    idx.mark_seen(3.14, 101.69, 5000, 10, returned=10)
+    assert idx.seen_recently(3.14, 101.69, 3000, 5)
+    assert not idx.seen_recently(3.14, 101.69, 10000, 10)  # wider than Places was asked
+    assert not idx.seen_recently(3.14, 101.69, 5000, 20)   # Places may have had more to give
+
+def test_seen_complete_answer_covers_any_count():
+    idx = HospitalIndex()
+    idx.mark_seen(3.14, 101.69, 5000, 10, returned=4)  # fewer than asked: that was all of them
+    assert idx.seen_recently(3.14, 101.69, 5000, 20)
+    assert not idx.seen_recently(3.14, 101.69, 5000, 20, ttl=-1)
+
+def test_seen_is_bounded_oldest_first():
+    idx = HospitalIndex(seen_max_entries=2)
+    for lat in (1.0, 2.0, 3.0):
+        idx.mark_seen(lat, 101.69, 5000, 10, returned=10)
+    assert not idx.seen_recently(1.0, 101.69, 5000, 10)
+    assert idx.seen_recently(2.0, 101.69, 5000, 10)
+    assert idx.seen_recently(3.0, 101.69, 5000, 10)
+    idx.mark_seen(2.0, 101.69, 5000, 10, returned=10)  # re-marked: now the newest
+    idx.mark_seen(4.0, 101.69, 5000, 10, returned=10)
+    assert idx.seen_recently(2.0, 101.69, 5000, 10)
+    assert not idx.seen_recently(3.0, 101.69, 5000, 10)
@@ -0,0 +1,11 @@
+from apis import wait_time
+from apis.wait_store import WaitHistory
+
+def test_camera_wait_ignores_rng_records(monkeypatch):
+    monkeypatch.setattr(wait_time, "wait_history", WaitHistory())
+    wait_time.set_wait_for_hospital("h1", {"people": 3, "estimated_wait_minutes": 30, "source": "poller"})
+    assert wait_time.get_camera_wait("h1")["estimated_wait_minutes"] == 30
+    wait_time.set_wait_for_hospital("h1", {"people": 60, "estimated_wait_minutes": 90, "source": "rng"})
+    assert wait_time.get_camera_wait("h1") is None
+    wait_time.set_wait_for_hospital("h2", {"people": 60, "estimated_wait_minutes": 90})  # origin unknown
+    assert wait_time.get_camera_wait("h2") is None
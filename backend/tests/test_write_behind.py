@@ -0,0 +1,110 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from apis import mysql_client
+from apis.cache import TTLCache
+from apis.mysql_client import WriteBehind
+
+def _row(hid="h1", **kw):
+    row = {"hospital_id": hid, "name": "General", "lat": 3.14, "lng": 101.69, "maps_url": None,
+           "last_people": 4, "per_person_minutes": 10, "doctors_working": 2, "estimated_wait_minutes": 20,
+           "wait_last_updated": datetime(2026, 1, 1, 8, 0), "updated_at": datetime(2026, 1, 1, 8, 0)}
+    row.update(kw)
+    return row
+
+@pytest.fixture
+def writes(monkeypatch):
+    calls, fail = [], []
+    def write_rows(full, waits):
+        if fail:
+            fail.pop()
+            raise OSError("mysql down")
+        calls.append(([dict(r) for r in full], [dict(r) for r in waits]))
+    monkeypatch.setattr(mysql_client, "_write_rows", write_rows)
+    monkeypatch.setattr(mysql_client, "_row_hashes", TTLCache(100, 60))
+    return calls, fail
+
+def test_unchanged_rows_are_skipped_and_wait_changes_written_alone(writes):
+    mysql_client._remember_rows([_row()])
+    _, full, waits = mysql_client._classify([_row(updated_at=datetime(2026, 1, 1, 9, 0))])
+    assert full == [] and waits == []
+    _, full, waits = mysql_client._classify([_row(estimated_wait_minutes=35)])
+    assert full == [] and [r["estimated_wait_minutes"] for r in waits] == [35]
+    _, full, waits = mysql_client._classify([_row(name="General Hospital"), _row("h2")])
+    assert [r["hospital_id"] for r in full] == ["h1", "h2"] and waits == []
+
+def test_wait_update_merges_into_queued_full_row(writes):
+    calls, _ = writes
+    wb = WriteBehind(batch=1000, max_delay=60)
+    try:
+        wb.put("full", [_row()])
+        wb.put("wait", [mysql_client._wait_update(_row(estimated_wait_minutes=40))])
+        assert wb.overlay("h1", None)["estimated_wait_minutes"] == 40
+        wb.flush()
+    finally:
+        wb.close()
+    assert len(calls) == 1
+    full, waits = calls[0]
+    assert waits == [] and full[0]["name"] == "General" and full[0]["estimated_wait_minutes"] == 40
+
+def test_failed_full_row_survives_a_newer_wait_update(writes):
+    calls, fail = writes
+    wb = WriteBehind(batch=1000, max_delay=60)
+    try:
+        wb.put("full", [_row()])
+        fail.append(True)
+        wb.flush()  # fails: the full row goes back on the queue
+        assert calls == [] and wb.pending("h1")
+        wb.put("wait", [mysql_client._wait_update(_row(estimated_wait_minutes=55))])
+        wb.flush()
+    finally:
+        wb.close()
+    full, waits = calls[0]
+    assert waits == [] and full[0]["name"] == "General" and full[0]["estimated_wait_minutes"] == 55
+
+def test_failed_write_requeued_under_newer_wait_update(writes, monkeypatch):
+    # the newer update arrives while the failing flush is in flight
+    calls, _ = writes
+    wb = WriteBehind(batch=1000, max_delay=60)
+    def write_rows(full, waits):
+        monkeypatch.setattr(mysql_client, "_write_rows", lambda f, w: calls.append((f, w)))
+        wb.put("wait", [mysql_client._wait_update(_row(estimated_wait_minutes=70))])
+        raise OSError("mysql down")
+    monkeypatch.setattr(mysql_client, "_write_rows", write_rows)
+    try:
+        wb.put("full", [_row()])
+        wb.flush()
+        wb.flush()
+    finally:
+        wb.close()
+    full, waits = calls[0]
+    assert waits == [] and full[0]["name"] == "General" and full[0]["estimated_wait_minutes"] == 70
+
+def test_wait_update_without_a_row_is_upserted(tmp_path, monkeypatch):
+    path = tmp_path / "h.db"
+    engine = create_engine(f"sqlite:///{path}", future=True)
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE hospitals (
+              hospital_id VARCHAR(64) PRIMARY KEY, name VARCHAR(255), lat DOUBLE, lng DOUBLE, maps_url TEXT,
+              last_people INT, per_person_minutes INT, doctors_working INT, estimated_wait_minutes INT,
+              wait_last_updated DATETIME, updated_at DATETIME)"""))
+    monkeypatch.setattr(mysql_client, "_engine", engine)
+    monkeypatch.setattr(mysql_client, "_has_geohash", False)
+    async def write_async(rows):
+        monkeypatch.setattr(mysql_client, "_async_engine", create_async_engine(f"sqlite+aiosqlite:///{path}"))
+        try:
+            await mysql_client._write_rows_async([], rows)
+        finally:
+            await mysql_client._async_engine.dispose()
+    mysql_client._write_rows([], [_row("h1", estimated_wait_minutes=25)])
+    asyncio.run(write_async([mysql_client._wait_update(_row("h2"))]))
+    mysql_client._write_rows([], [_row("h1", estimated_wait_minutes=30)])
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT hospital_id, name, estimated_wait_minutes FROM hospitals ORDER BY hospital_id")).all()
+    engine.dispose()
+    assert [tuple(r) for r in rows] == [("h1", "General", 30), ("h2", None, 20)]